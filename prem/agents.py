@@ -3,39 +3,119 @@ Arjuna.exe - Agentic AI Urban Greenery System
 Multi-Agent LangGraph Implementation
 """
 
-from typing import Dict, Any, List
-from dataclasses import dataclass
+from abc import ABC, abstractmethod
+from typing import Dict, Any, List, Optional
 import json
+import time
+
+from rules import RuleSet, get_rules
 
 # Simplified agent framework (replace with actual LangGraph when available)
-@dataclass
-class AgentMessage:
-    agent: str
-    content: str
-    data: Dict[str, Any]
-    timestamp: str
+class AgentEvent:
+    """
+    One agent message. The text is kept as a template plus arguments and
+    only formatted when ``content`` is read (e.g. by the UI timeline).
+    """
+    __slots__ = ("agent", "template", "args", "data", "created")
+
+    def __init__(self, agent: str, template: str, args: Dict[str, Any], data: Dict[str, Any], created: float):
+        self.agent = agent
+        self.template = template
+        self.args = args
+        self.data = data
+        self.created = created
+
+    @property
+    def content(self) -> str:
+        return self.template.format(**self.args) if self.args else self.template
+
+    @property
+    def timestamp(self) -> str:
+        return time.strftime("%H:%M:%S", time.localtime(self.created))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"timestamp": self.created, "agent": self.agent, "content": self.content, "data": self.data}
+
+class TraceSink(ABC):
+    """Destination for agent events"""
+    __slots__ = ()
+
+    @abstractmethod
+    def emit(self, agent: str, template: str, args: Dict[str, Any], data: Dict[str, Any]) -> Optional[AgentEvent]:
+        """Records one event; returns it, or None if the sink discards it"""
+
+    def events(self) -> List[AgentEvent]:
+        return []
+
+class NullSink(TraceSink):
+    """Drops every event; for batch and sweep runs that only need the results"""
+    __slots__ = ()
+
+    def emit(self, agent, template, args, data):
+        return None
+
+class RingBufferSink(TraceSink):
+    """Keeps the last ``capacity`` events in a preallocated list (the UI timeline)"""
+    __slots__ = ("_buffer", "_next", "_count")
+
+    def __init__(self, capacity: int = 64):
+        self._buffer = [None] * capacity
+        self._next = 0
+        self._count = 0
+
+    def emit(self, agent, template, args, data):
+        event = AgentEvent(agent, template, args, data, time.time())
+        self._buffer[self._next] = event
+        self._next = (self._next + 1) % len(self._buffer)
+        self._count = min(self._count + 1, len(self._buffer))
+        return event
+
+    def events(self):
+        start = (self._next - self._count) % len(self._buffer)
+        return [self._buffer[(start + i) % len(self._buffer)] for i in range(self._count)]
+
+class JsonlFileSink(TraceSink):
+    """Appends each event as one JSON line to a file (for audit trails and offline analysis)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+
+    def emit(self, agent, template, args, data):
+        event = AgentEvent(agent, template, args, data, time.time())
+        self._file.write(json.dumps(event.to_dict(), ensure_ascii=False, default=str) + "\n")
+        self._file.flush()
+        return event
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
 class ArjunaAgentSystem:
     """Multi-agent system for urban greenery optimization"""
     
-    def __init__(self):
-        self.conversation_log = []
+    def __init__(self, sink: TraceSink = None):
+        self.sink = sink if sink is not None else RingBufferSink()
+
+    @property
+    def conversation_log(self) -> List[AgentEvent]:
+        return self.sink.events()
         
-    def log_message(self, agent: str, content: str, data: Dict[str, Any] = None):
-        """Log agent communication"""
-        import datetime
-        msg = AgentMessage(
-            agent=agent,
-            content=content,
-            data=data or {},
-            timestamp=datetime.datetime.now().strftime("%H:%M:%S")
-        )
-        self.conversation_log.append(msg)
-        return msg
+    def log_message(self, agent: str, content: str, data: Dict[str, Any] = None, **args):
+        """Log agent communication; ``content`` is a str.format template filled from ``args`` when read"""
+        return self.sink.emit(agent, content, args, data or {})
 
 class ClimateAnalystAgent:
     """Agent 1: Analyzes climate conditions"""
     
+    def __init__(self, rules: RuleSet = None):
+        self.rules = rules if rules is not None else get_rules()
+    
     def analyze_climate(self, city_data: Dict, system: ArjunaAgentSystem) -> Dict:
         temp = city_data['temperature']
         humidity = city_data['humidity'] 
@@ -61,34 +141,26 @@ class ClimateAnalystAgent:
             "growing_season": self._assess_growing_conditions(temp, humidity, rainfall)
         }
         
-        message = f"🌡️ Climate Analysis Complete: {heat_stress} heat stress, {water_stress} water stress. Trees will need {analysis['water_demand_per_tree']}L/week. {analysis['climate_challenge']}"
-        
-        system.log_message("Climate Analyst", message, analysis)
+        system.log_message(
+            "Climate Analyst",
+            "🌡️ Climate Analysis Complete: {heat} heat stress, {water} water stress. Trees will need {demand}L/week. {challenge}",
+            analysis,
+            heat=heat_stress, water=water_stress, demand=analysis['water_demand_per_tree'], challenge=analysis['climate_challenge']
+        )
         return analysis
     
     def _get_climate_challenge(self, temp, rainfall, humidity):
-        if temp > 37 and rainfall < 10:
-            return "Extreme heat + drought conditions - high plant mortality risk"
-        elif temp > 35 and humidity < 40:
-            return "Hot and dry - increased irrigation requirements"
-        elif rainfall > 40 and humidity > 70:
-            return "High moisture - fungal disease risk, good natural watering"
-        elif temp < 28 and rainfall > 25:
-            return "Favorable growing conditions - optimal planting window"
-        else:
-            return "Moderate stress conditions - standard care protocols"
+        return self.rules["climate_challenge"].evaluate_fields(temperature=temp, rainfall=rainfall, humidity=humidity)
     
     def _assess_growing_conditions(self, temp, humidity, rainfall):
-        if 25 <= temp <= 32 and 45 <= humidity <= 70 and rainfall >= 20:
-            return "Optimal"
-        elif temp > 36 or rainfall < 8:
-            return "Challenging" 
-        else:
-            return "Moderate"
+        return self.rules["growing_season"].evaluate_fields(temperature=temp, humidity=humidity, rainfall=rainfall)
 
 class EcologicalPlannerAgent:
     """Agent 2: Plans ecological interventions based on climate insights"""
     
+    def __init__(self, rules: RuleSet = None):
+        self.rules = rules if rules is not None else get_rules()
+    
     def plan_ecology(self, city_data: Dict, climate_analysis: Dict, system: ArjunaAgentSystem) -> Dict:
         city = city_data['city']
         green_cover = city_data['green_cover']
@@ -118,21 +190,16 @@ class EcologicalPlannerAgent:
             "maintenance_level": self._assess_maintenance_needs(climate_analysis)
         }
         
-        message = f"🌳 Ecological Plan Ready: Plant {trees_needed} trees to reach {target_coverage}% green cover. Focus on {species[0]} species. Strategy: {strategy}"
-        
-        system.log_message("Ecological Planner", message, plan)
+        system.log_message(
+            "Ecological Planner",
+            "🌳 Ecological Plan Ready: Plant {trees} trees to reach {target}% green cover. Focus on {species} species. Strategy: {strategy}",
+            plan,
+            trees=trees_needed, target=target_coverage, species=species[0], strategy=strategy
+        )
         return plan
     
     def _recommend_species(self, climate_analysis):
-        heat_stress = climate_analysis['heat_stress']
-        water_stress = climate_analysis['water_stress']
-        
-        if heat_stress == "High" and water_stress == "High":
-            return ["Neem", "Peepal", "Gulmohar", "Bottle Brush"]  # Drought resistant
-        elif climate_analysis['humidity_level'] == "High":
-            return ["Mango", "Jack Fruit", "Rain Tree", "Ashoka"]  # Moisture loving
-        else:
-            return ["Banyan", "Oak", "Mahogany", "Silk Cotton"]  # Moderate conditions
+        return self.rules["recommended_species"].evaluate(climate_analysis)
     
     def _calculate_trees_needed(self, current, target):
         # Rough calculation: 1 tree per 0.1% green cover improvement
@@ -140,43 +207,27 @@ class EcologicalPlannerAgent:
         return int(coverage_increase * 100)  # Trees needed for coverage increase
     
     def _get_intervention_strategy(self, green_cover, climate_analysis):
-        if green_cover < 25:
-            return "Aggressive reforestation with native species"
-        elif climate_analysis['heat_stress'] == "High":
-            return "Heat-resistant urban canopy development"
-        elif climate_analysis['water_stress'] == "High":
-            return "Drought-tolerant plantation with micro-irrigation"
-        else:
-            return "Sustainable green belt expansion"
+        return self.rules["intervention_strategy"].evaluate_fields(
+            green_cover=green_cover,
+            heat_stress=climate_analysis['heat_stress'],
+            water_stress=climate_analysis['water_stress'],
+        )
     
     def _prioritize_zones(self, climate_analysis, green_cover):
-        zones = []
-        if climate_analysis['heat_stress'] == "High":
-            zones.extend(["Commercial areas", "Transport corridors"])
-        if green_cover < 30:
-            zones.extend(["Residential neighborhoods", "Schools"])
-        zones.extend(["Parks", "River banks", "Industrial buffer zones"])
-        return zones[:3]  # Top 3 priorities
+        return self.rules["priority_zones"].evaluate_fields(heat_stress=climate_analysis['heat_stress'], green_cover=green_cover)
     
     def _optimal_planting_time(self, climate_analysis):
-        if climate_analysis['water_stress'] == "Low":
-            return "Monsoon season (current conditions favorable)"
-        elif climate_analysis['heat_stress'] == "High":
-            return "Post-monsoon (September-November)"
-        else:
-            return "Pre-monsoon (March-May) or Post-monsoon"
+        return self.rules["planting_season"].evaluate(climate_analysis)
     
     def _assess_maintenance_needs(self, climate_analysis):
-        if climate_analysis['heat_stress'] == "High" or climate_analysis['water_stress'] == "High":
-            return "High - daily watering, shade protection"
-        elif climate_analysis['growing_season'] == "Optimal":
-            return "Low - natural conditions sufficient"
-        else:
-            return "Moderate - bi-weekly care, seasonal adjustments"
+        return self.rules["maintenance_level"].evaluate(climate_analysis)
 
 class SustainabilityAdvisorAgent:
     """Agent 3: Provides final actionable sustainability recommendations"""
     
+    def __init__(self, rules: RuleSet = None):
+        self.rules = rules if rules is not None else get_rules()
+    
     def advise_sustainability(self, city_data: Dict, climate_analysis: Dict, eco_plan: Dict, system: ArjunaAgentSystem) -> Dict:
         city = city_data['city']
         
@@ -209,9 +260,12 @@ class SustainabilityAdvisorAgent:
             "long_term_vision": self._create_vision(city_data, eco_plan)
         }
         
-        message = f"🎯 Sustainability Plan Finalized: Resilience Score {resilience_score}/100. Estimated cost ₹{cost_estimate:,.0f}. {len(timeline)} phase implementation recommended."
-        
-        system.log_message("Sustainability Advisor", message, recommendations)
+        system.log_message(
+            "Sustainability Advisor",
+            "🎯 Sustainability Plan Finalized: Resilience Score {score}/100. Estimated cost ₹{cost:,.0f}. {phases} phase implementation recommended.",
+            recommendations,
+            score=resilience_score, cost=cost_estimate, phases=len(timeline)
+        )
         return recommendations
     
     def _calculate_resilience_score(self, city_data, climate_analysis):
@@ -246,26 +300,14 @@ class SustainabilityAdvisorAgent:
         return trees_needed * cost_per_tree * multiplier
     
     def _assess_risks(self, climate_analysis, eco_plan):
-        risks = []
-        if climate_analysis['heat_stress'] == "High":
-            risks.append("High sapling mortality due to extreme heat")
-        if climate_analysis['water_stress'] == "High":
-            risks.append("Irrigation system dependency - water shortage risk")
-        if eco_plan['trees_to_plant'] > 500:
-            risks.append("Large scale project - resource management challenges")
-        if not risks:
-            risks.append("Low risk - favorable conditions for implementation")
-        return risks
+        return self.rules["implementation_risks"].evaluate_fields(
+            heat_stress=climate_analysis['heat_stress'],
+            water_stress=climate_analysis['water_stress'],
+            trees_to_plant=eco_plan['trees_to_plant'],
+        )
     
     def _create_watering_schedule(self, climate_analysis):
-        water_demand = climate_analysis['water_demand_per_tree']
-        
-        if water_demand > 150:
-            return "Daily watering (early morning + evening), drip irrigation recommended"
-        elif water_demand > 100:
-            return "Alternate day watering, mulching essential"
-        else:
-            return "Twice weekly watering, natural rainfall supplementation"
+        return self.rules["watering_schedule"].evaluate(climate_analysis)
     
     def _create_timeline(self, eco_plan):
         phases = []
@@ -309,20 +351,22 @@ class SustainabilityAdvisorAgent:
         target = eco_plan['target_green_cover']
         return f"Transform {city} into a green resilient city with {target}% tree cover, reduced urban heat island effect, improved air quality, and engaged citizens as environmental stewards."
 
-def run_arjuna_workflow(city_data: Dict) -> tuple:
+def run_arjuna_workflow(city_data: Dict, sink: TraceSink = None) -> tuple:
     """
     Main workflow orchestrating all three agents
+    ``sink`` receives the agent messages (default: an in-memory ring buffer)
     Returns: (final_recommendations, conversation_log)
     """
-    system = ArjunaAgentSystem()
+    system = ArjunaAgentSystem(sink)
     
-    # Initialize agents
-    climate_agent = ClimateAnalystAgent()
-    eco_agent = EcologicalPlannerAgent()
-    sustainability_agent = SustainabilityAdvisorAgent()
+    # Initialize agents (sharing one snapshot of the rule tables)
+    rules = get_rules()
+    climate_agent = ClimateAnalystAgent(rules)
+    eco_agent = EcologicalPlannerAgent(rules)
+    sustainability_agent = SustainabilityAdvisorAgent(rules)
     
     # Agent workflow: Climate → Ecology → Sustainability
-    system.log_message("System", f"🚀 Arjuna.exe initiated for {city_data['city']}", city_data)
+    system.log_message("System", "🚀 Arjuna.exe initiated for {city}", city_data, city=city_data['city'])
     
     # Step 1: Climate Analysis
     climate_analysis = climate_agent.analyze_climate(city_data, system)
@@ -3,14 +3,23 @@
 Streamlit Application with Multi-Agent System Integration
 """
 
+import hashlib
+import time
 import streamlit as st
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import folium
-from streamlit_folium import st_folium
 import plotly.express as px
 import plotly.graph_objects as go
-from agents import run_arjuna_workflow, process_natural_language_query
+from agents import AgentEvent, run_arjuna_workflow, process_natural_language_query
+from batch import run_arjuna_batch
+from sweep import SCENARIO_RANGES, run_sweep, sensitivity_surface
+
+CITY_DATA_FILE = 'city_data.csv'
+# A sweep of every city at 41 points per factor is ~40 MiB, so keep only a few recent ones
+SWEEP_CACHE_ENTRIES = 4
+SWEEP_CACHE_TTL = 15 * 60  # seconds
 
 # Page configuration
 st.set_page_config(
@@ -48,10 +57,56 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+def file_hash(path):
+    """SHA-256 of a file's contents, used to key every cache derived from it"""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+@st.cache_data
+def load_city_data(data_hash):
+    """Load and cache city data (reloaded when the file's hash changes)"""
+    return pd.read_csv(CITY_DATA_FILE)
+
+@st.cache_data
+def score_all_cities(data_hash, _df):
+    """Agent scores for every city in one batch, computed once per city-data file"""
+    return run_arjuna_batch(_df)
+
+@st.cache_data(max_entries=256)
+def analyze_city(city_items):
+    """
+    Run the agent workflow once per distinct (possibly scenario-modified) city.
+    Only the recommendations and the untimed agent messages are cached; see agent_timeline.
+    """
+    recommendations, conversation_log = run_arjuna_workflow(dict(city_items))
+    return recommendations, [(msg.agent, msg.template, msg.args, msg.data) for msg in conversation_log]
+
+def agent_timeline(city_items, messages):
+    """Agent messages stamped with the time this session started the current analysis (never cached)"""
+    if st.session_state.get('analysis_items') != city_items:
+        st.session_state['analysis_items'] = city_items
+        st.session_state['analysis_time'] = time.time()
+    return [AgentEvent(*message, st.session_state['analysis_time']) for message in messages]
+
+@st.cache_data(max_entries=SWEEP_CACHE_ENTRIES, ttl=SWEEP_CACHE_TTL)
+def sweep_scenarios(data_hash, cities, ranges, points, _df):
+    """Tidy results of a scenario sweep, cached per data file, city set, ranges and resolution"""
+    deltas = {name: np.linspace(low, high, points) for name, (low, high) in ranges}
+    return run_sweep(_df[_df['city'].isin(cities)], deltas)
+
+SWEEP_TABLE_COLUMNS = ['city', 'temperature_delta', 'rainfall_delta', 'green_cover_delta',
+                       'green_resilience_score', 'water_demand_per_tree', 'trees_to_plant',
+                       'total_cost_estimate', 'heat_stress', 'water_stress']
+
+@st.cache_data(max_entries=SWEEP_CACHE_ENTRIES, ttl=SWEEP_CACHE_TTL)
+def sweep_csv(data_hash, cities, ranges, points, _df):
+    """CSV export of a sweep, encoded once rather than on every rerun"""
+    return sweep_scenarios(data_hash, cities, ranges, points, _df)[SWEEP_TABLE_COLUMNS].to_csv(index=False)
+
 @st.cache_data
-def load_city_data():
-    """Load and cache city data"""
-    return pd.read_csv('city_data.csv')
+def city_map_html(data_hash, selected_city, _df):
+    """Rendered folium map HTML, rebuilt only when the data or the highlighted city changes"""
+    return create_city_map(_df, selected_city).get_root().render()
 
 def create_metrics_dashboard(city_data, recommendations):
     """Create metrics dashboard with visualizations"""
@@ -232,6 +287,74 @@ def display_recommendations(recommendations):
         for risk in risks:
             st.write(f"• {risk}")
 
+SWEEP_LABELS = {
+    "temperature": "Temperature change (°C)",
+    "rainfall": "Rainfall change (mm)",
+    "green_cover": "Green cover change (%)",
+}
+SWEEP_METRICS = {
+    "green_resilience_score": "Green Resilience Score",
+    "water_demand_per_tree": "Water demand (L/tree/week)",
+    "trees_to_plant": "Trees to plant",
+    "total_cost_estimate": "Cost estimate (₹)",
+}
+
+def display_scenario_sweep(df, data_hash, selected_city):
+    """Sensitivity surfaces over a grid of scenario deltas"""
+    st.subheader("📐 Scenario Sensitivity Sweep")
+    st.markdown("*Score every combination of climate and planting changes at once*")
+
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        cities = st.multiselect("Cities", df['city'].tolist(), default=[selected_city], key="sweep_cities")
+        ranges = tuple(
+            (name, st.slider(SWEEP_LABELS[name], low, high, (low, high), key=f"sweep_{name}"))
+            for name, (low, high) in SCENARIO_RANGES.items()
+        )
+        points = st.slider("Grid points per factor", 2, 41, 21, key="sweep_points")
+    if not cities:
+        st.info("Select at least one city to run a sweep.")
+        return
+
+    result = sweep_scenarios(data_hash, tuple(cities), ranges, points, df)
+
+    with col2:
+        axis_names = list(SCENARIO_RANGES)
+        c1, c2, c3 = st.columns(3)
+        heatmap_city = c1.selectbox("Heatmap city", cities, key="sweep_heatmap_city")
+        x_axis = c2.selectbox("X axis", axis_names, index=0, format_func=SWEEP_LABELS.get, key="sweep_x")
+        y_axis = c3.selectbox("Y axis", [n for n in axis_names if n != x_axis], format_func=SWEEP_LABELS.get, key="sweep_y")
+        metric = st.selectbox("Metric", list(SWEEP_METRICS), format_func=SWEEP_METRICS.get, key="sweep_metric")
+
+        fixed = {}
+        for name in axis_names:
+            if name not in (x_axis, y_axis):
+                values = np.unique(result[f"{name}_delta"]).tolist()
+                fixed[name] = st.select_slider(f"Hold {SWEEP_LABELS[name]} at", values, format_func="{:.2f}".format,
+                                               key=f"sweep_fixed_{name}")
+
+        surface = sensitivity_surface(result, heatmap_city, x_axis, y_axis, metric, fixed)
+        fig_heatmap = px.imshow(
+            surface,
+            x=surface.columns.round(2),
+            y=surface.index.round(2),
+            origin="lower",
+            aspect="auto",
+            color_continuous_scale="RdYlGn_r" if metric in ("water_demand_per_tree", "total_cost_estimate") else "RdYlGn",
+            labels={"x": SWEEP_LABELS[x_axis], "y": SWEEP_LABELS[y_axis], "color": SWEEP_METRICS[metric]},
+            title=f"{SWEEP_METRICS[metric]} for {heatmap_city}",
+        )
+        st.plotly_chart(fig_heatmap, width='stretch')
+
+    st.caption(f"{len(result):,} scenarios evaluated ({len(cities)} cities × {points}³ grid points)")
+    st.dataframe(result[SWEEP_TABLE_COLUMNS], width='stretch', height=300)
+    st.download_button(
+        label="📥 Download Sweep CSV",
+        data=sweep_csv(data_hash, tuple(cities), ranges, points, df),
+        file_name="arjuna_scenario_sweep.csv",
+        mime="text/csv"
+    )
+
 def simulate_scenario(city_data, scenario_type, change_value):
     """Simulate future scenarios"""
     modified_data = city_data.copy()
@@ -252,7 +375,8 @@ def main():
     st.markdown("*Intelligent multi-agent system for urban greenery monitoring and optimization*")
     
     # Load data
-    df = load_city_data()
+    data_hash = file_hash(CITY_DATA_FILE)
+    df = load_city_data(data_hash)
     
     # Sidebar controls
     st.sidebar.header("🎛️ Control Panel")
@@ -289,7 +413,9 @@ def main():
     
     # Run Arjuna workflow
     with st.spinner(f"🚀 Arjuna.exe analyzing {selected_city}..."):
-        recommendations, conversation_log = run_arjuna_workflow(city_data)
+        city_items = tuple(city_data.items())
+        recommendations, messages = analyze_city(city_items)
+        conversation_log = agent_timeline(city_items, messages)
     
     # Main dashboard
     col1, col2 = st.columns([2, 1])
@@ -302,7 +428,7 @@ def main():
         st.subheader("📊 Environmental Profile")
         city_df = df[df['city'] == selected_city]
         fig = create_environmental_chart(city_df)
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(fig, width='stretch')
     
     with col2:
         # Resilience score gauge
@@ -326,7 +452,7 @@ def main():
                     'value': 75}}))
         
         fig_gauge.update_layout(height=300)
-        st.plotly_chart(fig_gauge, use_container_width=True)
+        st.plotly_chart(fig_gauge, width='stretch')
     
     # Agent conversation timeline
     st.markdown("---")
@@ -344,28 +470,24 @@ def main():
     
     with tab1:
         # Focus on selected city
-        city_map = create_city_map(df, selected_city)
-        st_folium(city_map, width=700, height=400)
+        st.iframe(city_map_html(data_hash, selected_city, df), width=700, height=400)
         
         st.info(f"📍 **{selected_city}** is highlighted with a purple circle. Marker colors indicate green cover levels: 🟢 High (35%+), 🟠 Medium (25-35%), 🔴 Low (<25%)")
     
     with tab2:
         # Show all cities
-        all_cities_map = create_city_map(df)
-        st_folium(all_cities_map, width=700, height=400)
+        st.iframe(city_map_html(data_hash, None, df), width=700, height=400)
         
         # Cities comparison chart
         st.subheader("🏙️ Cities Comparison")
         comparison_df = df.copy()
         
-        # Calculate resilience scores for all cities
-        resilience_scores = []
-        for _, row in comparison_df.iterrows():
-            city_dict = row.to_dict()
-            temp_recommendations, _ = run_arjuna_workflow(city_dict)
-            resilience_scores.append(temp_recommendations.get('green_resilience_score', 0))
-        
-        comparison_df['Resilience Score'] = resilience_scores
+        # Resilience scores for all cities come from the cache; only the scenario city is recomputed
+        comparison_df['Resilience Score'] = score_all_cities(data_hash, df)['green_resilience_score'].to_numpy()
+        if scenario_enabled:
+            selected = comparison_df['city'] == selected_city
+            comparison_df.loc[selected, 'green_cover'] = city_data['green_cover']
+            comparison_df.loc[selected, 'Resilience Score'] = recommendations.get('green_resilience_score', 0)
         
         fig_comparison = px.bar(
             comparison_df, 
@@ -375,7 +497,11 @@ def main():
             barmode='group',
             color_discrete_sequence=['#4CAF50', '#FF6B35']
         )
-        st.plotly_chart(fig_comparison, use_container_width=True)
+        st.plotly_chart(fig_comparison, width='stretch')
+    
+    # Scenario sweep
+    st.markdown("---")
+    display_scenario_sweep(df, data_hash, selected_city)
     
     # Natural Language Query Interface
     st.markdown("---")
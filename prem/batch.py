@@ -0,0 +1,197 @@
+"""
+Columnar batch engine for the Arjuna.exe agent workflow.
+
+Scores many cities or wards at once from columns of temperature, humidity,
+rainfall and green_cover, using np.select/np.where and the compiled rule
+tables (rules.py) over whole arrays instead of walking the agents one city
+at a time. The results match run_arjuna_workflow exactly; test_batch.py
+proves it with property-based tests against the original if/elif helpers, and a large random run is one command:
+
+    python -m pytest test_batch.py
+    python batch.py check --rows 200000
+"""
+
+import argparse
+import sys
+from typing import Dict, Any
+
+import numpy as np
+import pandas as pd
+
+from agents import (
+    ArjunaAgentSystem,
+    NullSink,
+    ClimateAnalystAgent,
+    EcologicalPlannerAgent,
+    SustainabilityAdvisorAgent,
+)
+from rules import get_rules
+
+INPUT_COLUMNS = ["temperature", "humidity", "rainfall", "green_cover"]
+
+# Scalar outputs of the three agents, in the order they are produced
+OUTPUT_COLUMNS = [
+    "heat_stress", "water_stress", "humidity_level", "water_demand_per_tree",
+    "climate_challenge", "growing_season",
+    "primary_species", "target_green_cover", "trees_to_plant",
+    "intervention_strategy", "planting_season", "maintenance_level",
+    "green_resilience_score", "total_cost_estimate", "watering_schedule",
+]
+
+def round_half_even(values: np.ndarray, digits: int = 1) -> np.ndarray:
+    """
+    Python's round(x, digits) for float arrays.
+
+    np.round scales by 10**digits before rounding, which can move a value
+    across a .5 boundary; those near-ties are rounded with Python's round
+    so every element matches the scalar agents bit for bit.
+    """
+    scale = 10.0 ** digits
+    scaled = values * scale
+    result = np.rint(scaled) / scale
+    near_tie = np.abs(np.abs(scaled - np.floor(scaled)) - 0.5) < 1e-6
+    if near_tie.any():
+        result[near_tie] = [round(float(v), digits) for v in values[near_tie]]
+    return result
+
+def _select(conditions, choices, default) -> pd.Categorical:
+    """
+    np.select over label strings, returned as a Categorical: the first
+    matching condition wins, like the agents' if/elif chains. Selecting
+    integer codes avoids building millions of Python strings.
+    """
+    codes = np.select(conditions, np.arange(len(choices), dtype=np.int8), np.int8(len(choices)))
+    return pd.Categorical.from_codes(codes, categories=[*choices, default])
+
+def _classify(value, high, moderate, above=True):
+    """High/Moderate/Low bands with the same strict comparisons as the agents."""
+    if above:
+        return _select([value > high, value > moderate], ["High", "Moderate"], "Low")
+    return _select([value < high, value < moderate], ["High", "Moderate"], "Low")
+
+def run_arjuna_batch(data) -> pd.DataFrame:
+    """
+    Runs the Climate → Ecology → Sustainability scoring for every row.
+
+    ``data`` is a DataFrame or a mapping of equal-length arrays with the
+    columns temperature, humidity, rainfall and green_cover (a ``city``
+    column is carried through). Returns one row per input with the scalar
+    fields of the agents' outputs; the index of a DataFrame is kept.
+    """
+    frame = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+    missing = [c for c in INPUT_COLUMNS if c not in frame.columns]
+    if missing:
+        raise ValueError(f"Missing input columns: {', '.join(missing)}")
+    temp, humidity, rainfall, green_cover = (frame[c].to_numpy(dtype=np.float64) for c in INPUT_COLUMNS)
+
+    # Climate Analyst
+    heat_stress = _classify(temp, 35, 30)
+    water_stress = _classify(rainfall, 15, 30, above=False)
+    humidity_level = _classify(humidity, 65, 45)
+    water_demand = round_half_even(100 * (1.0 + (temp - 25) * 0.05) * np.maximum(0.3, 1.0 - rainfall * 0.02))
+    columns = {
+        "temperature": temp, "humidity": humidity, "rainfall": rainfall, "green_cover": green_cover,
+        "heat_stress": heat_stress, "water_stress": water_stress, "humidity_level": humidity_level,
+        "water_demand_per_tree": water_demand,
+    }
+    rules = get_rules()
+    climate_challenge = rules["climate_challenge"].categorical(columns)
+    growing_season = columns["growing_season"] = rules["growing_season"].categorical(columns)
+    high_heat = heat_stress == "High"
+    high_water = water_stress == "High"
+
+    # Ecological Planner
+    primary_species = rules["recommended_species"].categorical(columns, key=lambda species: species[0])
+    target_green_cover = np.minimum(50, green_cover + 8)
+    trees_to_plant = np.trunc((target_green_cover - green_cover) * 100).astype(np.int64)
+    intervention_strategy = rules["intervention_strategy"].categorical(columns)
+    planting_season = rules["planting_season"].categorical(columns)
+    maintenance_level = rules["maintenance_level"].categorical(columns)
+
+    # Sustainability Advisor
+    temp_score = np.maximum(0, 100 - (temp - 25) * 3)
+    rain_score = np.minimum(100, rainfall * 2)
+    green_score = np.minimum(100, green_cover * 2.5)
+    stress_penalty = np.where(high_heat, 15, 0) + np.where(high_water, 10, 0)
+    resilience_score = round_half_even(np.maximum(0, (temp_score + rain_score + green_score) / 3 - stress_penalty))
+    # The agent looks the multiplier up by "High"/"Moderate"/"Low", but
+    # maintenance_level is a full sentence, so it always falls back to 1.5.
+    total_cost = trees_to_plant * 500 * 1.5
+    watering_schedule = rules["watering_schedule"].categorical(columns)
+
+    result = pd.DataFrame({
+        "heat_stress": heat_stress,
+        "water_stress": water_stress,
+        "humidity_level": humidity_level,
+        "water_demand_per_tree": water_demand,
+        "climate_challenge": climate_challenge,
+        "growing_season": growing_season,
+        "primary_species": primary_species,
+        "target_green_cover": target_green_cover,
+        "trees_to_plant": trees_to_plant,
+        "intervention_strategy": intervention_strategy,
+        "planting_season": planting_season,
+        "maintenance_level": maintenance_level,
+        "green_resilience_score": resilience_score,
+        "total_cost_estimate": total_cost,
+        "watering_schedule": watering_schedule,
+    }, index=frame.index)
+    if "city" in frame.columns:
+        result.insert(0, "city", frame["city"])
+    return result
+
+def run_scalar(city_data: Dict) -> Dict[str, Any]:
+    """The same fields from the scalar agents, for one city (used to verify the batch engine)."""
+    system = ArjunaAgentSystem(NullSink())
+    rules = get_rules()
+    climate = ClimateAnalystAgent(rules).analyze_climate(city_data, system)
+    plan = EcologicalPlannerAgent(rules).plan_ecology(city_data, climate, system)
+    advice = SustainabilityAdvisorAgent(rules).advise_sustainability(city_data, climate, plan, system)
+    merged = {**climate, **plan, **advice, "primary_species": plan["recommended_species"][0]}
+    return {column: merged[column] for column in OUTPUT_COLUMNS}
+
+def random_inputs(rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Random cities that hit every branch: a third on integer values
+    (including each threshold exactly), a third on one decimal and a
+    third on arbitrary floats.
+    """
+    rng = np.random.default_rng(seed)
+    ranges = {"temperature": (15, 45), "humidity": (20, 95), "rainfall": (0, 70), "green_cover": (0, 60)}
+    columns = {}
+    for name, (low, high) in ranges.items():
+        values = rng.uniform(low, high, rows)
+        third = rows // 3
+        values[:third] = np.round(values[:third])
+        values[third:2 * third] = np.round(values[third:2 * third], 1)
+        columns[name] = values
+    return pd.DataFrame(columns)
+
+def check_equivalence(rows: int, seed: int = 0) -> int:
+    """Compares the batch engine with the scalar agents on random inputs; returns the number of mismatches."""
+    inputs = random_inputs(rows, seed)
+    batch = run_arjuna_batch(inputs).to_dict("records")
+    mismatches = 0
+    for i, city_data in enumerate(inputs.to_dict("records")):
+        expected = run_scalar({"city": f"City {i}", **city_data})
+        actual = batch[i]
+        for column in OUTPUT_COLUMNS:
+            if expected[column] != actual[column]:
+                mismatches += 1
+                if mismatches <= 10:
+                    print(f"❌ row {i} {column}: scalar {expected[column]!r} vs batch {actual[column]!r} for {city_data}")
+    return mismatches
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    check = subparsers.add_parser("check", help="Verify the batch engine against the scalar agents on random cities.")
+    check.add_argument("--rows", type=int, default=100000)
+    check.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    mismatches = check_equivalence(args.rows, args.seed)
+    if mismatches:
+        print(f"❌ {mismatches} mismatching fields over {args.rows} rows.")
+        sys.exit(1)
+    print(f"✅ Batch results identical to the scalar agents for {args.rows} rows.")
@@ -0,0 +1,256 @@
+"""
+Microbenchmark: hard-coded if/elif branching vs the compiled rule tables.
+
+Run from the prem directory:
+
+    python benchmarks/rules.py --rows 100000 --repeat 5
+
+The branching path reproduces the agents' original helper methods (one
+Python call per city and table). The compiled paths evaluate rules.json:
+per city through the agents' helpers (the generated if/elif functions
+DecisionTable.evaluate / evaluate_fields), and per
+column with DecisionTable.codes_batch (outcome codes) and evaluate_batch
+(outcome objects). All paths run the nine tables over the same random
+cities from batch.random_inputs. The last table times the whole
+run_arjuna_workflow per city against the same workflow with the original
+helpers.
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents import (  # noqa: E402
+    ArjunaAgentSystem,
+    ClimateAnalystAgent,
+    EcologicalPlannerAgent,
+    SustainabilityAdvisorAgent,
+    run_arjuna_workflow,
+)
+from batch import random_inputs  # noqa: E402
+from rules import get_rules  # noqa: E402
+
+def classify(value, high, moderate, above=True):
+    if above:
+        return "High" if value > high else "Moderate" if value > moderate else "Low"
+    return "High" if value < high else "Moderate" if value < moderate else "Low"
+
+def climate_inputs(inputs):
+    """Per-city inputs of every table: the raw climate plus the derived fields the agents pass along."""
+    rows = []
+    for city in inputs.to_dict("records"):
+        temp, humidity, rainfall, green_cover = city["temperature"], city["humidity"], city["rainfall"], city["green_cover"]
+        row = {
+            **city,
+            "heat_stress": classify(temp, 35, 30),
+            "water_stress": classify(rainfall, 15, 30, above=False),
+            "humidity_level": classify(humidity, 65, 45),
+            "water_demand_per_tree": round(100 * (1.0 + (temp - 25) * 0.05) * max(0.3, 1.0 - rainfall * 0.02), 1),
+            "trees_to_plant": int((min(50, green_cover + 8) - green_cover) * 100),
+        }
+        row["growing_season"] = branch_growing_season(temp, humidity, rainfall)
+        rows.append(row)
+    return rows
+
+# --- The original branching (agents.py before rules.json), with the helpers' signatures ---
+
+def branch_climate_challenge(temp, rainfall, humidity):
+    if temp > 37 and rainfall < 10:
+        return "Extreme heat + drought conditions - high plant mortality risk"
+    elif temp > 35 and humidity < 40:
+        return "Hot and dry - increased irrigation requirements"
+    elif rainfall > 40 and humidity > 70:
+        return "High moisture - fungal disease risk, good natural watering"
+    elif temp < 28 and rainfall > 25:
+        return "Favorable growing conditions - optimal planting window"
+    else:
+        return "Moderate stress conditions - standard care protocols"
+
+def branch_growing_season(temp, humidity, rainfall):
+    if 25 <= temp <= 32 and 45 <= humidity <= 70 and rainfall >= 20:
+        return "Optimal"
+    elif temp > 36 or rainfall < 8:
+        return "Challenging"
+    else:
+        return "Moderate"
+
+def branch_recommended_species(climate_analysis):
+    if climate_analysis["heat_stress"] == "High" and climate_analysis["water_stress"] == "High":
+        return ["Neem", "Peepal", "Gulmohar", "Bottle Brush"]
+    elif climate_analysis["humidity_level"] == "High":
+        return ["Mango", "Jack Fruit", "Rain Tree", "Ashoka"]
+    else:
+        return ["Banyan", "Oak", "Mahogany", "Silk Cotton"]
+
+def branch_intervention_strategy(green_cover, climate_analysis):
+    if green_cover < 25:
+        return "Aggressive reforestation with native species"
+    elif climate_analysis["heat_stress"] == "High":
+        return "Heat-resistant urban canopy development"
+    elif climate_analysis["water_stress"] == "High":
+        return "Drought-tolerant plantation with micro-irrigation"
+    else:
+        return "Sustainable green belt expansion"
+
+def branch_priority_zones(climate_analysis, green_cover):
+    zones = []
+    if climate_analysis["heat_stress"] == "High":
+        zones.extend(["Commercial areas", "Transport corridors"])
+    if green_cover < 30:
+        zones.extend(["Residential neighborhoods", "Schools"])
+    zones.extend(["Parks", "River banks", "Industrial buffer zones"])
+    return zones[:3]
+
+def branch_planting_season(climate_analysis):
+    if climate_analysis["water_stress"] == "Low":
+        return "Monsoon season (current conditions favorable)"
+    elif climate_analysis["heat_stress"] == "High":
+        return "Post-monsoon (September-November)"
+    else:
+        return "Pre-monsoon (March-May) or Post-monsoon"
+
+def branch_maintenance_level(climate_analysis):
+    if climate_analysis["heat_stress"] == "High" or climate_analysis["water_stress"] == "High":
+        return "High - daily watering, shade protection"
+    elif climate_analysis["growing_season"] == "Optimal":
+        return "Low - natural conditions sufficient"
+    else:
+        return "Moderate - bi-weekly care, seasonal adjustments"
+
+def branch_implementation_risks(climate_analysis, eco_plan):
+    risks = []
+    if climate_analysis["heat_stress"] == "High":
+        risks.append("High sapling mortality due to extreme heat")
+    if climate_analysis["water_stress"] == "High":
+        risks.append("Irrigation system dependency - water shortage risk")
+    if eco_plan["trees_to_plant"] > 500:
+        risks.append("Large scale project - resource management challenges")
+    if not risks:
+        risks.append("Low risk - favorable conditions for implementation")
+    return risks
+
+def branch_watering_schedule(climate_analysis):
+    water_demand = climate_analysis["water_demand_per_tree"]
+    if water_demand > 150:
+        return "Daily watering (early morning + evening), drip irrigation recommended"
+    elif water_demand > 100:
+        return "Alternate day watering, mulching essential"
+    else:
+        return "Twice weekly watering, natural rainfall supplementation"
+
+class BranchingClimateAnalyst(ClimateAnalystAgent):
+    _get_climate_challenge = staticmethod(branch_climate_challenge)
+    _assess_growing_conditions = staticmethod(branch_growing_season)
+
+class BranchingEcologicalPlanner(EcologicalPlannerAgent):
+    _recommend_species = staticmethod(branch_recommended_species)
+    _get_intervention_strategy = staticmethod(branch_intervention_strategy)
+    _prioritize_zones = staticmethod(branch_priority_zones)
+    _optimal_planting_time = staticmethod(branch_planting_season)
+    _assess_maintenance_needs = staticmethod(branch_maintenance_level)
+
+class BranchingSustainabilityAdvisor(SustainabilityAdvisorAgent):
+    _assess_risks = staticmethod(branch_implementation_risks)
+    _create_watering_schedule = staticmethod(branch_watering_schedule)
+
+# Table -> (agent class, helper, the helper's arguments for one city row)
+HELPERS = {
+    "climate_challenge": (ClimateAnalystAgent, "_get_climate_challenge", lambda c: (c["temperature"], c["rainfall"], c["humidity"])),
+    "growing_season": (ClimateAnalystAgent, "_assess_growing_conditions", lambda c: (c["temperature"], c["humidity"], c["rainfall"])),
+    "recommended_species": (EcologicalPlannerAgent, "_recommend_species", lambda c: (c,)),
+    "intervention_strategy": (EcologicalPlannerAgent, "_get_intervention_strategy", lambda c: (c["green_cover"], c)),
+    "priority_zones": (EcologicalPlannerAgent, "_prioritize_zones", lambda c: (c, c["green_cover"])),
+    "planting_season": (EcologicalPlannerAgent, "_optimal_planting_time", lambda c: (c,)),
+    "maintenance_level": (EcologicalPlannerAgent, "_assess_maintenance_needs", lambda c: (c,)),
+    "implementation_risks": (SustainabilityAdvisorAgent, "_assess_risks", lambda c: (c, c)),
+    "watering_schedule": (SustainabilityAdvisorAgent, "_create_watering_schedule", lambda c: (c,)),
+}
+BRANCHING = {
+    ClimateAnalystAgent: BranchingClimateAnalyst,
+    EcologicalPlannerAgent: BranchingEcologicalPlanner,
+    SustainabilityAdvisorAgent: BranchingSustainabilityAdvisor,
+}
+
+def branching_workflow(city_data):
+    """run_arjuna_workflow with the original if/elif helpers"""
+    system = ArjunaAgentSystem()
+    system.log_message("System", "🚀 Arjuna.exe initiated for {city}", city_data, city=city_data['city'])
+    climate_analysis = BranchingClimateAnalyst().analyze_climate(city_data, system)
+    eco_plan = BranchingEcologicalPlanner().plan_ecology(city_data, climate_analysis, system)
+    final_recommendations = BranchingSustainabilityAdvisor().advise_sustainability(
+        city_data, climate_analysis, eco_plan, system
+    )
+    system.log_message("System", "✅ Multi-agent analysis complete. Recommendations generated.", {})
+    return final_recommendations, system.conversation_log
+
+def measure(fn, repeat):
+    timings = np.array(timeit.repeat(fn, number=1, repeat=repeat)) * 1e3
+    return np.median(timings), np.percentile(timings, 90)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rules = get_rules()
+    inputs = random_inputs(args.rows, args.seed)
+    cities = climate_inputs(inputs)
+    # Label columns as Categoricals, the way batch.run_arjuna_batch passes them
+    columns = {}
+    for name in cities[0]:
+        values = [city[name] for city in cities]
+        columns[name] = pd.Categorical(values) if isinstance(values[0], str) else np.array(values, dtype=np.float64)
+    workflow_cities = [{"city": f"City {i}", **city} for i, city in enumerate(inputs.to_dict("records"))]
+    print(f"inputs: {args.rows:,} random cities, {len(HELPERS)} tables")
+
+    # Each path calls the agents' helpers with the arguments the agents pass
+    calls = {}
+    for name, (agent_class, helper, arguments) in HELPERS.items():
+        helper_args = [arguments(city) for city in cities]
+        calls[name] = (
+            getattr(BRANCHING[agent_class](), helper),
+            getattr(agent_class(rules), helper),
+            helper_args,
+        )
+        expected = [calls[name][0](*a) for a in helper_args]
+        scalar = [calls[name][1](*a) for a in helper_args]
+        batch = rules.evaluate_batch(name, columns).tolist()
+        if expected != scalar or expected != batch:
+            mismatches = sum(e != s or e != b for e, s, b in zip(expected, scalar, batch))
+            sys.exit(f"❌ {name}: {mismatches} cities differ from the branching.")
+    for city in workflow_cities[:10000]:
+        if run_arjuna_workflow(city)[0] != branching_workflow(city)[0]:
+            sys.exit(f"❌ Workflow results differ from the branching for {city}.")
+    print("✅ Outputs are identical.")
+
+    tables = [rules[name] for name in HELPERS]
+    paths = [
+        ("if/elif", lambda: [[branch(*a) for a in helper_args] for branch, _, helper_args in calls.values()]),
+        ("rule tables", lambda: [[compiled(*a) for a in helper_args] for _, compiled, helper_args in calls.values()]),
+        ("evaluate_batch", lambda: [table.evaluate_batch(columns) for table in tables]),
+        ("codes_batch", lambda: [table.codes_batch(columns) for table in tables]),
+    ]
+    print(f"{'helpers':<16}{'median ms':>12}{'p90 ms':>12}{'ns/city/table':>16}")
+    for name, fn in paths:
+        median, p90 = measure(fn, args.repeat)
+        print(f"{name:<16}{median:>12.2f}{p90:>12.2f}{median * 1e6 / (args.rows * len(tables)):>16.1f}")
+
+    # End to end: the interactive path, one run_arjuna_workflow per city
+    paths = [
+        ("if/elif", lambda: [branching_workflow(city) for city in workflow_cities]),
+        ("rule tables", lambda: [run_arjuna_workflow(city) for city in workflow_cities]),
+    ]
+    print(f"{'workflow':<16}{'median ms':>12}{'p90 ms':>12}{'us/city':>16}")
+    for name, fn in paths:
+        median, p90 = measure(fn, args.repeat)
+        print(f"{name:<16}{median:>12.2f}{p90:>12.2f}{median * 1e3 / args.rows:>16.2f}")
+
+if __name__ == "__main__":
+    main()
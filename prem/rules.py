@@ -0,0 +1,331 @@
+"""
+Declarative decision tables for the Arjuna.exe agents.
+
+The thresholds behind the agents' qualitative recommendations live in
+rules.json, so they can be tuned without touching code. Each table is
+compiled twice at load. For one city, the rules become a generated
+if/elif function, as fast as hand-written branching. For columns, every
+input field is cut into bins at the thresholds its rules mention and the
+outcome of every combination of bins is precomputed into a flat array;
+whole columns are then scored with np.searchsorted and one fancy index.
+The file is reloaded when it changes on disk (checked at most once per
+RELOAD_CHECK_SECONDS).
+
+Table format (see rules.json):
+    "mode":  "first"   - value of the first matching rule, else "default"
+             "collect" - the "then" lists of every matching rule joined
+                         (cut to "limit" items), or "default" if none match
+    "rules": [{"when": {...}, "then": value}, ...]
+    "when":  {"field": {">": 30, "<=": 40}}  numeric comparisons (all must hold)
+             {"field": "High"}               equality with a label
+             {"any": [{...}, {...}]}         at least one condition must hold
+             {}                              always matches
+
+Validate a rules file and show the compiled table sizes with:
+
+    python rules.py check [--file rules.json] [--source]
+"""
+
+import argparse
+import itertools
+import json
+import keyword
+import math
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Mapping
+
+import numpy as np
+import pandas as pd
+
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules.json")
+OPERATORS = (">", ">=", "<", "<=")
+MODES = ("first", "collect")
+# Refuse tables whose compiled array would be unreasonably large
+MAX_CELLS = 1_000_000
+
+class NumericField:
+    """
+    A numeric input cut into bins at its thresholds.
+
+    ``x >= t`` / ``x < t`` cut at t with t in the upper bin, ``x > t`` /
+    ``x <= t`` just above t (at the next float), so t stays in the lower
+    bin. A value's bin is the number of cuts at or below it.
+    """
+
+    def __init__(self, name: str, clauses):
+        self.name = name
+        for op, threshold in clauses:
+            if isinstance(threshold, bool) or not isinstance(threshold, (int, float)):
+                raise ValueError(f"'{name}' {op} {threshold!r}: thresholds must be numbers")
+        self.cuts = sorted({self._cut(op, t) for op, t in clauses})
+        self.n_bins = len(self.cuts) + 1
+        self._cut_array = np.array(self.cuts, dtype=np.float64)
+
+    @staticmethod
+    def _cut(op: str, threshold) -> float:
+        threshold = float(threshold)
+        return threshold if op in (">=", "<") else math.nextafter(threshold, math.inf)
+
+    def representatives(self) -> list:
+        """One value inside each bin, in bin order"""
+        return [-math.inf, *self.cuts]
+
+    def bins(self, values) -> np.ndarray:
+        return np.searchsorted(self._cut_array, np.asarray(values, dtype=np.float64), "right")
+
+class _Other:
+    """Stands for every label no rule names; equal to nothing"""
+
+    def __repr__(self):
+        return "<other label>"
+
+class LabelField:
+    """A categorical input; labels not named by any rule share one extra bin."""
+
+    def __init__(self, name: str, labels):
+        self.name = name
+        self.labels = sorted(set(labels), key=repr)
+        self._index = {label: i for i, label in enumerate(self.labels)}
+        self.n_bins = len(self.labels) + 1
+
+    def representatives(self) -> list:
+        return [*self.labels, _Other()]
+
+    def bins(self, values) -> np.ndarray:
+        other = len(self.labels)
+        if isinstance(values, pd.Categorical):
+            # Map the (few) categories, then index by code; code -1 (missing) hits the last entry
+            lookup = np.array([self._index.get(c, other) for c in values.categories] + [other], dtype=np.intp)
+            return lookup[values.codes]
+        codes = pd.Categorical(values, categories=self.labels).codes.astype(np.intp)
+        codes[codes < 0] = other
+        return codes
+
+def _clauses(when: Mapping, found: Dict[str, List]):
+    """Collects (operator, value) clauses per field from a condition, including nested "any" groups."""
+    for field, condition in when.items():
+        if field == "any":
+            for option in condition:
+                _clauses(option, found)
+        elif isinstance(condition, dict):
+            for op, threshold in condition.items():
+                if op not in OPERATORS:
+                    raise ValueError(f"Unknown operator '{op}' for '{field}'; use one of {', '.join(OPERATORS)}")
+                found.setdefault(field, []).append((op, threshold))
+        else:
+            found.setdefault(field, []).append(("==", condition))
+
+class _Source:
+    """Python source of one table's rules as if/elif code, with non-literal constants bound by name"""
+
+    def __init__(self, constants: Dict[str, Any], access: Callable[[str], str]):
+        self.constants = constants
+        self.access = access
+
+    def constant(self, value) -> str:
+        # Scalars become literals (as fast as hand-written code); anything else is bound by name
+        if value is None or isinstance(value, (str, bool, int)) or (isinstance(value, float) and math.isfinite(value)):
+            return repr(value)
+        name = f"_c{len(self.constants)}"
+        self.constants[name] = value
+        return name
+
+    def condition(self, when: Mapping) -> str:
+        tests = []
+        for field, condition in when.items():
+            if field == "any":
+                tests.append("(" + " or ".join(self.condition(option) for option in condition) + ")")
+            elif isinstance(condition, dict):
+                for op, threshold in condition.items():
+                    tests.append(f"{self.access(field)} {op} {self.constant(threshold)}")
+            else:
+                tests.append(f"{self.access(field)} == {self.constant(condition)}")
+        return " and ".join(tests) or "True"
+
+    def outcome(self, value) -> str:
+        # Lists are handed out as fresh copies, like the literals of hand-written rules
+        name = self.constant(value)
+        return f"{name}.copy()" if isinstance(value, list) else name
+
+    def body(self, mode: str, rules, default, limit) -> List[str]:
+        lines = []
+        if mode == "first":
+            for rule in rules:
+                lines.append(f"    if {self.condition(rule.get('when', {}))}:")
+                lines.append(f"        return {self.outcome(rule['then'])}")
+            lines.append(f"    return {self.outcome(default)}")
+            return lines
+        lines.append("    collected = []")
+        for rule in rules:
+            condition = self.condition(rule.get("when", {}))
+            if condition == "True":
+                lines.append(f"    collected += {self.constant(rule['then'])}")
+            else:
+                lines.append(f"    if {condition}:")
+                lines.append(f"        collected += {self.constant(rule['then'])}")
+        if limit is not None:
+            lines.append(f"    collected = collected[:{int(limit)}]")
+        lines.append(f"    return collected or {self.outcome(default)}")
+        return lines
+
+class DecisionTable:
+    """
+    One rule table, compiled two ways from the same rules.
+
+    A single city is evaluated by ``evaluate(values)`` or
+    ``evaluate_fields(**fields)``, functions generated from the rules as
+    plain if/elif code, so they cost what the hand-written branching did
+    (use whichever avoids building a dict at the call site). Columns are evaluated through ``codes``, a dense array of
+    outcome codes over the bins of the table's fields, filled by running
+    that same function once per bin combination.
+    """
+
+    def __init__(self, name: str, spec: Mapping[str, Any]):
+        self.name = name
+        self.mode = spec.get("mode", "first")
+        if self.mode not in MODES:
+            raise ValueError(f"Table '{name}': unknown mode '{self.mode}'; use one of {', '.join(MODES)}")
+        self.limit = spec.get("limit")
+        self.default = spec.get("default", [] if self.mode == "collect" else None)
+        rules = spec.get("rules", [])
+
+        found = {}
+        for rule in rules:
+            _clauses(rule.get("when", {}), found)
+        self.fields = []
+        for field, clauses in found.items():
+            kinds = {op == "==" for op, _ in clauses}
+            if len(kinds) > 1:
+                raise ValueError(f"Table '{name}': '{field}' is compared both as a number and as a label")
+            if kinds == {True}:
+                self.fields.append(LabelField(field, [label for _, label in clauses]))
+            else:
+                self.fields.append(NumericField(field, clauses))
+        self.shape = tuple(field.n_bins for field in self.fields)
+        n_cells = int(np.prod(self.shape, dtype=np.int64))
+        if n_cells > MAX_CELLS:
+            raise ValueError(f"Table '{name}' would compile to {n_cells:,} cells (limit {MAX_CELLS:,})")
+        self._strides = [int(np.prod(self.shape[i + 1:], dtype=np.int64)) for i in range(len(self.shape))]
+
+        self.source, self.evaluate, self.evaluate_fields = self._compile(rules)
+        self.outcomes = []
+        keys = {}
+        codes = np.empty(n_cells, dtype=np.int32)
+        names = [field.name for field in self.fields]
+        for flat, cell in enumerate(itertools.product(*(field.representatives() for field in self.fields))):
+            outcome = self.evaluate(dict(zip(names, cell)))
+            key = json.dumps(outcome)
+            if key not in keys:
+                keys[key] = len(self.outcomes)
+                self.outcomes.append(outcome)
+            codes[flat] = keys[key]
+        self.codes = codes
+
+    def _compile(self, rules) -> tuple:
+        """
+        Generates the scalar entry points from the rules: ``evaluate(values)``
+        reads ``values[field]``; ``evaluate_fields(**fields)`` takes every field
+        the table reads as a keyword argument (extra keywords are ignored).
+        """
+        constants = {}
+        mapping = _Source(constants, lambda field: f"values[{field!r}]")
+        text = "\n".join(["def evaluate(values):", *mapping.body(self.mode, rules, self.default, self.limit)]) + "\n"
+        names = [field.name for field in self.fields]
+        if all(name.isidentifier() and not keyword.iskeyword(name) for name in names) and "_unused" not in names:
+            keywords = _Source(constants, lambda field: field)
+            signature = ", ".join([*names, "**_unused"])
+            text += "\n".join([f"\ndef evaluate_fields({signature}):", *keywords.body(self.mode, rules, self.default, self.limit)]) + "\n"
+        namespace = dict(constants)
+        exec(compile(text, f"<rules.json: {self.name}>", "exec"), namespace)
+        evaluate = namespace["evaluate"]
+        evaluate_fields = namespace.get("evaluate_fields") or (lambda **fields: evaluate(fields))
+        for function, doc in ((evaluate, "The outcome for a mapping of field name to value"),
+                              (evaluate_fields, "The outcome for the fields given as keyword arguments")):
+            function.__qualname__ = f"{self.name}.{function.__name__}"
+            function.__doc__ = doc
+        return text, evaluate, evaluate_fields
+
+    def codes_batch(self, columns: Mapping[str, Any]) -> np.ndarray:
+        """Outcome codes (indices into ``outcomes``) for equal-length columns"""
+        if not self.fields:
+            return np.zeros(len(next(iter(columns.values()))), dtype=np.int32)
+        flat = sum(field.bins(columns[field.name]) * stride for field, stride in zip(self.fields, self._strides))
+        return self.codes[flat]
+
+    def evaluate_batch(self, columns: Mapping[str, Any]) -> np.ndarray:
+        """Outcomes for equal-length columns, as an object array"""
+        outcomes = np.empty(len(self.outcomes), dtype=object)
+        for i, outcome in enumerate(self.outcomes):
+            outcomes[i] = outcome
+        return outcomes[self.codes_batch(columns)]
+
+    def categorical(self, columns: Mapping[str, Any], key: Callable = None) -> pd.Categorical:
+        """Outcomes as a Categorical, optionally mapped through ``key`` (e.g. the first item of a list)"""
+        labels = [key(outcome) if key else outcome for outcome in self.outcomes]
+        categories, inverse = np.unique(np.array(labels, dtype=object).astype(str), return_inverse=True)
+        return pd.Categorical.from_codes(inverse[self.codes_batch(columns)], categories=categories)
+
+class RuleSet(dict):
+    """All decision tables of one rules file, by table name (a plain dict, so lookups stay cheap)"""
+
+    def __init__(self, tables: Mapping[str, Mapping[str, Any]]):
+        super().__init__((name, DecisionTable(name, spec)) for name, spec in tables.items())
+
+    @classmethod
+    def from_file(cls, path: str = RULES_FILE) -> "RuleSet":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @property
+    def tables(self) -> Dict[str, DecisionTable]:
+        return self
+
+    def evaluate(self, name: str, values: Mapping[str, Any] = None, **fields):
+        """Evaluates one table; inputs come from ``values`` and/or keyword arguments (a convenience, not the hot path)"""
+        return self[name].evaluate({**(values or {}), **fields})
+
+    def evaluate_batch(self, name: str, columns: Mapping[str, Any]) -> np.ndarray:
+        return self[name].evaluate_batch(columns)
+
+# Seconds between checks of a rules file's mtime; calls in between reuse the compiled tables
+RELOAD_CHECK_SECONDS = 1.0
+_rules = {}
+_rules_lock = threading.Lock()
+
+def get_rules(path: str = RULES_FILE) -> RuleSet:
+    """The compiled rules of a file, recompiled when the file changes"""
+    now = time.monotonic()
+    cached = _rules.get(path)
+    if cached is not None and now - cached[2] < RELOAD_CHECK_SECONDS:
+        return cached[1]
+    mtime = os.stat(path).st_mtime_ns
+    with _rules_lock:
+        cached = _rules.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, RuleSet.from_file(path), now)
+        else:
+            cached = (mtime, cached[1], now)
+        _rules[path] = cached
+    return cached[1]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    check = subparsers.add_parser("check", help="Compile a rules file and list its tables.")
+    check.add_argument("--file", default=RULES_FILE)
+    check.add_argument("--source", action="store_true", help="Also print the generated Python of each table.")
+    args = parser.parse_args()
+
+    try:
+        rule_set = RuleSet.from_file(args.file)
+    except (ValueError, KeyError, json.JSONDecodeError) as e:
+        print(f"❌ {args.file}: {e}")
+        sys.exit(1)
+    for name, table in rule_set.tables.items():
+        fields = ", ".join(f"{field.name}[{field.n_bins}]" for field in table.fields)
+        print(f"✅ {name:<22} {table.mode:<8} {table.codes.size:>5} cells, {len(table.outcomes)} outcomes  ({fields})")
+        if args.source:
+            print(table.source)
@@ -0,0 +1,92 @@
+"""
+Scenario sweeps for Arjuna.exe.
+
+Evaluates the Cartesian product of scenario deltas (temperature, rainfall,
+green cover) for one or many cities in a single call of the vectorized
+batch engine, and returns a tidy table with one row per city and grid
+point. Time a sweep from the command line:
+
+    python sweep.py --city Delhi --points 21
+"""
+
+import argparse
+import time
+from typing import Dict, Sequence
+
+import numpy as np
+import pandas as pd
+
+from batch import INPUT_COLUMNS, run_arjuna_batch
+
+# Inputs a scenario may shift, in grid order (slider ranges of the app)
+SCENARIO_RANGES = {
+    "temperature": (0, 5),
+    "rainfall": (-20, 30),
+    "green_cover": (0, 15),
+}
+
+def delta_column(name: str) -> str:
+    return f"{name}_delta"
+
+def scenario_grid(deltas: Dict[str, Sequence[float]]) -> pd.DataFrame:
+    """Cartesian product of the deltas per input; inputs that are not given stay at 0"""
+    axes = [np.asarray(deltas.get(name, [0]), dtype=np.float64) for name in SCENARIO_RANGES]
+    mesh = np.meshgrid(*axes, indexing="ij")
+    return pd.DataFrame({delta_column(name): values.ravel() for name, values in zip(SCENARIO_RANGES, mesh)})
+
+def run_sweep(cities: pd.DataFrame, deltas: Dict[str, Sequence[float]]) -> pd.DataFrame:
+    """
+    Scores every city under every combination of deltas.
+
+    Deltas are added the way simulate_scenario applies a slider, so each row
+    equals running the agents on that modified city. Returns the city, the
+    deltas, the modified inputs and the agents' scalar outputs.
+    """
+    grid = scenario_grid(deltas)
+    n_cities, n_points = len(cities), len(grid)
+    city_rows = cities.reset_index(drop=True)
+    sweep = pd.DataFrame({
+        "city": np.repeat(city_rows["city"].to_numpy(), n_points),
+        **{name: np.tile(grid[name].to_numpy(), n_cities) for name in grid.columns},
+    })
+    for name in INPUT_COLUMNS:
+        values = np.repeat(city_rows[name].to_numpy(dtype=np.float64), n_points)
+        if name in SCENARIO_RANGES:
+            values = values + sweep[delta_column(name)].to_numpy()
+        sweep[name] = values
+    scores = run_arjuna_batch(sweep[INPUT_COLUMNS])
+    return pd.concat([sweep, scores], axis=1)
+
+def sensitivity_surface(result: pd.DataFrame, city: str, x: str, y: str,
+                        metric: str = "green_resilience_score", fixed: Dict[str, float] = None) -> pd.DataFrame:
+    """
+    A (y × x) table of one metric for one city, for a heatmap. The other
+    scenario input is held at the grid value nearest to the one in ``fixed``
+    (default: its smallest delta).
+    """
+    rows = result[result["city"] == city]
+    for name in SCENARIO_RANGES:
+        if name in (x, y):
+            continue
+        column = delta_column(name)
+        grid = np.unique(rows[column].to_numpy())
+        value = (fixed or {}).get(name, grid[0])
+        rows = rows[rows[column] == grid[np.abs(grid - value).argmin()]]
+    return rows.pivot_table(index=delta_column(y), columns=delta_column(x), values=metric)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--city", action="append", help="City from city_data.csv (repeatable; default: all)")
+    parser.add_argument("--points", type=int, default=21, help="Grid points per scenario input")
+    args = parser.parse_args()
+
+    cities = pd.read_csv("city_data.csv")
+    if args.city:
+        cities = cities[cities["city"].isin(args.city)]
+    deltas = {name: np.linspace(low, high, args.points) for name, (low, high) in SCENARIO_RANGES.items()}
+    start = time.perf_counter()
+    result = run_sweep(cities, deltas)
+    elapsed = time.perf_counter() - start
+    print(f"✅ {len(result):,} scenarios ({len(cities)} cities × {args.points}³ grid) in {elapsed * 1000:.0f} ms")
+    summary = result.groupby("city")["green_resilience_score"].agg(["min", "mean", "max"])
+    print(summary.round(1).to_string())
@@ -0,0 +1,79 @@
+"""
+Property-based equivalence of the batch engine and the scalar agents.
+
+Both are checked against the original hand-written if/elif helpers
+(benchmarks/rules.py), which do not read rules.json, so a wrong rule table
+cannot pass by agreeing with itself.
+
+    python -m pytest test_batch.py
+"""
+
+import itertools
+
+import pandas as pd
+from hypothesis import example, given, settings, strategies as st
+
+from agents import ArjunaAgentSystem, NullSink
+from batch import INPUT_COLUMNS, OUTPUT_COLUMNS, run_arjuna_batch, run_scalar
+from benchmarks.rules import BranchingClimateAnalyst, BranchingEcologicalPlanner, BranchingSustainabilityAdvisor
+
+# Every threshold the agents and rules.json compare each input against
+THRESHOLDS = {
+    "temperature": [25, 28, 30, 32, 35, 36, 37],
+    "humidity": [40, 45, 65, 70],
+    "rainfall": [8, 10, 15, 20, 25, 30, 40],
+    "green_cover": [25, 30, 42, 50],
+}
+RANGES = {"temperature": (-10, 55), "humidity": (0, 100), "rainfall": (0, 300), "green_cover": (0, 100)}
+# All combinations of thresholds and points just above them: every boundary of every rule,
+# exactly on the cut and between cuts (catches a moved threshold in rules.json)
+THRESHOLD_ROWS = [
+    dict(zip(INPUT_COLUMNS, values))
+    for values in itertools.product(*([t + offset for t in thresholds for offset in (0, 0.5)] for thresholds in THRESHOLDS.values()))
+]
+
+def input_value(name):
+    low, high = RANGES[name]
+    return st.one_of(
+        st.sampled_from(THRESHOLDS[name]).map(float),
+        st.tuples(st.sampled_from(THRESHOLDS[name]), st.sampled_from([-0.5, -0.1, 0.1, 0.5])).map(sum),
+        st.integers(low * 10, high * 10).map(lambda v: v / 10),  # one decimal, like city_data.csv
+        st.floats(low, high, allow_nan=False),
+    )
+
+cities = st.lists(st.fixed_dictionaries({name: input_value(name) for name in INPUT_COLUMNS}), min_size=1, max_size=50)
+
+def run_branching(city_data):
+    """The output fields from the agents with the original if/elif helpers (the oracle)"""
+    system = ArjunaAgentSystem(NullSink())
+    climate = BranchingClimateAnalyst().analyze_climate(city_data, system)
+    plan = BranchingEcologicalPlanner().plan_ecology(city_data, climate, system)
+    advice = BranchingSustainabilityAdvisor().advise_sustainability(city_data, climate, plan, system)
+    merged = {**climate, **plan, **advice, "primary_species": plan["recommended_species"][0]}
+    return {column: merged[column] for column in OUTPUT_COLUMNS}
+
+def assert_matches_branching(rows):
+    batch = run_arjuna_batch(pd.DataFrame(rows)).to_dict("records")
+    for i, (city_data, actual) in enumerate(zip(rows, batch)):
+        city_data = {"city": f"City {i}", **city_data}
+        expected = run_branching(city_data)
+        scalar = run_scalar(city_data)
+        for column in OUTPUT_COLUMNS:
+            assert actual[column] == expected[column], f"batch {column} for {city_data}"
+            assert scalar[column] == expected[column], f"scalar {column} for {city_data}"
+
+@settings(deadline=None)
+@given(cities)
+@example(THRESHOLD_ROWS)
+def test_batch_and_scalar_match_branching(rows):
+    assert_matches_branching(rows)
+
+def test_batch_keeps_index_and_city():
+    frame = pd.DataFrame(
+        {"city": ["A", "B"], "temperature": [31.0, 38.5], "humidity": [50.0, 30.0],
+         "rainfall": [22.0, 5.0], "green_cover": [28.0, 12.5]},
+        index=[10, 20],
+    )
+    result = run_arjuna_batch(frame)
+    assert list(result.index) == [10, 20]
+    assert list(result["city"]) == ["A", "B"]
@@ -0,0 +1,200 @@
+# alignment.py
+import hashlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+from rasterio.enums import Resampling
+from rasterio.warp import reproject, transform_bounds
+from rasterio.windows import Window, bounds as window_bounds, from_bounds
+from rasterio.windows import transform as window_transform
+
+from cache import CACHE_DIR, file_checksum, prune_files
+from change import iter_strips
+from metrics import timed
+from mosaic import Mosaic
+
+ALIGNED_DIR = os.path.join(CACHE_DIR, "aligned")
+# Aligned rasters are full float32 mosaics, so they get their own cap rather than evicting rendered products.
+ALIGNED_DISK_BYTES = int(float(os.getenv("PY_SERVER_ALIGNED_DISK_MB", "4096")) * 1024 * 1024)
+RESAMPLING_METHODS = {"nearest": Resampling.nearest, "bilinear": Resampling.bilinear}
+
+def grids_match(a, b):
+    """True when two rasters share CRS, size and (within float tolerance) transform."""
+    return a.crs == b.crs and a.shape == b.shape and a.transform.almost_equals(b.transform)
+
+def describe_mismatch(a, b):
+    """Human-readable list of how two grids differ."""
+    differences = []
+    if a.crs != b.crs:
+        differences.append(f"CRS {a.crs} vs {b.crs}")
+    if a.shape != b.shape:
+        differences.append(f"shape {a.shape} vs {b.shape}")
+    if not a.transform.almost_equals(b.transform):
+        differences.append("transform differs")
+    return ", ".join(differences)
+
+def aligned_path(source, target, resampling: str, directory: str = ALIGNED_DIR):
+    """File of a source resampled onto a target grid; changes when any source tile changes."""
+    payload = {
+        "sources": [file_checksum(path) for path in source.sources],
+        "crs": target.crs.to_string(),
+        "transform": list(target.transform)[:6],
+        "shape": list(target.shape),
+        "resampling": resampling,
+    }
+    digest = hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:20]
+    return os.path.join(directory, f"{source.location}_{source.year}_{digest}.npy")
+
+def mark_used(path):
+    """Refreshes a file's atime for pruning (relatime/noatime mounts wouldn't); raises FileNotFoundError."""
+    os.utime(path, ns=(time.time_ns(), os.stat(path).st_mtime_ns))
+
+_prune_lock = threading.Lock()
+
+@timed("cache")
+def prune_aligned(directory: str = ALIGNED_DIR, max_bytes: int = ALIGNED_DISK_BYTES, keep=()):
+    """
+    Deletes the least recently used aligned rasters once the directory exceeds
+    ``max_bytes`` (0 = unbounded); files in ``keep`` and in-flight builds are
+    left alone. Returns the bytes freed.
+    """
+    with _prune_lock:
+        try:
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            return 0
+        files = []
+        for entry in entries:
+            if not entry.name.endswith(".npy") or entry.name.endswith(".tmp.npy") or entry.path in keep:
+                continue
+            try:
+                files.append((entry.path, entry.stat()))
+            except FileNotFoundError:
+                pass
+        kept = sum(os.stat(path).st_size for path in keep if os.path.exists(path))
+        return prune_files(files, max(max_bytes - kept, 1) if max_bytes else 0)
+
+class AlignedMosaic:
+    """
+    A mosaic resampled onto another mosaic's grid.
+
+    The resampled raster is computed once, in row strips of the target grid,
+    into a memory-mapped .npy file keyed by the source checksums, target grid
+    and resampling method. It exposes the read interface of ``Mosaic`` so the
+    change engine and time-series builder can use it interchangeably.
+    """
+    def __init__(self, source, target, resampling: str = "nearest", directory: str = ALIGNED_DIR):
+        if resampling not in RESAMPLING_METHODS:
+            raise ValueError(f"Unknown resampling '{resampling}'; use one of {sorted(RESAMPLING_METHODS)}.")
+        self.source = source
+        self.location = source.location
+        self.year = source.year
+        self.resampling = resampling
+        self.crs = target.crs
+        self.transform = target.transform
+        self.width = target.width
+        self.height = target.height
+        self.block_shape = target.block_shape
+        self.path = aligned_path(source, target, resampling, directory)
+        try:
+            mark_used(self.path)
+        except FileNotFoundError:
+            self._build(target)
+            prune_aligned(directory, keep=(self.path,))
+        self.data = np.load(self.path, mmap_mode="r")
+
+    def _build(self, target):
+        source = self.source
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp.npy"
+        out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=target.shape)
+        # Bilinear needs a pixel of context around each strip.
+        pad = 1 if self.resampling == "nearest" else 2
+        for strip, start, stop in iter_strips(target, target.full_window):
+            dst = np.full((stop - start, target.width), np.nan, dtype=np.float32)
+            src_bounds = transform_bounds(target.crs, source.crs, *window_bounds(strip, target.transform))
+            src_window = from_bounds(*src_bounds, transform=source.transform)
+            src_window = src_window.round_offsets(op="floor").round_lengths(op="ceil")
+            src_window = Window(src_window.col_off - pad, src_window.row_off - pad,
+                                src_window.width + 2 * pad, src_window.height + 2 * pad)
+            try:
+                src_window = source.clip_window(src_window)
+            except ValueError:
+                out[start:stop] = dst
+                continue
+            reproject(
+                source.read(src_window),
+                dst,
+                src_transform=window_transform(src_window, source.transform),
+                src_crs=source.crs,
+                src_nodata=np.nan,
+                dst_transform=window_transform(strip, target.transform),
+                dst_crs=target.crs,
+                dst_nodata=np.nan,
+                resampling=RESAMPLING_METHODS[self.resampling],
+            )
+            out[start:stop] = dst
+        out.flush()
+        del out
+        os.replace(tmp_path, self.path)
+        print(f"✅ Aligned {source.location} {source.year} onto the {target.location} {target.year} grid "
+              f"({describe_mismatch(source, target)}; {self.resampling}).")
+
+    @property
+    def shape(self):
+        return (self.height, self.width)
+
+    @property
+    def sources(self):
+        return self.source.sources
+
+    @property
+    def full_window(self):
+        return Window(0, 0, self.width, self.height)
+
+    output_shape = staticmethod(Mosaic.output_shape)
+    clip_window = Mosaic.clip_window
+
+    @timed("read")
+    def read(self, window: Window = None, decimation: int = 1):
+        """Reads a window of the aligned raster as float32, NaN for nodata (nearest subsampling when decimated)."""
+        window = window or self.full_window
+        row0, col0 = int(window.row_off), int(window.col_off)
+        height, width = int(window.height), int(window.width)
+        if decimation == 1:
+            return np.array(self.data[row0:row0 + height, col0:col0 + width])
+        out_height, out_width = self.output_shape(window, decimation)
+        rows = row0 + ((np.arange(out_height) + 0.5) * height / out_height).astype(np.int64)
+        cols = col0 + ((np.arange(out_width) + 0.5) * width / out_width).astype(np.int64)
+        return np.array(self.data[np.ix_(rows, cols)])
+
+_aligned = {}
+_aligned_lock = threading.Lock()
+
+def align_to(source, target, resampling: str = "nearest"):
+    """
+    Returns ``source`` unchanged when it already shares ``target``'s grid,
+    otherwise a cached AlignedMosaic of it on that grid.
+    """
+    if grids_match(source, target):
+        return source
+    path = aligned_path(source, target, resampling)
+    with _aligned_lock:
+        aligned = _aligned.get(path)
+    if aligned is not None:
+        try:
+            mark_used(path)
+        except FileNotFoundError:
+            aligned = None  # Pruned; rebuild it.
+    if aligned is None:
+        aligned = AlignedMosaic(source, target, resampling)
+        with _aligned_lock:
+            # Keep one alignment per source/target pair; older ones belong to replaced tiles.
+            pair = (source.location, source.year, resampling, target.crs, target.transform)
+            for stale in [k for k, v in _aligned.items() if (v.location, v.year, v.resampling, v.crs, v.transform) == pair]:
+                del _aligned[stale]
+            _aligned[path] = aligned
+    return aligned
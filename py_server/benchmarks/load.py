@@ -0,0 +1,84 @@
+"""
+Load benchmark: concurrent mixed traffic against a running py_server.
+
+Start the server first (``uvicorn main:app --workers 1``), then run:
+
+    python benchmarks/load.py --url http://127.0.0.1:8000 --concurrency 32 --duration 30
+
+Each client loops over a weighted mix of /predict, /reclassify and
+/calculate_change requests and the script reports p50/p95/p99 latency per
+endpoint, plus how many requests were shed with a 429. Requires httpx.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+import numpy as np
+
+PREDICT_BODY = {
+    "year": 2025, "month": 7, "min_temp_c": 22.5, "max_temp_c": 35.0, "mean_temp_c": 28.2,
+    "total_precip_mm": 150.0, "total_solar_rad_j_m2": 1.5e9, "rainy_days": 15, "location": "Thane",
+}
+
+def build_requests(location):
+    return {
+        "predict": ("/predict", PREDICT_BODY),
+        "reclassify": ("/reclassify", {"location": location, "year": 2018}),
+        "calculate_change": ("/calculate_change", {
+            "request_2018": {"location": location, "year": 2018},
+            "request_2024": {"location": location, "year": 2024},
+        }),
+    }
+
+async def client_loop(client, requests, weights, deadline, results):
+    names = list(requests)
+    while time.perf_counter() < deadline:
+        name = random.choices(names, weights=weights)[0]
+        path, body = requests[name]
+        start = time.perf_counter()
+        try:
+            response = await client.post(path, json=body)
+            status = response.status_code
+        except httpx.HTTPError:
+            status = -1
+        results.append((name, status, time.perf_counter() - start))
+
+async def run(args):
+    requests = build_requests(args.location)
+    weights = [args.predict_weight, args.reclassify_weight, args.change_weight]
+    results = []
+    deadline = time.perf_counter() + args.duration
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        await asyncio.gather(*(client_loop(client, requests, weights, deadline, results) for _ in range(args.concurrency)))
+    return results
+
+def report(results, duration):
+    print(f"{'endpoint':<18}{'ok':>7}{'429':>7}{'err':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name in sorted({r[0] for r in results}):
+        rows = [r for r in results if r[0] == name]
+        ok = np.array([latency for _, status, latency in rows if status == 200]) * 1000
+        shed = sum(1 for _, status, _ in rows if status == 429)
+        errors = len(rows) - len(ok) - shed
+        p50, p95, p99 = np.percentile(ok, [50, 95, 99]) if len(ok) else (float("nan"),) * 3
+        print(f"{name:<18}{len(ok):>7}{shed:>7}{errors:>7}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}")
+    print(f"throughput: {len(results) / duration:.1f} req/s over {duration:.0f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--location", default="Kalyan")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--predict-weight", type=float, default=0.8)
+    parser.add_argument("--reclassify-weight", type=float, default=0.15)
+    parser.add_argument("--change-weight", type=float, default=0.05)
+    args = parser.parse_args()
+    results = asyncio.run(run(args))
+    report(results, args.duration)
+
+if __name__ == "__main__":
+    main()
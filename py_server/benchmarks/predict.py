@@ -0,0 +1,70 @@
+"""
+Microbenchmark: single-row prediction through a DataFrame vs the ndarray hot path.
+
+Run from the py_server directory:
+
+    python benchmarks/predict.py --model plant_health_monthly_model-1000.pkl --repeat 2000
+
+The DataFrame path reproduces the original main.Predictor.predict (one-row
+DataFrame, one-hot loop, column reindex). The hot path is
+ModelPredictor.predict, which fills a preallocated float64 row.
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import PlantHealthFeatures  # noqa: E402
+from predictor import ModelPredictor  # noqa: E402
+
+FEATURES = PlantHealthFeatures(
+    year=2025, month=7, min_temp_c=22.5, max_temp_c=35.0, mean_temp_c=28.2,
+    total_precip_mm=150.0, total_solar_rad_j_m2=1.5e9, rainy_days=15, location="Thane",
+)
+
+def dataframe_predict(predictor, features):
+    input_data = features.model_dump()
+    input_data['location'] = features.location.value
+    input_df = pd.DataFrame([input_data])
+    for loc in predictor.feature_list:
+        if loc.startswith('location_'):
+            input_df[loc] = 0
+    loc_col_name = f"location_{input_data['location']}"
+    if loc_col_name in input_df.columns:
+        input_df[loc_col_name] = 1
+    input_df = input_df[predictor.feature_list]
+    return float(predictor.model.predict(input_df)[0])
+
+def measure(fn, repeat):
+    timings = np.array(timeit.repeat(fn, number=1, repeat=repeat)) * 1e6
+    return np.median(timings), np.percentile(timings, 99)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="plant_health_monthly_model-1000.pkl")
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+
+    predictor = ModelPredictor.from_file(args.model)
+    # Warm up both paths (and sklearn's one-off feature-name warning).
+    dataframe_value = dataframe_predict(predictor, FEATURES)
+    hot_value = predictor.predict(FEATURES)
+    print(f"values: dataframe={dataframe_value:.6f} ndarray={hot_value:.6f}")
+
+    rows = [
+        ("dataframe", lambda: dataframe_predict(predictor, FEATURES)),
+        ("ndarray", lambda: predictor.predict(FEATURES)),
+        ("model only", lambda: predictor.model.predict(np.zeros((1, len(predictor.feature_list))))),
+    ]
+    print(f"{'path':<12}{'median us':>12}{'p99 us':>12}")
+    for name, fn in rows:
+        median, p99 = measure(fn, args.repeat)
+        print(f"{name:<12}{median:>12.1f}{p99:>12.1f}")
+
+if __name__ == "__main__":
+    main()
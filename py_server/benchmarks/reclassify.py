@@ -0,0 +1,80 @@
+"""
+Microbenchmark: mask-based reclassification vs the single-pass classify kernel.
+
+Run from the py_server directory:
+
+    python benchmarks/reclassify.py --location Thane --year 2024 --repeat 20
+
+The mask path reproduces the inline code of the baseline /reclassify
+endpoint (three boolean masks over an int16 array). The kernel is classify.classify, which counts
+edge comparisons straight into a uint8 array. Both run on the full mosaic of the
+location/year; ``--synthetic 4096`` uses a random raster of that size
+instead (with 1% NaN) when the GeoTIFFs are not available.
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classify import DEFAULT_SCHEME, classify  # noqa: E402
+
+def mask_reclassify(ndvi):
+    reclassified = np.zeros(ndvi.shape, dtype=np.int16)
+    reclassified[ndvi < 0.2] = 1
+    reclassified[(ndvi >= 0.2) & (ndvi <= 0.4)] = 2
+    reclassified[ndvi > 0.4] = 3
+    return reclassified
+
+def load_raster(args):
+    if args.synthetic:
+        rng = np.random.default_rng(0)
+        ndvi = (rng.random((args.synthetic, args.synthetic), dtype=np.float32) * 1.2 - 0.2).astype(np.float32)
+        ndvi[rng.random(ndvi.shape) < 0.01] = np.nan
+        # Exact break values must land in the same classes on both paths.
+        ndvi[0, :4] = [0.2, 0.4, np.float32(0.2), np.float32(0.4)]
+        return ndvi, f"synthetic {args.synthetic}x{args.synthetic}"
+    from mosaic import get_mosaic
+    mosaic = get_mosaic(args.location, args.year)
+    if mosaic is None:
+        sys.exit(f"No tiles for {args.location} {args.year}; use --synthetic N.")
+    return mosaic.read(), f"{args.location} {args.year} mosaic {mosaic.width}x{mosaic.height}"
+
+def measure(fn, repeat):
+    timings = np.array(timeit.repeat(fn, number=1, repeat=repeat)) * 1e3
+    return np.median(timings), np.percentile(timings, 90)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--location", default="Thane")
+    parser.add_argument("--year", type=int, default=2024)
+    parser.add_argument("--synthetic", type=int, default=0, help="Use a random N x N raster instead of a mosaic.")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    ndvi, description = load_raster(args)
+    print(f"raster: {description}, {ndvi.nbytes / 1e6:.1f} MB float32")
+
+    # The mask path leaves NaN as 0 too, so the outputs must match exactly.
+    mask_result = mask_reclassify(ndvi)
+    kernel_result = classify(ndvi, DEFAULT_SCHEME)
+    if not np.array_equal(mask_result, kernel_result):
+        sys.exit(f"❌ Outputs differ at {np.count_nonzero(mask_result != kernel_result)} pixels.")
+    print("✅ Outputs are identical.")
+
+    out = np.empty(ndvi.shape, dtype=np.uint8)
+    rows = [
+        ("masks", lambda: mask_reclassify(ndvi)),
+        ("classify", lambda: classify(ndvi, DEFAULT_SCHEME)),
+        ("classify out=", lambda: classify(ndvi, DEFAULT_SCHEME, out=out)),
+    ]
+    print(f"{'path':<16}{'median ms':>12}{'p90 ms':>12}{'output MB':>12}")
+    for name, fn in rows:
+        median, p90 = measure(fn, args.repeat)
+        print(f"{name:<16}{median:>12.2f}{p90:>12.2f}{fn().nbytes / 1e6:>12.1f}")
+
+if __name__ == "__main__":
+    main()
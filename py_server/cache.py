@@ -0,0 +1,191 @@
+# cache.py
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import timed
+
+CACHE_DIR = os.getenv("PY_SERVER_CACHE_DIR", "cache")
+CACHE_MEMORY_BYTES = int(float(os.getenv("PY_SERVER_CACHE_MEMORY_MB", "64")) * 1024 * 1024)
+CACHE_DISK_BYTES = int(float(os.getenv("PY_SERVER_CACHE_DISK_MB", "2048")) * 1024 * 1024)
+# Pruning deletes down to this fraction of the disk cap, so it doesn't rerun on every put.
+PRUNE_TARGET = 0.9
+
+_checksums = {}
+_checksums_lock = threading.Lock()
+
+def file_checksum(path):
+    """Returns the SHA-256 of a file, memoized on (path, mtime, size)."""
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _checksums_lock:
+        digest = _checksums.get(key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                sha.update(block)
+        digest = sha.hexdigest()
+        with _checksums_lock:
+            _checksums[key] = digest
+    return digest
+
+class ArtifactCache:
+    """
+    Two-tier, content-addressed store for rendered products.
+
+    Keys are SHA-256 hashes of the request parameters plus the checksums of
+    every source raster, so a changed GeoTIFF produces a new key. Entries
+    live in an in-process LRU bounded by total bytes, backed by files under
+    ``directory`` that survive restarts and are shared between workers.
+    The files are capped at ``max_disk_bytes`` (0 = unbounded); the least
+    recently read ones (by atime, refreshed on every disk hit) go first.
+    """
+    def __init__(self, directory: str = CACHE_DIR, max_memory_bytes: int = CACHE_MEMORY_BYTES,
+                 max_disk_bytes: int = CACHE_DISK_BYTES):
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        # Disk usage as of the last scan plus this process's writes since; None until the first scan.
+        # Other workers share the directory, so it is rescanned after every tenth of the cap written.
+        self._disk_bytes = None
+        self._unscanned_bytes = 0
+        self._prune_lock = threading.Lock()
+
+    @timed("cache")
+    def key(self, kind: str, params: dict, sources=()):
+        """Builds the cache key for a product from its parameters and source files."""
+        payload = {
+            "kind": kind,
+            "params": params,
+            "sources": [file_checksum(path) for path in sources],
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def _remember(self, key, data):
+        if len(data) > self.max_memory_bytes:
+            return
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return
+            self._memory[key] = data
+            self._memory_bytes += len(data)
+            while self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    @timed("cache")
+    def get(self, key):
+        """Returns the cached bytes for a key, or None."""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                return data
+        try:
+            with open(self._path(key), 'rb') as file:
+                data = file.read()
+                # Mark the file as recently used for pruning; relatime/noatime mounts wouldn't.
+                os.utime(file.fileno(), ns=(time.time_ns(), os.fstat(file.fileno()).st_mtime_ns))
+        except FileNotFoundError:
+            return None
+        self._remember(key, data)
+        return data
+
+    @timed("cache")
+    def put(self, key, data: bytes):
+        """Stores bytes under a key in memory and on disk."""
+        self._remember(key, data)
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so readers never see a partial artifact.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._account(len(data))
+
+    def _account(self, size):
+        if not self.max_disk_bytes:
+            return
+        with self._lock:
+            self._unscanned_bytes += size
+            if self._disk_bytes is not None:
+                self._disk_bytes += size
+            due = (self._disk_bytes is None or self._disk_bytes > self.max_disk_bytes
+                   or self._unscanned_bytes > self.max_disk_bytes * (1 - PRUNE_TARGET))
+        if due:
+            self.prune()
+
+    def _files(self):
+        """(path, stat) of every cached artifact; other data under the directory is left alone."""
+        try:
+            shards = [entry for entry in os.scandir(self.directory) if entry.is_dir() and len(entry.name) == 2]
+        except FileNotFoundError:
+            return []
+        files = []
+        for shard in shards:
+            for entry in os.scandir(shard.path):
+                # Skip in-flight temporary files from put().
+                if entry.name.startswith("tmp") or not entry.is_file():
+                    continue
+                try:
+                    files.append((entry.path, entry.stat()))
+                except FileNotFoundError:
+                    pass
+        return files
+
+    @timed("cache")
+    def prune(self):
+        """Deletes the least recently used files once the disk tier exceeds its cap; returns the bytes freed."""
+        with self._prune_lock:
+            files = self._files()
+            total = sum(stat.st_size for _, stat in files)
+            freed = prune_files(files, self.max_disk_bytes)
+            with self._lock:
+                self._disk_bytes = total - freed
+                self._unscanned_bytes = 0
+        return freed
+
+def prune_files(files, max_bytes):
+    """
+    Deletes the least recently used of ``files`` ((path, stat) pairs, by atime)
+    down to PRUNE_TARGET of ``max_bytes`` once they exceed it; returns the bytes freed.
+    """
+    total = sum(stat.st_size for _, stat in files)
+    freed = 0
+    if max_bytes and total > max_bytes:
+        target = max_bytes * PRUNE_TARGET
+        for path, stat in sorted(files, key=lambda item: item[1].st_atime_ns):
+            if total - freed <= target:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass  # Already pruned by another worker.
+            freed += stat.st_size
+    return freed
+
+def etag_matches(if_none_match, etag):
+    """Checks an If-None-Match header value against an ETag."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates or f"W/{etag}" in candidates
+
+artifact_cache = ArtifactCache()
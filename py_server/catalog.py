@@ -0,0 +1,141 @@
+# catalog.py
+import json
+import os
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+METADATA_FILENAME = 'metadata.csv'
+RASTER_DIR = 'NDVI'
+# Written by `python ingest.py cog`; maps each tile to its Cloud-Optimized GeoTIFF.
+COG_MANIFEST_FILENAME = 'cog_manifest.csv'
+
+@dataclass(frozen=True)
+class TileRecord:
+    """A single NDVI tile listed in the metadata file."""
+    location: str
+    year: int
+    row: int
+    col: int
+    file_name: str
+    ndvi_file_name: str
+    bounds: np.ndarray  # [min_lon, min_lat, max_lon, max_lat]
+    path: str
+    cog_path: str = None
+    cog_sha256: str = None
+
+    @property
+    def read_path(self):
+        """The file to read pixels from: the COG when it has been ingested, else the original."""
+        if self.cog_path and os.path.exists(self.cog_path):
+            return self.cog_path
+        return self.path
+
+class TileCatalog:
+    """
+    Indexed, in-memory view of metadata.csv (plus the optional COG manifest).
+
+    The CSVs are parsed once and re-read only when their modification times
+    change, so lookups never touch the disk beyond a cheap os.stat().
+    """
+    def __init__(self, metadata_file: str = METADATA_FILENAME, raster_dir: str = RASTER_DIR,
+                 cog_manifest_file: str = COG_MANIFEST_FILENAME):
+        self.metadata_file = metadata_file
+        self.raster_dir = raster_dir
+        self.cog_manifest_file = cog_manifest_file
+        self.version = 0
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._tiles = {}
+        self._by_location_year = {}
+        self.records = []
+        self.bounds = np.empty((0, 4), dtype=np.float64)
+        self._load()
+
+    def _stat(self):
+        mtime = os.stat(self.metadata_file).st_mtime_ns
+        try:
+            manifest_mtime = os.stat(self.cog_manifest_file).st_mtime_ns
+        except FileNotFoundError:
+            manifest_mtime = None
+        return mtime, manifest_mtime
+
+    def _load_cog_manifest(self):
+        try:
+            manifest = pd.read_csv(self.cog_manifest_file)
+        except FileNotFoundError:
+            return {}
+        return {row.ndvi_file_name: (row.cog_path, row.sha256) for row in manifest.itertuples(index=False)}
+
+    def _load(self):
+        mtime = self._stat()
+        df = pd.read_csv(self.metadata_file)
+        cogs = self._load_cog_manifest()
+
+        tiles = {}
+        by_location_year = {}
+        records = []
+        for row in df.itertuples(index=False):
+            polygon = json.loads(row.bounds)[0]
+            # The bounds polygon is [[min_lon, min_lat], [max_lon, min_lat], [max_lon, max_lat], ...]
+            (min_lon, min_lat), (max_lon, max_lat) = polygon[0], polygon[2]
+            cog_path, cog_sha256 = cogs.get(row.ndvi_file_name, (None, None))
+            record = TileRecord(
+                location=row.location,
+                year=int(row.year),
+                row=int(row.row),
+                col=int(row.col),
+                file_name=row.file_name,
+                ndvi_file_name=row.ndvi_file_name,
+                bounds=np.array([min_lon, min_lat, max_lon, max_lat], dtype=np.float64),
+                path=os.path.join(self.raster_dir, row.ndvi_file_name),
+                cog_path=cog_path,
+                cog_sha256=cog_sha256,
+            )
+            tiles[(record.location, record.year, record.row, record.col)] = record
+            by_location_year.setdefault((record.location, record.year), []).append(record)
+            records.append(record)
+
+        for group in by_location_year.values():
+            group.sort(key=lambda r: (r.row, r.col))
+
+        self._tiles = tiles
+        self._by_location_year = by_location_year
+        self.records = records
+        self.bounds = np.array([r.bounds for r in records], dtype=np.float64).reshape(-1, 4)
+        self._mtime = mtime
+        self.version += 1
+        print(f"✅ Tile catalog loaded: {len(records)} tiles from {self.metadata_file}.")
+
+    def refresh(self):
+        """Reloads the catalog if the metadata file or COG manifest changed on disk."""
+        mtime = self._stat()
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self._load()
+
+    def get(self, location: str, year: int, row: int, col: int):
+        """Returns the tile at (location, year, row, col), or None."""
+        self.refresh()
+        return self._tiles.get((location, int(year), int(row), int(col)))
+
+    def tiles(self, location: str, year: int):
+        """Returns every tile for a location/year, ordered by (row, col)."""
+        self.refresh()
+        return self._by_location_year.get((location, int(year)), [])
+
+    def locations(self):
+        """Returns the sorted list of locations in the catalog."""
+        self.refresh()
+        return sorted({location for location, _ in self._by_location_year})
+
+    def years(self, location: str):
+        """Returns the sorted list of years available for a location."""
+        self.refresh()
+        return sorted(year for loc, year in self._by_location_year if loc == location)
+
+# Loaded once at import; lookups hot-reload when metadata.csv changes.
+catalog = TileCatalog()
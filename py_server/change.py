@@ -0,0 +1,136 @@
+# change.py
+import os
+from io import BytesIO
+
+import numpy as np
+from rasterio.windows import Window
+
+from metrics import stage, timed
+from render import CHANGE_PALETTE, IndexedPNGWriter, change_to_indices
+from stats import PERCENTILES, histogram_percentiles
+
+# Target height (full-resolution rows) of one strip; rounded up to whole tile blocks.
+STRIP_ROWS = int(os.getenv("PY_SERVER_STRIP_ROWS", "512"))
+
+# NDVI differences lie in [-2, 2]; 0.01-wide bins for the change percentiles.
+CHANGE_HIST_EDGES = np.linspace(-2.0, 2.0, 401)
+# Differences beyond this magnitude count as vegetation gain or loss.
+CHANGE_THRESHOLD = 0.1
+
+def check_aligned(mosaic_from, mosaic_to):
+    """Raises ValueError unless both mosaics share one pixel grid."""
+    if mosaic_from.shape != mosaic_to.shape or not mosaic_from.transform.almost_equals(mosaic_to.transform):
+        raise ValueError("The input rasters do not have the same dimensions.")
+
+def iter_strips(mosaic, window: Window, decimation: int = 1, strip_rows: int = STRIP_ROWS):
+    """
+    Splits a window into full-width horizontal strips.
+
+    Strips start on tile block boundaries (for block-aligned windows) and
+    span a whole number of output rows at the given decimation, so the
+    decimated strips stack to exactly the rows of the whole window.
+    Yields (strip_window, out_row_start, out_row_stop).
+    """
+    block_rows = mosaic.block_shape[0]
+    step = -(-strip_rows // block_rows) * block_rows * decimation
+    row_off, height = int(window.row_off), int(window.height)
+    out_row = 0
+    for start in range(0, height, step):
+        rows = min(step, height - start)
+        out_rows = max(1, round(rows / decimation)) if start == 0 else round(rows / decimation)
+        if out_rows == 0:
+            continue
+        yield Window(window.col_off, row_off + start, window.width, rows), out_row, out_row + out_rows
+        out_row += out_rows
+
+def iter_change(mosaic_from, mosaic_to, window: Window = None, decimation: int = 1, strip_rows: int = STRIP_ROWS):
+    """
+    Yields (out_row_start, out_row_stop, difference) for each strip of a
+    window, where difference is the float32 NDVI change (to - from) with NaN
+    where either year has no data. Only two strip buffers are alive at a
+    time, so peak memory does not depend on the raster size.
+    """
+    check_aligned(mosaic_from, mosaic_to)
+    window = window or mosaic_from.full_window
+    for strip, start, stop in iter_strips(mosaic_from, window, decimation, strip_rows):
+        ndvi_to = mosaic_to.read(strip, decimation)
+        ndvi_from = mosaic_from.read(strip, decimation)
+        with stage("compute"):
+            np.subtract(ndvi_to, ndvi_from, out=ndvi_to)
+        del ndvi_from
+        yield start, stop, ndvi_to
+
+class ChangeStats:
+    """Streaming accumulator for NDVI change statistics."""
+    def __init__(self):
+        self.n_pixels = self.n_valid = self.gain = self.loss = 0
+        self.total = self.total_sq = 0.0
+        self.low, self.high = np.inf, -np.inf
+        self.histogram = np.zeros(len(CHANGE_HIST_EDGES) - 1, dtype=np.int64)
+
+    @timed("compute")
+    def update(self, change):
+        self.n_pixels += change.size
+        values = change[~np.isnan(change)]
+        if not values.size:
+            return
+        self.n_valid += values.size
+        values64 = values.astype(np.float64)
+        self.total += values64.sum()
+        self.total_sq += np.dot(values64, values64)
+        self.low, self.high = min(self.low, values.min()), max(self.high, values.max())
+        self.gain += np.count_nonzero(values > CHANGE_THRESHOLD)
+        self.loss += np.count_nonzero(values < -CHANGE_THRESHOLD)
+        bins = np.clip(np.searchsorted(CHANGE_HIST_EDGES, values, side="right") - 1, 0, len(self.histogram) - 1)
+        self.histogram += np.bincount(bins, minlength=len(self.histogram))
+
+    def result(self):
+        n_valid = self.n_valid
+        mean = self.total / n_valid if n_valid else None
+        return {
+            "pixels": int(self.n_pixels),
+            "valid_pixels": int(n_valid),
+            "nodata_pixels": int(self.n_pixels - n_valid),
+            "mean": round(float(mean), 6) if n_valid else None,
+            "std": round(float(np.sqrt(max(self.total_sq / n_valid - mean * mean, 0.0))), 6) if n_valid else None,
+            "min": float(self.low) if n_valid else None,
+            "max": float(self.high) if n_valid else None,
+            "percentiles": dict(zip((f"p{q}" for q in PERCENTILES),
+                                    histogram_percentiles(self.histogram, PERCENTILES, CHANGE_HIST_EDGES))),
+            "gain_fraction": round(int(self.gain) / n_valid, 6) if n_valid else None,
+            "loss_fraction": round(int(self.loss) / n_valid, 6) if n_valid else None,
+            "threshold": CHANGE_THRESHOLD,
+        }
+
+def read_change(mosaic_from, mosaic_to, window: Window = None, decimation: int = 1):
+    """Returns the whole change array (for the matplotlib renderer), filled strip by strip."""
+    window = window or mosaic_from.full_window
+    out = np.empty(mosaic_from.output_shape(window, decimation), dtype=np.float32)
+    for start, stop, change in iter_change(mosaic_from, mosaic_to, window, decimation):
+        out[start:stop] = change
+    return out
+
+def render_change_streaming(mosaic_from, mosaic_to, window: Window = None, decimation: int = 1, stats: ChangeStats = None):
+    """
+    Encodes the change map as a palette PNG while it is computed, without
+    materialising the full difference array. Optionally feeds a ChangeStats.
+    """
+    window = window or mosaic_from.full_window
+    height, width = mosaic_from.output_shape(window, decimation)
+    output_buffer = BytesIO()
+    writer = IndexedPNGWriter(output_buffer, width, height, CHANGE_PALETTE)
+    for _, _, change in iter_change(mosaic_from, mosaic_to, window, decimation):
+        if stats is not None:
+            stats.update(change)
+        with stage("render"):
+            writer.write_rows(change_to_indices(change))
+    with stage("render"):
+        writer.close()
+    return output_buffer.getvalue()
+
+def change_stats(mosaic_from, mosaic_to, window: Window = None, decimation: int = 1):
+    """Computes NDVI change statistics in one streaming pass."""
+    stats = ChangeStats()
+    for _, _, change in iter_change(mosaic_from, mosaic_to, window, decimation):
+        stats.update(change)
+    return stats.result()
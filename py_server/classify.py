@@ -0,0 +1,115 @@
+# classify.py
+from dataclasses import dataclass
+
+import numpy as np
+
+from metrics import timed
+from render import RECLASSIFY_PALETTE
+
+# Rows classified per chunk; bounds the boolean (and searchsorted int64) temporaries.
+CHUNK_ROWS = 256
+# Above this many breaks a binary search beats one comparison per break.
+SEARCH_THRESHOLD = 16
+
+@dataclass(frozen=True)
+class ClassScheme:
+    """
+    Class breaks and colours for reclassifying NDVI.
+
+    ``edges`` are ascending float32 thresholds: a value's class is 1 plus the
+    number of edges that are <= the value, so class k covers
+    [edges[k-2], edges[k-1]). Class 0 is nodata (NaN) and is transparent.
+    """
+    edges: tuple
+    palette: tuple
+    labels: tuple
+
+    @classmethod
+    def from_breaks(cls, breaks, right: bool = False, palette=None, labels=None):
+        """
+        Builds a scheme from ascending break values. With ``right=True`` a
+        value equal to a break falls in the lower class instead of the upper.
+        """
+        edges = np.asarray(breaks, dtype=np.float32)
+        if right:
+            edges = np.nextafter(edges, np.float32(np.inf))
+        n_classes = len(edges) + 1
+        colours = [parse_colour(c) for c in palette] if palette is not None else default_palette(n_classes)
+        if labels is None:
+            bounds = ["-inf", *(f"{b:g}" for b in breaks), "inf"]
+            labels = [f"{low} to {high}" for low, high in zip(bounds[:-1], bounds[1:])]
+        return cls(
+            edges=tuple(edges.tolist()),
+            palette=((0, 0, 0), *(tuple(c) for c in colours)),
+            labels=tuple(labels),
+        )
+
+    @property
+    def n_classes(self):
+        return len(self.edges) + 1
+
+    def palette_array(self):
+        """The (n_classes + 1, 3) uint8 palette, index 0 being nodata."""
+        return np.array(self.palette, dtype=np.uint8)
+
+    def params(self):
+        """JSON-friendly description, used in cache keys."""
+        return {"edges": list(self.edges), "palette": [list(c) for c in self.palette]}
+
+def parse_colour(colour):
+    """Accepts '#rrggbb' or an (r, g, b) sequence and returns an (r, g, b) tuple of ints."""
+    if isinstance(colour, str):
+        value = colour.lstrip("#")
+        if len(value) != 6:
+            raise ValueError(f"Colour '{colour}' is not of the form #rrggbb.")
+        return tuple(int(value[i:i + 2], 16) for i in (0, 2, 4))
+    return tuple(int(c) for c in colour)
+
+def default_palette(n_classes):
+    """Brown-to-green ramp for n classes."""
+    low, high = np.array([165, 42, 42]), np.array([0, 128, 0])
+    steps = np.linspace(0.0, 1.0, n_classes).reshape(-1, 1)
+    return [tuple(c) for c in (low + (high - low) * steps).round().astype(int).tolist()]
+
+# The original /reclassify masks: <0.2 non-vegetated, 0.2-0.4 sparse (both ends
+# inclusive), >0.4 dense. Nudging the 0.4 edge up one float32 step puts 0.4 itself
+# in the sparse class, so float32 rasters classify bit-for-bit as before.
+DEFAULT_SCHEME = ClassScheme(
+    edges=(float(np.float32(0.2)), float(np.nextafter(np.float32(0.4), np.float32(np.inf)))),
+    palette=tuple(map(tuple, RECLASSIFY_PALETTE.tolist())),
+    labels=("Non-vegetated (<0.2)", "Sparse Veg (0.2-0.4)", "Dense Veg (>0.4)"),
+)
+
+@timed("compute")
+def classify(values, scheme: ClassScheme = DEFAULT_SCHEME, out=None, chunk_rows: int = CHUNK_ROWS):
+    """
+    Bins a 2D float array into uint8 class indices (0 for NaN) in a single
+    pass over each row chunk, writing straight into the uint8 output.
+
+    For the usual handful of breaks the class is the count of edges <= value,
+    accumulated from one comparison per edge; ``value == value`` adds the
+    final 1 and is False for NaN, which therefore stays 0. Long break lists
+    fall back to np.searchsorted (np.digitize), which is O(log n) per pixel.
+    """
+    if scheme.n_classes > 255:
+        raise ValueError("At most 254 class breaks are supported.")
+    edges = np.asarray(scheme.edges, dtype=values.dtype if values.dtype.kind == "f" else np.float32)
+    if out is None:
+        out = np.empty(values.shape, dtype=np.uint8)
+    mask = np.empty((min(chunk_rows, values.shape[0]), *values.shape[1:]), dtype=bool)
+    for start in range(0, values.shape[0], chunk_rows):
+        block = values[start:start + chunk_rows]
+        out_block = out[start:start + chunk_rows]
+        block_mask = mask[:len(block)]
+        if len(edges) <= SEARCH_THRESHOLD:
+            out_block.fill(0)
+            for edge in edges:
+                np.greater_equal(block, edge, out=block_mask)
+                out_block += block_mask
+        else:
+            np.copyto(out_block, np.searchsorted(edges, block, side="right"), casting="unsafe")
+        np.equal(block, block, out=block_mask)
+        out_block += block_mask
+        if len(edges) > SEARCH_THRESHOLD:
+            out_block[~block_mask] = 0
+    return out
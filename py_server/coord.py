@@ -1,5 +1,126 @@
-import pandas as pd
-import json
+import math
+import threading
+
+import numpy as np
+
+from catalog import TileCatalog, catalog
+from metrics import timed
+
+class TileGridIndex:
+    """
+    Uniform grid over the tile bounds for point-in-tile lookups.
+
+    Each grid cell holds the indices (into ``records``) of every tile that
+    touches it, padded with -1, so a batch of points resolves with a single
+    gather and a vectorized containment test instead of a scan of all tiles.
+    """
+    def __init__(self, records, bounds, max_cells=1 << 16):
+        self.records = records
+        self.bounds = bounds
+        self.years = np.array([r.year for r in records], dtype=np.int64)
+
+        if len(records) == 0:
+            self.origin = np.zeros(2)
+            self.cell_size = np.ones(2)
+            self.shape = (1, 1)
+            self.cells = np.full((1, 1), -1, dtype=np.int64)
+            return
+
+        min_x, min_y = bounds[:, 0].min(), bounds[:, 1].min()
+        max_x, max_y = bounds[:, 2].max(), bounds[:, 3].max()
+        span_x = max(max_x - min_x, 1e-9)
+        span_y = max(max_y - min_y, 1e-9)
+
+        # Cells roughly the size of a tile, coarsened if the extent is very sparse.
+        cell_x = max(np.median(bounds[:, 2] - bounds[:, 0]), span_x / math.sqrt(max_cells), 1e-9)
+        cell_y = max(np.median(bounds[:, 3] - bounds[:, 1]), span_y / math.sqrt(max_cells), 1e-9)
+        nx = int(math.ceil(span_x / cell_x)) or 1
+        ny = int(math.ceil(span_y / cell_y)) or 1
+
+        self.origin = np.array([min_x, min_y])
+        self.cell_size = np.array([cell_x, cell_y])
+        self.shape = (ny, nx)
+
+        ix0, iy0 = self._cell_coords(bounds[:, 0], bounds[:, 1])
+        ix1, iy1 = self._cell_coords(bounds[:, 2], bounds[:, 3])
+        buckets = [[] for _ in range(nx * ny)]
+        for i in range(len(records)):
+            for iy in range(iy0[i], iy1[i] + 1):
+                for ix in range(ix0[i], ix1[i] + 1):
+                    buckets[iy * nx + ix].append(i)
+
+        width = max(len(b) for b in buckets) or 1
+        self.cells = np.full((nx * ny, width), -1, dtype=np.int64)
+        for cell, members in enumerate(buckets):
+            self.cells[cell, :len(members)] = members
+
+    def _cell_coords(self, lon, lat):
+        ny, nx = self.shape
+        ix = np.floor((np.asarray(lon, dtype=np.float64) - self.origin[0]) / self.cell_size[0]).astype(np.int64)
+        iy = np.floor((np.asarray(lat, dtype=np.float64) - self.origin[1]) / self.cell_size[1]).astype(np.int64)
+        return np.clip(ix, 0, nx - 1), np.clip(iy, 0, ny - 1)
+
+    def query(self, lats, lons, years):
+        """
+        Returns, for each (lat, lon, year), the index of the first tile that
+        contains the point in that year, or -1 when there is none.
+        """
+        lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+        lons = np.atleast_1d(np.asarray(lons, dtype=np.float64))
+        years = np.broadcast_to(np.atleast_1d(np.asarray(years, dtype=np.int64)), lats.shape)
+
+        if len(self.records) == 0:
+            return np.full(lats.shape, -1, dtype=np.int64)
+
+        ix, iy = self._cell_coords(lons, lats)
+        candidates = self.cells[iy * self.shape[1] + ix]  # (N, K)
+        valid = candidates >= 0
+        safe = np.where(valid, candidates, 0)
+        b = self.bounds[safe]
+
+        hit = (
+            valid
+            & (self.years[safe] == years[:, None])
+            & (b[..., 0] <= lons[:, None]) & (lons[:, None] <= b[..., 2])
+            & (b[..., 1] <= lats[:, None]) & (lats[:, None] <= b[..., 3])
+        )
+        first = hit.argmax(axis=1)
+        found = hit[np.arange(len(first)), first]
+        return np.where(found, candidates[np.arange(len(first)), first], -1)
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_spatial_index(tile_catalog: TileCatalog = catalog):
+    """Returns the grid index for the catalog, rebuilding it after a catalog reload."""
+    global _index
+    tile_catalog.refresh()
+    key = (id(tile_catalog), tile_catalog.version)
+    with _index_lock:
+        if _index is None or _index[0] != key:
+            _index = (key, TileGridIndex(tile_catalog.records, tile_catalog.bounds))
+        return _index[1]
+
+def tile_id(record):
+    """Returns the identifier of a tile, e.g. 'Kalyan_2018_0_0'."""
+    return f"{record.location}_{record.year}_{record.row}_{record.col}"
+
+@timed("catalog")
+def find_tile(lat, lon, year, tile_catalog: TileCatalog = catalog):
+    """Returns the TileRecord containing (lat, lon) for the given year, or None."""
+    index = get_spatial_index(tile_catalog)
+    i = int(index.query(lat, lon, year)[0])
+    return index.records[i] if i >= 0 else None
+
+@timed("catalog")
+def find_tiles(lats, lons, years, tile_catalog: TileCatalog = catalog):
+    """
+    Vectorized variant of find_tile for N points.
+    Returns a list of tile ids, with None for points outside every tile.
+    """
+    index = get_spatial_index(tile_catalog)
+    hits = index.query(lats, lons, years)
+    return [tile_id(index.records[i]) if i >= 0 else None for i in hits]
 
 def find_image_by_coordinates(file_path, lat, lon, year):
     """
@@ -7,49 +128,26 @@ def find_image_by_coordinates(file_path, lat, lon, year):
     and matches the year.
     """
     try:
-        # Load the metadata file into a pandas DataFrame
-        df = pd.read_csv(file_path)
+        tile_catalog = catalog if file_path == catalog.metadata_file else TileCatalog(file_path)
     except FileNotFoundError:
         print(f"Error: The file '{file_path}' was not found.")
         return
 
-    found_match = False
-    
-    # Iterate through each row of the DataFrame
-    for index, row in df.iterrows():
-        try:
-            # Check if the year matches
-            if int(row['year']) == year:
-                # The 'bounds' column is a string representation of a list.
-                # Use json.loads to convert it to a Python list.
-                bounds = json.loads(row['bounds'])
-                
-                # The bounds format is [[[min_lon, min_lat], [max_lon, min_lat], ...]]
-                # We need to extract the min/max coordinates
-                min_lon, min_lat = bounds[0][0]
-                max_lon, max_lat = bounds[0][2]
-                
-                # Check if the provided coordinates fall within the bounds
-                if min_lon <= lon <= max_lon and min_lat <= lat <= max_lat:
-                    print("--- Match Found! ---")
-                    print(f"File Name: NDVI/{row['file_name']}")
-                    print(f"NDVI File Name: {row['ndvi_file_name']}")
-                    print(f"Location: {row['location']}")
-                    print(f"Year: {row['year']}")
-                    print(f"Row: {row['row']}")
-                    print(f"Column: {row['col']}")
-                    print(f"Bounds: {row['bounds']}")
-                    print("--------------------")
-                    found_match = True
-                    # Stop after the first match is found
-                    break
-        except (ValueError, KeyError, IndexError, json.JSONDecodeError) as e:
-            # Skip rows with invalid or missing data
-            print(f"Warning: Skipping row {index} due to invalid data. Error: {e}")
-            continue
-
-    if not found_match:
+    record = find_tile(lat, lon, year, tile_catalog)
+    if record is None:
         print(f"No image found for coordinates ({lat}, {lon}) in year {year}.")
+        return
+
+    print("--- Match Found! ---")
+    print(f"File Name: NDVI/{record.file_name}")
+    print(f"NDVI File Name: {record.ndvi_file_name}")
+    print(f"Location: {record.location}")
+    print(f"Year: {record.year}")
+    print(f"Row: {record.row}")
+    print(f"Column: {record.col}")
+    print(f"Bounds: {record.bounds.tolist()}")
+    print("--------------------")
+    return record
 
 
 if __name__ == "__main__":
@@ -0,0 +1,114 @@
+# ingest.py
+"""
+Converts the NDVI GeoTIFFs into Cloud-Optimized GeoTIFFs.
+
+Run from the py_server directory:
+
+    python ingest.py cog [--compress deflate|zstd] [--blocksize 256] [--location Kalyan]
+
+Each tile is rewritten with internal tiling, compression and averaged
+overviews into COG/, and cog_manifest.csv records the COG path and its
+checksum. The tile catalog picks the manifest up on its next refresh and
+serves reads from the COGs; the original files are left untouched.
+"""
+import argparse
+import hashlib
+import os
+import sys
+import time
+
+import pandas as pd
+import rasterio
+from rasterio.shutil import copy as rio_copy
+
+from catalog import COG_MANIFEST_FILENAME, TileCatalog
+
+COG_DIR = 'COG'
+
+def sha256_file(path: str, chunk_size: int = 1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def convert_to_cog(source_path: str, target_path: str, compress: str = 'deflate', blocksize: int = 256):
+    """Writes a tiled, compressed COG with averaged overviews and returns its size in bytes."""
+    with rasterio.open(source_path) as src:
+        # Floating-point predictor helps deflate/zstd on smooth NDVI surfaces.
+        predictor = 3 if src.dtypes[0].startswith('float') else 2
+    os.makedirs(os.path.dirname(target_path) or '.', exist_ok=True)
+    tmp_path = f"{target_path}.tmp"
+    rio_copy(
+        source_path,
+        tmp_path,
+        driver='COG',
+        BLOCKSIZE=blocksize,
+        COMPRESS=compress.upper(),
+        PREDICTOR=predictor,
+        OVERVIEWS='AUTO',
+        OVERVIEW_RESAMPLING='AVERAGE',
+        RESAMPLING='AVERAGE',
+        BIGTIFF='IF_SAFER',
+    )
+    os.replace(tmp_path, target_path)
+    return os.path.getsize(target_path)
+
+def load_manifest(manifest_file: str = COG_MANIFEST_FILENAME):
+    try:
+        return pd.read_csv(manifest_file)
+    except FileNotFoundError:
+        return pd.DataFrame(columns=['ndvi_file_name', 'cog_path', 'sha256', 'size_bytes'])
+
+def ingest_cogs(tile_catalog: TileCatalog, cog_dir: str = COG_DIR, compress: str = 'deflate',
+                blocksize: int = 256, location: str = None, manifest_file: str = COG_MANIFEST_FILENAME):
+    """Converts every (or one location's) tile on disk to a COG and updates the manifest."""
+    tile_catalog.refresh()
+    rows = {row.ndvi_file_name: row._asdict() for row in load_manifest(manifest_file).itertuples(index=False)}
+    converted = 0
+    for record in tile_catalog.records:
+        if location and record.location != location:
+            continue
+        if not os.path.exists(record.path):
+            print(f"⚠️ Skipping missing tile {record.path}")
+            continue
+        target = os.path.join(cog_dir, record.ndvi_file_name)
+        start = time.perf_counter()
+        try:
+            size = convert_to_cog(record.path, target, compress, blocksize)
+        except rasterio.RasterioIOError as e:
+            print(f"❌ Could not convert {record.path}: {e}")
+            continue
+        rows[record.ndvi_file_name] = {
+            'ndvi_file_name': record.ndvi_file_name,
+            'cog_path': target,
+            'sha256': sha256_file(target),
+            'size_bytes': size,
+        }
+        converted += 1
+        print(f"✅ {record.path} -> {target} ({size / 1e6:.1f} MB, {time.perf_counter() - start:.2f}s)")
+
+    manifest = pd.DataFrame(list(rows.values()), columns=['ndvi_file_name', 'cog_path', 'sha256', 'size_bytes'])
+    tmp_file = f"{manifest_file}.tmp"
+    manifest.to_csv(tmp_file, index=False)
+    os.replace(tmp_file, manifest_file)
+    print(f"✅ Converted {converted} tiles; manifest written to {manifest_file}.")
+    return converted
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    cog = subparsers.add_parser('cog', help='Convert NDVI tiles to Cloud-Optimized GeoTIFFs.')
+    cog.add_argument('--compress', choices=['deflate', 'zstd'], default='deflate')
+    cog.add_argument('--blocksize', type=int, default=256, help='Internal tile size in pixels (multiple of 16).')
+    cog.add_argument('--location', help='Only convert tiles of this location.')
+    cog.add_argument('--output-dir', default=COG_DIR)
+    args = parser.parse_args(argv)
+
+    if args.blocksize % 16:
+        parser.error('--blocksize must be a multiple of 16')
+    converted = ingest_cogs(TileCatalog(), args.output_dir, args.compress, args.blocksize, args.location)
+    return 0 if converted else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,200 +1,526 @@
-import pandas as pd
 import json
-import rasterio
-import numpy as np
-from io import BytesIO
-import matplotlib.pyplot as plt
-import matplotlib.colors as colors
-from matplotlib.colors import ListedColormap
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel, Field
-from enum import Enum
-import joblib
 import os
-
-# --- Pydantic Models ---
-class Location(str, Enum):
-    """An enumeration for valid geographical locations."""
-    panvel = "Panvel"
-    kalyan = "Kalyan"
-    thane = "Thane"
-    tirunveli = "Tirunveli"
-    vilupuram = "Vilupuram"
-    thiruvannamalai = "Thiruvannamalai"
-    mandangad = "Mandangad"
-
-class PlantHealthFeatures(BaseModel):
-    """Defines the input features for a prediction request."""
-    year: int = Field(..., example=2025, description="The year of the prediction.")
-    month: int = Field(..., ge=1, le=12, example=7, description="The month of the prediction (1-12).")
-    min_temp_c: float = Field(..., example=22.5, description="Minimum temperature of the month in Celsius.")
-    max_temp_c: float = Field(..., example=35.0, description="Maximum temperature of the month in Celsius.")
-    mean_temp_c: float = Field(..., example=28.2, description="Average temperature of the month in Celsius.")
-    total_precip_mm: float = Field(..., example=150.0, description="Total precipitation for the month in millimeters.")
-    total_solar_rad_j_m2: float = Field(..., example=1.5e9, description="Total solar radiation for the month in Joules/m^2.")
-    rainy_days: int = Field(..., example=15, description="The number of days with rain in the month.")
-    location: Location = Field(..., example="Thane", description="The geographical location for the prediction.")
-
-class PredictionResponse(BaseModel):
-    """Defines the structure of the prediction response."""
-    predicted_avg_ndvi: float
-
-class LocationYearRequest(BaseModel):
-    """Defines the input features for raster processing endpoints."""
-    location: str = Field(..., example="Kalyan", description="The name of the location.")
-    year: int = Field(..., example=2018, description="The year of the satellite imagery.")
-
-# --- Prediction Logic ---
-class Predictor:
-    def __init__(self, model_path: str = 'plant_health_monthly_model-1000.pkl'):
-        self.model_path = model_path
-        self.model = None
-        self.feature_list = None
-        self._load_model()
-
-    def _load_model(self):
-        try:
-            with open(self.model_path, 'rb') as file:
-                self.model, self.feature_list = joblib.load(file)
-            print("✅ Model and feature list loaded successfully.")
-        except FileNotFoundError:
-            raise FileNotFoundError(f"Model file not found at: {self.model_path}")
-        except Exception as e:
-            raise Exception(f"Failed to load model: {e}")
-
-    def predict(self, features: PlantHealthFeatures):
-        if not self.model or not self.feature_list:
-            raise HTTPException(status_code=500, detail="Model not loaded. Please contact the administrator.")
-        
-        input_data = features.model_dump()
-        input_df = pd.DataFrame([input_data])
-        
-        # One-hot encode the location
-        for loc in self.feature_list:
-            if loc.startswith('location_'):
-                input_df[loc] = 0
-        
-        loc_col_name = f"location_{input_data['location']}"
-        if loc_col_name in input_df.columns:
-            input_df[loc_col_name] = 1
-        
-        # Ensure the order of columns matches the training data
-        input_df = input_df[self.feature_list]
-        
-        prediction = self.model.predict(input_df)[0]
-        
-        return float(prediction)
-
-predictor = Predictor()
+import threading
+import time
+import rasterio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from typing import Optional
+from models import (
+    BatchPredictionRequest,
+    BatchPredictionResponse,
+    CoordinateBatchRequest,
+    CoordinateBatchResponse,
+    LocationYearRequest,
+    PlantHealthFeatures,
+    PredictionResponse,
+    ReclassifyRequest,
+    Renderer,
+    ResamplingMethod,
+    TimeSeriesMetric,
+    TimeSeriesRequest,
+)
+from registry import registry
+from memo import prediction_memo
+from metrics import metrics, record_request, track_request
+from mosaic import get_mosaic
+from alignment import align_to
+from classify import DEFAULT_SCHEME, ClassScheme, classify
+from change import change_stats, read_change, render_change_streaming
+from coord import find_tile, find_tiles, tile_id
+from products import (
+    RENDER_VERSION,
+    change_key,
+    read_reclassified,
+    reclassify_key,
+    render_reclassified,
+    window_params,
+)
+from render import (
+    render_change_fast,
+    render_change_figure,
+    render_legend,
+    render_ndvi_fast,
+    render_reclassified_fast,
+    render_scaled_fast,
+)
+from stats import stats_store
+from timeseries import METRIC_RANGES, compute_metric, get_cube, summarize_metric
+from tiles import empty_tile, read_tile, valid_tile
+from warmup import WARMUP_WORKERS, run_warmup
+from workers import workers
+from cache import artifact_cache, etag_matches
 
 # --- Utility Functions ---
-def find_raster_file(location, year, metadata_file='metadata.csv'):
-    """Finds the raster file path for a given location and year."""
+def find_mosaic(location, year):
+    """Finds the mosaic of all raster tiles for a given location and year."""
     try:
-        df = pd.read_csv(metadata_file)
-        result = df[(df['location'] == location) & (df['year'] == year)]
-        if not result.empty:
-            # Assuming 'ndvi_file_name' is the column with file names
-            return f"NDVI/{result['ndvi_file_name'].iloc[0]}"
-        return None
+        return get_mosaic(location, year)
     except FileNotFoundError:
-        raise HTTPException(status_code=500, detail="Metadata file not found on the server.")
+        return None
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred while searching for file: {e}")
 
 # --- FastAPI Application ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    registry.start_background_loading()
+    warmup_stop = threading.Event()
+    if WARMUP_WORKERS > 0:
+        threading.Thread(target=run_warmup, kwargs={"max_workers": WARMUP_WORKERS, "stop_event": warmup_stop},
+                         name="artifact-warmup", daemon=True).start()
+    yield
+    warmup_stop.set()
+    workers.shutdown()
+
 app = FastAPI(
     title="Plant Health and Raster Analysis API",
     description="An API to predict plant health and perform raster analysis.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+@app.middleware("http")
+async def measure_requests(request: Request, call_next):
+    """Times every request, adds a Server-Timing header and records the Prometheus metrics."""
+    start = time.perf_counter()
+    with track_request() as timings:
+        response = await call_next(request)
+    elapsed = time.perf_counter() - start
+    response.headers["Server-Timing"] = timings.server_timing(elapsed)
+    # Label by route template (not the raw path) so tile URLs do not create a series each.
+    route = request.scope.get("route")
+    record_request(request.method, route.path if route is not None else "unmatched", response.status_code, elapsed, timings)
+    return response
+
 # --- Endpoints ---
 @app.get("/", summary="Root Endpoint", tags=["General"])
 def read_root():
     """A simple hello world endpoint."""
     return {"message": "Welcome to the API. Use the /docs endpoint to see available operations."}
 
+@app.get("/metrics", tags=["General"])
+def get_metrics():
+    """Request counts, latency and per-stage timing histograms in the Prometheus text format."""
+    return PlainTextResponse(metrics.exposition(), media_type="text/plain; version=0.0.4")
+
+@app.get("/health/ready", tags=["General"])
+def readiness():
+    """Reports whether every registered model has finished loading (503 until then)."""
+    body = {"ready": registry.ready, "models": registry.status()}
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
 @app.post("/predict", response_model=PredictionResponse, summary="Predict Plant Health", tags=["Prediction"])
-def predict_ndvi(features: PlantHealthFeatures):
+def predict_ndvi(features: PlantHealthFeatures, model: Optional[str] = None, version: Optional[str] = None):
     """Predicts average NDVI based on weather and location data."""
     try:
-        predicted_value = predictor.predict(features)
+        predictor = registry.get(model, version)
+        entry = registry.entry(model, version)
+        predicted_value = prediction_memo.get_or_compute(features, predictor.predict, namespace=(entry.name, entry.version))
         return {"predicted_avg_ndvi": predicted_value}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected server error occurred: {str(e)}")
 
+@app.get("/predict/cache", tags=["Prediction"])
+def prediction_cache_stats():
+    """Returns hit/miss/eviction counters of the prediction memo."""
+    return prediction_memo.stats()
+
+@app.post("/predict/batch", response_model=BatchPredictionResponse, summary="Predict Plant Health in Batch", tags=["Prediction"])
+def predict_ndvi_batch(request: BatchPredictionRequest, model: Optional[str] = None, version: Optional[str] = None):
+    """Predicts average NDVI for many inputs with a single model call."""
+    try:
+        predictor = registry.get(model, version)
+        entry = registry.entry(model, version)
+        if request.items is not None:
+            predicted_values = prediction_memo.get_or_compute_many(request.items, predictor.predict_batch, namespace=(entry.name, entry.version))
+        else:
+            predicted_values = predictor.predict_columns(request.columns.model_dump())
+        return {"predicted_avg_ndvi": predicted_values}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected server error occurred: {str(e)}")
+
+@app.get("/locate", tags=["Raster Processing"])
+def locate_tile(lat: float, lon: float, year: int):
+    """Finds the NDVI tile that contains a coordinate for the given year."""
+    record = find_tile(lat, lon, year)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"No tile found for coordinates ({lat}, {lon}) in year {year}.")
+    return {
+        "tile_id": tile_id(record),
+        "ndvi_file_name": record.ndvi_file_name,
+        "location": record.location,
+        "year": record.year,
+        "row": record.row,
+        "col": record.col,
+        "bounds": record.bounds.tolist(),
+    }
+
+@app.post("/locate/batch", response_model=CoordinateBatchResponse, tags=["Raster Processing"])
+def locate_tiles(request: CoordinateBatchRequest):
+    """Resolves many (lat, lon, year) points to tile ids in one call."""
+    return {"tile_ids": find_tiles(request.lats, request.lons, request.years)}
+
+def png_response(png, etag, filename, window):
+    """Wraps rendered PNG bytes in a revalidatable response."""
+    return Response(png, media_type="image/png", headers={
+        "ETag": etag,
+        "Cache-Control": "no-cache",
+        "Content-Disposition": f"attachment; filename={filename}",
+        "X-Raster-Window": ",".join(str(v) for v in window_params(window)),
+    })
+
+def request_window(mosaic, *requests):
+    """Resolves the block-aligned read window from the first request that names a bbox or window."""
+    bbox = window = None
+    for request in requests:
+        if request.bbox is not None:
+            bbox = (request.bbox.min_lon, request.bbox.min_lat, request.bbox.max_lon, request.bbox.max_lat)
+            break
+        if request.window is not None:
+            window = (request.window.col_off, request.window.row_off, request.window.width, request.window.height)
+            break
+    try:
+        return mosaic.resolve_window(bbox=bbox, window=window)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def request_decimation(mosaic, window, *requests):
+    """Returns the read decimation for the first request that asks for an output_size."""
+    output_size = next((r.output_size for r in requests if r.output_size), None)
+    return mosaic.choose_decimation(window, output_size)
+
+def request_scheme(request: ReclassifyRequest):
+    """Returns the class scheme of a reclassify request (the default NDVI classes without breaks)."""
+    if request.breaks is None:
+        return DEFAULT_SCHEME
+    return ClassScheme.from_breaks(request.breaks, request.right, request.palette, request.labels)
+
 @app.post("/reclassify", tags=["Raster Processing"])
-async def reclassify_ndvi(request: LocationYearRequest):
-    """Reclassifies a single NDVI raster file and returns a PNG image."""
-    file_path = find_raster_file(request.location, request.year)
-    if not file_path:
+async def reclassify_ndvi(request: ReclassifyRequest, renderer: Renderer = Renderer.figure, if_none_match: Optional[str] = Header(None)):
+    """
+    Reclassifies the NDVI mosaic of a location/year and returns a PNG image.
+    `renderer=fast` returns a palette PNG without title or legend (see /legend/reclassify.png).
+    Custom `breaks` (with optional `palette` and `labels`) replace the default
+    <0.2 / 0.2-0.4 / >0.4 classes.
+    """
+    mosaic = find_mosaic(request.location, request.year)
+    if not mosaic:
         raise HTTPException(status_code=404, detail=f"No raster found for location '{request.location}' in year {request.year}.")
 
     try:
-        with rasterio.open(file_path) as src:
-            ndvi = src.read(1)
-            reclassified = np.zeros(ndvi.shape, dtype=np.int16)
-            reclassified[ndvi < 0.2] = 1
-            reclassified[(ndvi >= 0.2) & (ndvi <= 0.4)] = 2
-            reclassified[ndvi > 0.4] = 3
-
-            output_buffer = BytesIO()
-            cmap = ListedColormap(['brown', 'yellow', 'green'])
-            fig, ax = plt.subplots(1, 1, figsize=(10, 10))
-            im = ax.imshow(reclassified, cmap=cmap, vmin=1, vmax=3)
-            ax.set_title(f'Reclassified NDVI - {request.location} {request.year}', fontsize=16)
-            ax.set_axis_off()
-            cbar = fig.colorbar(im, ax=ax, ticks=[1, 2, 3], shrink=0.6)
-            cbar.ax.set_yticklabels(['Non-vegetated (<0.2)', 'Sparse Veg (0.2-0.4)', 'Dense Veg (>0.4)'])
-            plt.savefig(output_buffer, format='png', bbox_inches='tight')
-            plt.close(fig)
-            output_buffer.seek(0)
-            return StreamingResponse(output_buffer, media_type="image/png", headers={"Content-Disposition": f"attachment; filename=reclassified_{request.location}_{request.year}.png"})
-    
+        window = request_window(mosaic, request)
+        decimation = request_decimation(mosaic, window, request)
+        scheme = request_scheme(request)
+        key = await workers.run_io(reclassify_key, mosaic, window, decimation, scheme, renderer.value)
+        etag = f'"{key}"'
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+
+        png = await workers.run_io(artifact_cache.get, key)
+        if png is None:
+            async with workers.slot():
+                reclassified = await workers.run_io(read_reclassified, mosaic, window, decimation, scheme)
+                run = workers.run_io if renderer == Renderer.fast else workers.run_render
+                png = await run(render_reclassified, reclassified, scheme, renderer.value, request.location, request.year)
+            await workers.run_io(artifact_cache.put, key, png)
+        return png_response(png, etag, f"reclassified_{request.location}_{request.year}.png", window)
+
+    except HTTPException:
+        raise
     except rasterio.RasterioIOError:
         raise HTTPException(status_code=422, detail="Could not read the raster file. Please ensure it is a valid GeoTIFF.")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred during processing: {str(e)}")
 
-@app.post("/calculate_change", tags=["Raster Processing"])
-async def calculate_ndvi_change(request_2018: LocationYearRequest, request_2024: LocationYearRequest):
-    """Calculates the change in NDVI between two years and returns a PNG image."""
+async def change_inputs(request_2018: LocationYearRequest, request_2024: LocationYearRequest, resampling: ResamplingMethod):
+    """
+    Resolves the mosaics, read window and decimation shared by the change
+    endpoints. The second mosaic is resampled onto the first one's grid when
+    they do not line up; the aligned raster is cached on disk.
+    """
     if request_2018.year == request_2024.year:
         raise HTTPException(status_code=400, detail="The input years must be different to calculate a change map.")
-    
-    file_path_2018 = find_raster_file(request_2018.location, request_2018.year)
-    file_path_2024 = find_raster_file(request_2024.location, request_2024.year)
 
-    if not file_path_2018 or not file_path_2024:
+    mosaic_2018 = find_mosaic(request_2018.location, request_2018.year)
+    mosaic_2024 = find_mosaic(request_2024.location, request_2024.year)
+
+    if not mosaic_2018 or not mosaic_2024:
         raise HTTPException(status_code=404, detail="One or both raster files not found.")
+    try:
+        mosaic_2024 = await workers.run_io(align_to, mosaic_2024, mosaic_2018, resampling.value)
+    except rasterio.RasterioIOError:
+        raise HTTPException(status_code=422, detail="Could not read one or more raster files. Please ensure they are valid GeoTIFFs.")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Could not align the rasters: {e}")
+
+    window = request_window(mosaic_2018, request_2018, request_2024)
+    decimation = request_decimation(mosaic_2018, window, request_2018, request_2024)
+    return mosaic_2018, mosaic_2024, window, decimation
+
+@app.post("/calculate_change", tags=["Raster Processing"])
+async def calculate_ndvi_change(request_2018: LocationYearRequest, request_2024: LocationYearRequest, renderer: Renderer = Renderer.figure, resampling: ResamplingMethod = ResamplingMethod.nearest, if_none_match: Optional[str] = Header(None)):
+    """
+    Calculates the change in NDVI between two years and returns a PNG image.
+    `renderer=fast` returns a palette PNG without title or colorbar (see /legend/change.png);
+    it is computed and encoded strip by strip, so memory stays flat for large mosaics.
+    If the years are on different grids, the second is resampled onto the first
+    (`resampling=nearest|bilinear`).
+    """
+    mosaic_2018, mosaic_2024, window, decimation = await change_inputs(request_2018, request_2024, resampling)
 
     try:
-        with rasterio.open(file_path_2018) as src_2018, rasterio.open(file_path_2024) as src_2024:
-            ndvi_2018 = src_2018.read(1)
-            ndvi_2024 = src_2024.read(1)
-
-            if ndvi_2018.shape != ndvi_2024.shape:
-                raise HTTPException(status_code=400, detail="The input rasters do not have the same dimensions.")
-
-            ndvi_change = ndvi_2024 - ndvi_2018
-            
-            output_buffer = BytesIO()
-            cmap = plt.get_cmap('RdYlGn')
-            fig, ax = plt.subplots(1, 1, figsize=(12, 12))
-            div_norm = colors.TwoSlopeNorm(vmin=-0.5, vcenter=0, vmax=0.5)
-            im = ax.imshow(ndvi_change, cmap=cmap, norm=div_norm)
-            ax.set_title(f"Vegetation Change ({request_2018.location}, {request_2018.year} vs {request_2024.year})", fontsize=16)
-            ax.set_axis_off()
-            cbar = fig.colorbar(im, ax=ax, shrink=0.7)
-            cbar.set_label('NDVI Change (Green = Gain, Red = Loss)')
-            plt.savefig(output_buffer, format='png', bbox_inches='tight')
-            plt.close(fig)
-            output_buffer.seek(0)
-            return StreamingResponse(output_buffer, media_type="image/png", headers={"Content-Disposition": f"attachment; filename=change_map_{request_2018.location}_{request_2018.year}-{request_2024.year}.png"})
+        key = await workers.run_io(change_key, mosaic_2018, mosaic_2024, window, decimation, resampling.value, renderer.value)
+        etag = f'"{key}"'
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+
+        png = await workers.run_io(artifact_cache.get, key)
+        if png is None:
+            async with workers.slot():
+                if renderer == Renderer.fast:
+                    png = await workers.run_io(render_change_streaming, mosaic_2018, mosaic_2024, window, decimation)
+                else:
+                    ndvi_change = await workers.run_io(read_change, mosaic_2018, mosaic_2024, window, decimation)
+                    png = await workers.run_render(render_change_figure, ndvi_change, request_2018.location, request_2018.year, request_2024.year)
+            await workers.run_io(artifact_cache.put, key, png)
+        return png_response(png, etag, f"change_map_{request_2018.location}_{request_2018.year}-{request_2024.year}.png", window)
 
+    except HTTPException:
+        raise
     except rasterio.RasterioIOError:
         raise HTTPException(status_code=422, detail="Could not read one or more raster files. Please ensure they are valid GeoTIFFs.")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred during processing: {str(e)}")
+
+@app.post("/calculate_change/stats", tags=["Raster Processing"])
+async def calculate_ndvi_change_stats(request_2018: LocationYearRequest, request_2024: LocationYearRequest, resampling: ResamplingMethod = ResamplingMethod.nearest):
+    """
+    Returns statistics of the NDVI change between two years (mean, std,
+    percentiles, share of pixels gaining or losing more than 0.1) for the
+    same area options as /calculate_change, computed in one streaming pass.
+    """
+    mosaic_2018, mosaic_2024, window, decimation = await change_inputs(request_2018, request_2024, resampling)
+
+    try:
+        params = {
+            "from": [request_2018.location, request_2018.year],
+            "to": [request_2024.location, request_2024.year],
+            "window": window_params(window),
+            "decimation": decimation,
+            "resampling": resampling.value,
+        }
+        key = await workers.run_io(artifact_cache.key, "change-stats", params, mosaic_2018.sources + mosaic_2024.sources)
+        cached = await workers.run_io(artifact_cache.get, key)
+        if cached is not None:
+            return JSONResponse(json.loads(cached))
+
+        async with workers.slot():
+            result = await workers.run_io(change_stats, mosaic_2018, mosaic_2024, window, decimation)
+        result = {"window": window_params(window), "decimation": decimation, **result}
+        await workers.run_io(artifact_cache.put, key, json.dumps(result).encode())
+        return JSONResponse(result)
+
+    except HTTPException:
+        raise
+    except rasterio.RasterioIOError:
+        raise HTTPException(status_code=422, detail="Could not read one or more raster files. Please ensure they are valid GeoTIFFs.")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred during processing: {str(e)}")
+
+def find_cube(location):
+    """Returns the NDVI cube of a location with the mosaic that defines its grid."""
+    cube = get_cube(location)
+    if cube is None:
+        raise HTTPException(status_code=404, detail=f"No time-series cube for '{location}'. Run `python timeseries.py build`.")
+    mosaic = find_mosaic(location, cube.years[0])
+    if not mosaic or mosaic.shape != cube.shape or not cube.current:
+        raise HTTPException(status_code=409, detail=f"The time-series cube for '{location}' is out of date. Rebuild it.")
+    return cube, mosaic
+
+@app.get("/timeseries/{location}", tags=["Time Series"])
+def get_timeseries_info(location: str, lat: Optional[float] = None, lon: Optional[float] = None):
+    """
+    Describes a location's NDVI cube (years, grid size). With `lat`/`lon`,
+    also returns the NDVI of that pixel for every year.
+    """
+    cube, mosaic = find_cube(location)
+    result = {"location": location, "years": cube.years, "shape": list(cube.shape)}
+    if lat is not None and lon is not None:
+        row, col = mosaic.pixel_from_lonlat(lon, lat)
+        if not (0 <= row < cube.shape[0] and 0 <= col < cube.shape[1]):
+            raise HTTPException(status_code=404, detail="The point is outside the raster.")
+        result["pixel"] = {"row": row, "col": col, "ndvi": cube.pixel_series(row, col)}
+    return result
+
+@app.post("/timeseries/{metric}", tags=["Time Series"])
+async def get_timeseries_metric(metric: TimeSeriesMetric, request: TimeSeriesRequest, format: str = "png", if_none_match: Optional[str] = Header(None)):
+    """
+    Per-pixel analysis over the years of a location's NDVI cube:
+    `trend` (least-squares NDVI change per year), `max_drop` (largest fall
+    from an earlier peak) or `anomaly` (`year` minus the mean of the other
+    years). Returns a palette PNG, or summary statistics with `format=json`.
+    """
+    if format not in ("png", "json"):
+        raise HTTPException(status_code=400, detail="format must be 'png' or 'json'.")
+    if metric == TimeSeriesMetric.anomaly and request.year is None:
+        raise HTTPException(status_code=400, detail="The anomaly metric needs a 'year'.")
+    cube, mosaic = find_cube(request.location)
+    window = request_window(mosaic, request)
+    decimation = request_decimation(mosaic, window, request)
+
+    try:
+        params = {
+            "metric": metric.value,
+            "location": request.location,
+            "window": window_params(window),
+            "decimation": decimation,
+            "years": [request.start_year, request.end_year, request.year],
+            "format": format,
+            "version": RENDER_VERSION,
+        }
+        key = await workers.run_io(artifact_cache.key, "timeseries", params, [cube.path])
+        etag = f'"{key}"'
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+
+        body = await workers.run_io(artifact_cache.get, key)
+        if body is None:
+            async with workers.slot():
+                values = await workers.run_io(compute_metric, cube, metric.value, window, decimation,
+                                              request.start_year, request.end_year, request.year)
+                if format == "json":
+                    summary = await workers.run_io(summarize_metric, values)
+                    body = json.dumps({"metric": metric.value, "window": window_params(window), "decimation": decimation, **summary}).encode()
+                else:
+                    body = await workers.run_io(render_scaled_fast, values, METRIC_RANGES[metric.value])
+            await workers.run_io(artifact_cache.put, key, body)
+        if format == "json":
+            return Response(body, media_type="application/json", headers={"ETag": etag})
+        return png_response(body, etag, f"{metric.value}_{request.location}.png", window)
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred during processing: {str(e)}")
+
+@app.get("/stats", tags=["Raster Processing"])
+def get_ndvi_stats(location: str, year: int, per_tile: bool = False, histogram: bool = False, compare_year: Optional[int] = None):
+    """
+    Returns precomputed NDVI statistics for a location/year: mean, std,
+    percentiles, nodata counts and the reclassification class fractions.
+    `per_tile=true` adds each tile's summary; `compare_year` adds the
+    per-tile change of mean NDVI from `compare_year` to `year`.
+    Built offline with `python stats.py build`; GeoTIFFs are never read here.
+    """
+    if not stats_store.refresh():
+        raise HTTPException(status_code=503, detail="NDVI statistics have not been built. Run `python stats.py build`.")
+    summary = stats_store.area(location, year)
+    if summary is None:
+        raise HTTPException(status_code=404, detail=f"No statistics for location '{location}' in year {year}.")
+
+    result = {"location": location, "year": year, **summary}
+    if per_tile:
+        result["tile_stats"] = [{"row": row, "col": col, **tile} for (row, col), tile in sorted(stats_store.tiles(location, year).items())]
+    if histogram:
+        result["histogram"] = {"bin_edges": stats_store.bin_edges, "counts": stats_store.histogram(location, year)}
+    if compare_year is not None:
+        baseline = stats_store.area(location, compare_year)
+        if baseline is None:
+            raise HTTPException(status_code=404, detail=f"No statistics for location '{location}' in year {compare_year}.")
+        has_means = summary["mean"] is not None and baseline["mean"] is not None
+        result["compare_year"] = compare_year
+        result["mean_change"] = round(summary["mean"] - baseline["mean"], 6) if has_means else None
+        result["tile_mean_change"] = stats_store.mean_change(location, compare_year, year)
+    return result
+
+# Map tiles are content-addressed by their source checksums, so browsers may keep them for a long time.
+TILE_MAX_AGE = int(os.getenv("PY_SERVER_TILE_MAX_AGE", "86400"))
+TILE_LAYERS = ("ndvi", "reclassify", "change")
+
+def tile_years(layer, year):
+    """Parses the {year} path segment: a single year, or 'from-to' for the change layer."""
+    try:
+        years = [int(part) for part in year.split("-")]
+    except ValueError:
+        years = []
+    expected = 2 if layer == "change" else 1
+    if len(years) != expected:
+        example = "2018-2024" if layer == "change" else "2018"
+        raise HTTPException(status_code=400, detail=f"Layer '{layer}' expects a year like '{example}'.")
+    return years
+
+def render_map_tile(layer, mosaics, z, x, y):
+    """Reads and colours one XYZ tile of a layer; transparent where there is no data."""
+    arrays = [read_tile(mosaic, z, x, y) for mosaic in mosaics]
+    if any(array is None for array in arrays):
+        return empty_tile()
+    if layer == "ndvi":
+        return render_ndvi_fast(arrays[0])
+    if layer == "reclassify":
+        return render_reclassified_fast(classify(arrays[0]))
+    return render_change_fast(arrays[1] - arrays[0])
+
+@app.get("/tiles/{layer}/{location}/{year}/{z}/{x}/{y}.png", tags=["Raster Processing"])
+async def get_map_tile(layer: str, location: str, year: str, z: int, x: int, y: int, if_none_match: Optional[str] = Header(None)):
+    """
+    Serves a 256px web-mercator (XYZ) map tile of the `ndvi`, `reclassify` or
+    `change` layer. For `change`, `year` is the pair to compare, e.g. `2018-2024`.
+    Colours match the fast renderer (see /legend/{layer}.png).
+    """
+    if layer not in TILE_LAYERS:
+        raise HTTPException(status_code=404, detail=f"Unknown tile layer '{layer}'.")
+    if not valid_tile(z, x, y):
+        raise HTTPException(status_code=404, detail=f"Tile {z}/{x}/{y} does not exist.")
+    years = tile_years(layer, year)
+    mosaics = [find_mosaic(location, tile_year) for tile_year in years]
+    if not all(mosaics):
+        raise HTTPException(status_code=404, detail=f"No raster found for location '{location}' in year {year}.")
+
+    try:
+        params = {"layer": layer, "location": location, "years": years, "tile": [z, x, y], "version": RENDER_VERSION}
+        sources = [path for mosaic in mosaics for path in mosaic.sources]
+        key = await workers.run_io(artifact_cache.key, "tile", params, sources)
+        etag = f'"{key}"'
+        headers = {"ETag": etag, "Cache-Control": f"public, max-age={TILE_MAX_AGE}"}
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+
+        png = await workers.run_io(artifact_cache.get, key)
+        if png is None:
+            async with workers.slot():
+                png = await workers.run_io(render_map_tile, layer, mosaics, z, x, y)
+            await workers.run_io(artifact_cache.put, key, png)
+        return Response(png, media_type="image/png", headers=headers)
+
+    except HTTPException:
+        raise
+    except rasterio.RasterioIOError:
+        raise HTTPException(status_code=422, detail="Could not read the raster file. Please ensure it is a valid GeoTIFF.")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred during processing: {str(e)}")
+
+@app.get("/legend/{layer}.png", tags=["Raster Processing"])
+async def get_legend(layer: str, if_none_match: Optional[str] = Header(None)):
+    """Returns the static legend overlay for fast-rendered `ndvi`, `reclassify` or `change` images."""
+    if layer not in ("ndvi", "reclassify", "change"):
+        raise HTTPException(status_code=404, detail=f"No legend for layer '{layer}'.")
+    key = artifact_cache.key("legend", {"layer": layer, "version": RENDER_VERSION})
+    etag = f'"{key}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=86400"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    # Rendered once per cache lifetime, not once per request in whichever render worker picks it up
+    png = await workers.run_io(artifact_cache.get, key)
+    if png is None:
+        png = await workers.run_render(render_legend, layer)
+        await workers.run_io(artifact_cache.put, key, png)
+    return Response(png, media_type="image/png", headers=headers)
@@ -0,0 +1,116 @@
+# memo.py
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from models import PlantHealthFeatures
+
+MEMO_MAX_ENTRIES = int(os.getenv("PY_SERVER_PREDICT_CACHE_SIZE", "4096"))
+MEMO_TTL_SECONDS = float(os.getenv("PY_SERVER_PREDICT_CACHE_TTL", "3600"))
+# Optional per-field rounding steps, e.g. '{"min_temp_c": 0.5, "total_precip_mm": 5}'.
+MEMO_QUANTIZATION = json.loads(os.getenv("PY_SERVER_PREDICT_QUANTIZATION", "{}"))
+
+class PredictionMemo:
+    """
+    Thread-safe LRU + TTL memoization for single-row predictions.
+
+    Keys are the validated feature values, optionally rounded to a per-field
+    step (``quantization``) so near-identical requests share an entry.
+    Counts hits, misses, evictions (capacity) and expirations (TTL).
+    """
+    def __init__(self, max_entries=MEMO_MAX_ENTRIES, ttl_seconds=MEMO_TTL_SECONDS, quantization=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.quantization = dict(quantization or {})
+        unknown = set(self.quantization) - set(PlantHealthFeatures.model_fields)
+        if unknown:
+            raise ValueError(f"Cannot quantize unknown fields: {sorted(unknown)}")
+        self._fields = list(PlantHealthFeatures.model_fields)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def quantize(self, features: PlantHealthFeatures) -> PlantHealthFeatures:
+        """Rounds the configured fields to their steps (a no-op without quantization)."""
+        if not self.quantization:
+            return features
+        update = {
+            name: round(round(getattr(features, name) / step) * step, 10)
+            for name, step in self.quantization.items() if step
+        }
+        return features.model_copy(update=update)
+
+    def key(self, features: PlantHealthFeatures, namespace=()):
+        """Builds the memo key for (already quantized) features."""
+        return (*namespace, *(getattr(features, name) for name in self._fields))
+
+    def get(self, key):
+        """Returns the memoized value or None, counting a hit or miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, features: PlantHealthFeatures, compute, namespace=()):
+        """
+        Returns the memoized prediction for the features, computing it on a miss.
+        With quantization the model sees the rounded features, so the result
+        does not depend on which request filled the entry.
+        """
+        features = self.quantize(features)
+        key = self.key(features, namespace)
+        value = self.get(key)
+        if value is None:
+            value = compute(features)
+            self.put(key, value)
+        return value
+
+    def get_or_compute_many(self, items, compute_batch, namespace=()):
+        """Batch variant: computes only the missing rows, with a single compute_batch call."""
+        items = [self.quantize(item) for item in items]
+        keys = [self.key(item, namespace) for item in items]
+        values = [self.get(key) for key in keys]
+        missing = [i for i, value in enumerate(values) if value is None]
+        if missing:
+            for i, value in zip(missing, compute_batch([items[i] for i in missing])):
+                values[i] = value
+                self.put(keys[i], value)
+        return values
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "quantization": self.quantization,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+prediction_memo = PredictionMemo(quantization=MEMO_QUANTIZATION)
@@ -0,0 +1,175 @@
+# metrics.py
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implicit.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+STAGES = ("catalog", "cache", "read", "compute", "render", "predict")
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+class Counter:
+    """A monotonically increasing count per label set."""
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value:g}"
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label set."""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def samples(self):
+        with self._lock:
+            series = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._series.items())
+        for labels, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = bound if bound == "+Inf" else f"{bound:g}"
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, [('le', le)])} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {total:.6f}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+class MetricsRegistry:
+    """Holds the process's metrics and renders them in the Prometheus text format."""
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def exposition(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+REQUESTS = metrics.register(Counter(
+    "py_server_requests_total", "HTTP requests by route and status code.", ("method", "route", "status")))
+REQUEST_SECONDS = metrics.register(Histogram(
+    "py_server_request_duration_seconds", "Wall-clock time of HTTP requests.", ("method", "route")))
+STAGE_SECONDS = metrics.register(Histogram(
+    "py_server_stage_duration_seconds", "Time spent in each processing stage per request.", ("route", "stage")))
+
+# --- Per-request stage timing ---
+
+class RequestTimings:
+    """Seconds spent per stage during one request, summed across its worker threads."""
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def server_timing(self, total: float):
+        """The Server-Timing header value, durations in milliseconds."""
+        with self._lock:
+            stages = sorted(self.stages.items(), key=lambda item: STAGES.index(item[0]) if item[0] in STAGES else len(STAGES))
+        entries = [f"{stage};dur={seconds * 1e3:.2f}" for stage, seconds in stages]
+        return ", ".join([*entries, f"total;dur={total * 1e3:.2f}"])
+
+_request_timings = ContextVar("request_timings", default=None)
+_active_stage = ContextVar("active_stage", default=None)
+
+@contextmanager
+def track_request():
+    """Collects the stage timings of everything run in this context (and contexts copied from it)."""
+    timings = RequestTimings()
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+@contextmanager
+def stage(name: str):
+    """
+    Charges the time of the block to a stage of the current request.
+
+    Stages are exclusive: a nested stage pauses the enclosing one, so a
+    tile read inside a render is counted as read, not twice. Outside a
+    request (CLI jobs, render worker processes) this does nothing.
+    """
+    timings = _request_timings.get()
+    if timings is None:
+        yield
+        return
+    now = time.perf_counter()
+    outer = _active_stage.get()
+    if outer is not None:
+        timings.add(outer[0], now - outer[1])
+    current = [name, now]
+    token = _active_stage.set(current)
+    try:
+        yield
+    finally:
+        now = time.perf_counter()
+        timings.add(name, now - current[1])
+        _active_stage.reset(token)
+        if outer is not None:
+            outer[1] = now
+
+def timed(name: str):
+    """Decorator form of ``stage``."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def record_request(method: str, route: str, status: int, seconds: float, timings: RequestTimings):
+    REQUESTS.inc(method, route, str(status))
+    REQUEST_SECONDS.observe(seconds, method, route)
+    for name, stage_seconds in list(timings.stages.items()):
+        STAGE_SECONDS.observe(stage_seconds, route, name)
@@ -1,5 +1,7 @@
 # models.py
-from pydantic import BaseModel, Field
+import re
+from pydantic import BaseModel, Field, model_validator
+from typing import Annotated, List, Optional
 from enum import Enum
 
 class Location(str, Enum):
@@ -29,7 +31,143 @@ class PredictionResponse(BaseModel):
     predicted_avg_ndvi: float
 
 
+class PlantHealthColumns(BaseModel):
+    """Defines a batch of prediction inputs as equal-length columns."""
+    year: List[int]
+    month: List[Annotated[int, Field(ge=1, le=12)]]
+    min_temp_c: List[float]
+    max_temp_c: List[float]
+    mean_temp_c: List[float]
+    total_precip_mm: List[float]
+    total_solar_rad_j_m2: List[float]
+    rainy_days: List[int]
+    location: List[Location]
+
+    @model_validator(mode="after")
+    def check_lengths(self):
+        if len({len(values) for values in self.model_dump().values()}) > 1:
+            raise ValueError("All columns must have the same length.")
+        return self
+
+class BatchPredictionRequest(BaseModel):
+    """Defines a batch prediction request, given either as `items` or as `columns`."""
+    items: Optional[List[PlantHealthFeatures]] = Field(None, description="Prediction inputs, one object per row.")
+    columns: Optional[PlantHealthColumns] = Field(None, description="Prediction inputs as columnar arrays.")
+
+    @model_validator(mode="after")
+    def check_one_form(self):
+        if (self.items is None) == (self.columns is None):
+            raise ValueError("Provide exactly one of 'items' or 'columns'.")
+        return self
+
+class BatchPredictionResponse(BaseModel):
+    """Defines the structure of the batch prediction response, in input order."""
+    predicted_avg_ndvi: List[float]
+
+class BoundingBox(BaseModel):
+    """A lon/lat bounding box (EPSG:4326)."""
+    min_lon: float = Field(..., example=73.15)
+    min_lat: float = Field(..., example=19.19)
+    max_lon: float = Field(..., example=73.21)
+    max_lat: float = Field(..., example=19.24)
+
+    @model_validator(mode="after")
+    def check_order(self):
+        if self.min_lon >= self.max_lon or self.min_lat >= self.max_lat:
+            raise ValueError("min_lon/min_lat must be smaller than max_lon/max_lat.")
+        return self
+
+class PixelWindow(BaseModel):
+    """A pixel window in the location's mosaic grid."""
+    col_off: int = Field(..., ge=0, example=0)
+    row_off: int = Field(..., ge=0, example=0)
+    width: int = Field(..., gt=0, example=512)
+    height: int = Field(..., gt=0, example=512)
+
 class LocationYearRequest(BaseModel):
     """Defines the input features for raster processing endpoints."""
     location: str = Field(..., example="Kalyan", description="The name of the location.")
-    year: int = Field(..., example=2018, description="The year of the satellite imagery.")
\ No newline at end of file
+    year: int = Field(..., example=2018, description="The year of the satellite imagery.")
+    bbox: Optional[BoundingBox] = Field(None, description="Only process this lon/lat area.")
+    window: Optional[PixelWindow] = Field(None, description="Only process this pixel window of the mosaic.")
+    output_size: Optional[int] = Field(None, gt=0, example=1024, description="Downsample so the longer side is about this many pixels (uses COG overviews when available).")
+
+    @model_validator(mode="after")
+    def check_one_area(self):
+        if self.bbox is not None and self.window is not None:
+            raise ValueError("Provide at most one of 'bbox' or 'window'.")
+        return self
+
+class ReclassifyRequest(LocationYearRequest):
+    """A raster request with optional custom class breaks and colours."""
+    breaks: Optional[List[float]] = Field(None, example=[0.2, 0.4], description="Ascending class breaks; defaults to the <0.2 / 0.2-0.4 / >0.4 classes.")
+    right: bool = Field(False, description="Put values equal to a break in the lower class instead of the upper one.")
+    palette: Optional[List[str]] = Field(None, example=["#a52a2a", "#ffff00", "#008000"], description="One '#rrggbb' colour per class.")
+    labels: Optional[List[str]] = Field(None, description="One legend label per class (figure renderer).")
+
+    @model_validator(mode="after")
+    def check_classes(self):
+        if self.breaks is None:
+            if self.palette is not None or self.labels is not None:
+                raise ValueError("'palette' and 'labels' need 'breaks'.")
+            return self
+        if not self.breaks or len(self.breaks) > 254:
+            raise ValueError("Provide between 1 and 254 breaks.")
+        if any(a >= b for a, b in zip(self.breaks, self.breaks[1:])):
+            raise ValueError("'breaks' must be strictly ascending.")
+        n_classes = len(self.breaks) + 1
+        if self.palette is not None and len(self.palette) != n_classes:
+            raise ValueError(f"'palette' needs {n_classes} colours for {len(self.breaks)} breaks.")
+        if self.palette is not None and not all(re.fullmatch(r"#[0-9a-fA-F]{6}", c) for c in self.palette):
+            raise ValueError("Palette colours must look like '#rrggbb'.")
+        if self.labels is not None and len(self.labels) != n_classes:
+            raise ValueError(f"'labels' needs {n_classes} entries for {len(self.breaks)} breaks.")
+        return self
+
+class Renderer(str, Enum):
+    """Rendering modes for raster endpoints."""
+    fast = "fast"
+    figure = "figure"
+
+class ResamplingMethod(str, Enum):
+    """How a raster is resampled onto another year's grid when they do not line up."""
+    nearest = "nearest"
+    bilinear = "bilinear"
+
+class CoordinateBatchRequest(BaseModel):
+    """Defines a batch of points to resolve to NDVI tiles."""
+    lats: List[float] = Field(..., example=[19.215, 19.2191], description="Latitudes of the points.")
+    lons: List[float] = Field(..., example=[73.1825, 72.9131], description="Longitudes of the points.")
+    years: List[int] = Field(..., example=[2018, 2024], description="Imagery year for each point.")
+
+    @model_validator(mode="after")
+    def check_lengths(self):
+        if not len(self.lats) == len(self.lons) == len(self.years):
+            raise ValueError("lats, lons and years must have the same length.")
+        return self
+
+class CoordinateBatchResponse(BaseModel):
+    """Defines the tile ids resolved for a batch of points (null when not covered)."""
+    tile_ids: List[Optional[str]]
+
+class TimeSeriesMetric(str, Enum):
+    """Per-pixel analyses over a location's NDVI cube."""
+    trend = "trend"
+    max_drop = "max_drop"
+    anomaly = "anomaly"
+
+class TimeSeriesRequest(BaseModel):
+    """Defines the area and years for a time-series analysis."""
+    location: str = Field(..., example="Thane", description="The name of the location.")
+    bbox: Optional[BoundingBox] = Field(None, description="Only process this lon/lat area.")
+    window: Optional[PixelWindow] = Field(None, description="Only process this pixel window of the mosaic.")
+    output_size: Optional[int] = Field(None, gt=0, example=1024, description="Downsample so the longer side is about this many pixels.")
+    start_year: Optional[int] = Field(None, example=2018, description="First year to include (trend and max_drop).")
+    end_year: Optional[int] = Field(None, example=2024, description="Last year to include (trend and max_drop).")
+    year: Optional[int] = Field(None, example=2024, description="Year to compare against the others (anomaly).")
+
+    @model_validator(mode="after")
+    def check_one_area(self):
+        if self.bbox is not None and self.window is not None:
+            raise ValueError("Provide at most one of 'bbox' or 'window'.")
+        return self
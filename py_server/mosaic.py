@@ -0,0 +1,230 @@
+# mosaic.py
+import os
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import rasterio
+from rasterio.transform import Affine, rowcol
+from rasterio.warp import transform, transform_bounds
+from rasterio.errors import WindowError
+from rasterio.windows import Window, from_bounds
+
+from catalog import TileCatalog, catalog
+from metrics import timed
+
+@dataclass(frozen=True)
+class MosaicPart:
+    """Placement of one tile inside the mosaic grid (in mosaic pixels)."""
+    path: str
+    row_off: int
+    col_off: int
+    height: int
+    width: int
+    nodata: float
+    block_shape: tuple
+    overviews: tuple
+
+class Mosaic:
+    """
+    Virtual raster assembling every tile of a location/year on one grid.
+
+    Only tile headers are read up front; pixel data is read on demand and
+    only from the tiles that intersect the requested window.
+    """
+    def __init__(self, location: str, year: int, tiles):
+        self.location = location
+        self.year = year
+
+        headers = []
+        for tile in tiles:
+            path = tile.read_path
+            if not os.path.exists(path):
+                print(f"⚠️ Skipping missing tile {path}")
+                continue
+            with rasterio.open(path) as src:
+                headers.append((path, src.crs, src.transform, src.height, src.width, src.nodata,
+                                (src.block_shapes[0], tuple(src.overviews(1)))))
+        if not headers:
+            raise FileNotFoundError(f"No raster tiles on disk for {location} {year}.")
+
+        self.crs = headers[0][1]
+        first_transform = headers[0][2]
+        x_res, y_res = first_transform.a, -first_transform.e
+        for path, crs, *_ in headers:
+            if crs != self.crs:
+                raise ValueError(f"Tile {path} has CRS {crs}, expected {self.crs}.")
+
+        left = min(t.c for _, _, t, _, _, _, _ in headers)
+        top = max(t.f for _, _, t, _, _, _, _ in headers)
+        right = max(t.c + w * t.a for _, _, t, _, w, _, _ in headers)
+        bottom = min(t.f + h * t.e for _, _, t, h, _, _, _ in headers)
+
+        self.transform = Affine(x_res, 0.0, left, 0.0, -y_res, top)
+        self.width = int(round((right - left) / x_res))
+        self.height = int(round((top - bottom) / y_res))
+        self.block_shape = headers[0][6][0]
+        self.parts = [
+            MosaicPart(
+                path=path,
+                row_off=int(round((top - t.f) / y_res)),
+                col_off=int(round((t.c - left) / x_res)),
+                height=h,
+                width=w,
+                nodata=nodata,
+                block_shape=layout[0],
+                overviews=layout[1],
+            )
+            for path, _, t, h, w, nodata, layout in headers
+        ]
+        # Overview factors every tile has, e.g. (2, 4, 8) after COG ingestion.
+        self.overview_factors = tuple(sorted(set.intersection(*(set(part.overviews) for part in self.parts))))
+
+    @property
+    def shape(self):
+        return (self.height, self.width)
+
+    @property
+    def sources(self):
+        """Paths of the tiles that make up the mosaic."""
+        return [part.path for part in self.parts]
+
+    @property
+    def full_window(self):
+        return Window(0, 0, self.width, self.height)
+
+    def window_from_lonlat(self, min_lon, min_lat, max_lon, max_lat):
+        """Converts a lon/lat bbox to a mosaic pixel window, clipped to the mosaic."""
+        bounds = transform_bounds("EPSG:4326", self.crs, min_lon, min_lat, max_lon, max_lat)
+        window = from_bounds(*bounds, transform=self.transform)
+        window = window.round_offsets(op="floor").round_lengths(op="ceil")
+        return self.clip_window(window)
+
+    def pixel_from_lonlat(self, lon, lat):
+        """Returns the (row, col) of the mosaic pixel containing a lon/lat point (may be out of range)."""
+        xs, ys = transform("EPSG:4326", self.crs, [lon], [lat])
+        row, col = rowcol(self.transform, xs[0], ys[0])
+        return int(row), int(col)
+
+    def clip_window(self, window: Window):
+        """Clips a window to the mosaic, raising ValueError if they do not overlap."""
+        try:
+            return window.intersection(self.full_window)
+        except WindowError:
+            raise ValueError("The requested area does not overlap the raster.")
+
+    def align_to_blocks(self, window: Window):
+        """
+        Expands a window outward to the internal block grid of the tiles it
+        touches, so every block GDAL has to decode is used in full.
+        """
+        row0, col0 = int(window.row_off), int(window.col_off)
+        row1, col1 = row0 + int(window.height), col0 + int(window.width)
+        for part in self.parts:
+            block_h, block_w = part.block_shape
+            if part.row_off <= row0 < part.row_off + part.height:
+                row0 = min(row0, part.row_off + (row0 - part.row_off) // block_h * block_h)
+            if part.row_off < row1 <= part.row_off + part.height:
+                row1 = max(row1, min(part.row_off + -(-(row1 - part.row_off) // block_h) * block_h, part.row_off + part.height))
+            if part.col_off <= col0 < part.col_off + part.width:
+                col0 = min(col0, part.col_off + (col0 - part.col_off) // block_w * block_w)
+            if part.col_off < col1 <= part.col_off + part.width:
+                col1 = max(col1, min(part.col_off + -(-(col1 - part.col_off) // block_w) * block_w, part.col_off + part.width))
+        return Window(col0, row0, col1 - col0, row1 - row0)
+
+    def resolve_window(self, bbox=None, window=None):
+        """
+        Returns the block-aligned read window for an optional lon/lat bbox
+        (min_lon, min_lat, max_lon, max_lat) or pixel window (col_off, row_off,
+        width, height); the whole mosaic when neither is given.
+        """
+        if bbox is not None:
+            requested = self.window_from_lonlat(*bbox)
+        elif window is not None:
+            requested = self.clip_window(Window(*window))
+        else:
+            return self.full_window
+        return self.align_to_blocks(requested)
+
+    def choose_decimation(self, window: Window, output_size: int = None):
+        """
+        Picks the read decimation factor for a window so the output is about
+        ``output_size`` pixels on its longer side. Snaps to an overview factor
+        when one is close, so GDAL returns that pyramid level as stored
+        instead of resampling; beyond the coarsest overview GDAL still reads
+        from it and subsamples.
+        """
+        if not output_size:
+            return 1
+        wanted = max(int(window.height), int(window.width)) / output_size
+        if wanted < 2:
+            return 1
+        usable = [factor for factor in self.overview_factors if factor <= wanted]
+        if usable and wanted < 2 * max(usable):
+            return max(usable)
+        return int(wanted)
+
+    @staticmethod
+    def output_shape(window: Window, decimation: int = 1):
+        """Shape of the array read for a window at a decimation factor."""
+        return (max(1, round(int(window.height) / decimation)), max(1, round(int(window.width) / decimation)))
+
+    def parts_for_window(self, window: Window, decimation: int = 1):
+        """
+        Yields (part, tile_window, out_slices) for each tile that intersects
+        the window; out_slices index the (decimated) output array.
+        """
+        row0, col0 = int(window.row_off), int(window.col_off)
+        row1, col1 = row0 + int(window.height), col0 + int(window.width)
+        for part in self.parts:
+            r0, r1 = max(row0, part.row_off), min(row1, part.row_off + part.height)
+            c0, c1 = max(col0, part.col_off), min(col1, part.col_off + part.width)
+            if r0 >= r1 or c0 >= c1:
+                continue
+            tile_window = Window(c0 - part.col_off, r0 - part.row_off, c1 - c0, r1 - r0)
+            # Rounding shared tile edges the same way keeps decimated pieces contiguous.
+            out_slices = (
+                slice(round((r0 - row0) / decimation), round((r1 - row0) / decimation)),
+                slice(round((c0 - col0) / decimation), round((c1 - col0) / decimation)),
+            )
+            if out_slices[0].start == out_slices[0].stop or out_slices[1].start == out_slices[1].stop:
+                continue
+            yield part, tile_window, out_slices
+
+    @timed("read")
+    def read(self, window: Window = None, decimation: int = 1):
+        """
+        Reads the window (default: whole mosaic) as float32 with NaN for nodata
+        and gaps, optionally downsampled by an integer decimation factor.
+        """
+        window = window or self.full_window
+        out = np.full(self.output_shape(window, decimation), np.nan, dtype=np.float32)
+        for part, tile_window, out_slices in self.parts_for_window(window, decimation):
+            out_shape = (out_slices[0].stop - out_slices[0].start, out_slices[1].stop - out_slices[1].start)
+            with rasterio.open(part.path) as src:
+                data = src.read(1, window=tile_window, out_shape=out_shape, out_dtype=np.float32)
+            if part.nodata is not None and not np.isnan(part.nodata):
+                data[data == part.nodata] = np.nan
+            out[out_slices] = data
+        return out
+
+_mosaics = {}
+_mosaics_lock = threading.Lock()
+
+@timed("catalog")
+def get_mosaic(location: str, year: int, tile_catalog: TileCatalog = catalog):
+    """Returns the (cached) mosaic for a location/year, or None if the catalog has no tiles for it."""
+    tiles = tile_catalog.tiles(location, year)
+    if not tiles:
+        return None
+    key = (location, int(year), id(tile_catalog), tile_catalog.version)
+    with _mosaics_lock:
+        mosaic = _mosaics.get(key)
+    if mosaic is None:
+        mosaic = Mosaic(location, int(year), tiles)
+        with _mosaics_lock:
+            # Drop mosaics built from an older version of the catalog.
+            for stale in [k for k in _mosaics if k[2:] != key[2:]]:
+                del _mosaics[stale]
+            _mosaics[key] = mosaic
+    return mosaic
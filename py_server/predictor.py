@@ -1,60 +1,126 @@
 # predictor.py
-import pickle
-import pandas as pd
+import threading
+from typing import List
+
+import joblib
+import numpy as np
 from fastapi import HTTPException
-from models import PlantHealthFeatures
+from metrics import timed
+from models import Location, PlantHealthFeatures
 
 MODEL_FILENAME = 'plant_health_monthly_model-1000.pkl'
 
-class ModelPredictor:
-    """A class to handle model loading and prediction."""
-    def __init__(self, model_path: str):
-        try:
-            with open(model_path, 'rb') as file:
-                self.model, self.model_features = pickle.load(file)
-            print("✅ Model and feature list loaded successfully.")
-        except FileNotFoundError:
-            print(f"❌ CRITICAL ERROR: Model file '{model_path}' not found.")
-            raise RuntimeError(f"Could not load the model from {model_path}")
+NUMERIC_FEATURES = ['year', 'month', 'min_temp_c', 'max_temp_c', 'mean_temp_c',
+                    'total_precip_mm', 'total_solar_rad_j_m2', 'rainy_days']
 
-    def predict(self, features: PlantHealthFeatures) -> float:
-        """
-        Generates a prediction from the input features.
-        """
-        # 1. Convert the input data into a dictionary
-        input_data = features.dict()
+# Training exports have used both prefixes for the location one-hot columns.
+LOCATION_PREFIXES = ('location_', 'loc_')
+# Models with location_ columns were trained with drop_first one-hot encoding: the
+# reference location has no column of its own and is encoded as all zeros.
+DROP_FIRST_PREFIX = 'location_'
+# Column position of the reference location (no one-hot column is set).
+REFERENCE_POSITION = -1
+
+def load_model_file(model_path: str, mmap_mode=None):
+    """
+    Loads a (model, feature_list) pair saved with joblib or pickle.
 
-        # 2. Create a DataFrame with the correct columns and order
-        prediction_df = pd.DataFrame(columns=self.model_features)
-        prediction_df.loc[0] = 0 # Initialize a row with zeros
+    With ``mmap_mode='r'`` the numpy arrays of an uncompressed joblib file are
+    memory-mapped, so several server processes share one copy in the page cache.
+    """
+    try:
+        model, feature_list = joblib.load(model_path, mmap_mode=mmap_mode)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Model file not found at: {model_path}")
+    return model, list(feature_list)
+
+class ModelPredictor:
+    """Turns validated PlantHealthFeatures into model inputs and predictions."""
+    def __init__(self, model, feature_list):
+        self.model = model
+        self.feature_list = feature_list
+        self._local = threading.local()
+        self._index_features()
 
-        # 3. Populate the DataFrame with the input data
-        for key, value in input_data.items():
-            if key != 'location':
-                prediction_df[key] = value
+    @classmethod
+    def from_file(cls, model_path: str, mmap_mode=None):
+        return cls(*load_model_file(model_path, mmap_mode))
 
-        # 4. Handle the one-hot encoded 'location' feature
-        location_name = features.location.value
-        location_column = f"loc_{location_name}"
+    def _index_features(self):
+        """Precomputes the column position of every input field in the feature matrix."""
+        positions = {name: i for i, name in enumerate(self.feature_list)}
+        self._numeric_positions = [(name, positions[name]) for name in NUMERIC_FEATURES if name in positions]
+        self._location_positions = {}
+        for name, i in positions.items():
+            for prefix in LOCATION_PREFIXES:
+                if name.startswith(prefix):
+                    self._location_positions[name[len(prefix):]] = i
+        self._drop_first = any(name.startswith(DROP_FIRST_PREFIX) for name in positions)
 
-        if location_column in prediction_df.columns:
-            prediction_df[location_column] = True
-        else:
+    def _location_position(self, location):
+        """Column of the location's one-hot feature, or REFERENCE_POSITION for the drop_first reference."""
+        location_name = getattr(location, 'value', location)
+        position = self._location_positions.get(location_name)
+        if position is None and self._drop_first and location_name in Location._value2member_map_:
+            return REFERENCE_POSITION
+        if position is None:
             raise HTTPException(
                 status_code=400,
                 detail=f"Location '{location_name}' is invalid or was not part of the model training."
             )
+        return position
 
-        # 5. Ensure column order matches the training order
-        prediction_df = prediction_df[self.model_features]
+    def _row_buffer(self):
+        """Returns this thread's preallocated (1, n_features) input row."""
+        row = getattr(self._local, 'row', None)
+        if row is None:
+            row = self._local.row = np.zeros((1, len(self.feature_list)), dtype=np.float64)
+        return row
+
+    def _feature_matrix(self, columns, n_rows):
+        """Builds the (n_rows, n_features) model input from columnar inputs."""
+        matrix = np.zeros((n_rows, len(self.feature_list)), dtype=np.float64)
+        for name, position in self._numeric_positions:
+            matrix[:, position] = columns[name]
+        location_positions = np.array([self._location_position(loc) for loc in columns['location']], dtype=np.int64)
+        one_hot = location_positions != REFERENCE_POSITION
+        matrix[np.nonzero(one_hot)[0], location_positions[one_hot]] = 1
+        return matrix
+
+    @timed("predict")
+    def predict(self, features: PlantHealthFeatures) -> float:
+        """
+        Generates a prediction from the input features.
+        """
+        location_position = self._location_position(features.location)
+
+        # Fill the reusable row buffer in training column order, skipping DataFrame construction.
+        row = self._row_buffer()
+        for name, position in self._numeric_positions:
+            row[0, position] = getattr(features, name)
+        if location_position != REFERENCE_POSITION:
+            row[0, location_position] = 1.0
+        try:
+            return float(self.model.predict(row)[0])
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"An error occurred during prediction: {e}")
+        finally:
+            if location_position != REFERENCE_POSITION:
+                row[0, location_position] = 0.0
 
-        # 6. Make the prediction
+    @timed("predict")
+    def predict_columns(self, columns) -> List[float]:
+        """Predicts a batch given as a dict of equal-length columns, with one model call."""
+        n_rows = len(columns['location'])
+        if n_rows == 0:
+            return []
+        matrix = self._feature_matrix(columns, n_rows)
         try:
-            prediction = self.model.predict(prediction_df)
-            return float(prediction[0])
+            return self.model.predict(matrix).astype(float).tolist()
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"An error occurred during prediction: {e}")
 
-# Create a single instance of the predictor to be used by the API
-# This ensures the model is loaded only once when the application starts
-predictor = ModelPredictor(MODEL_FILENAME)
\ No newline at end of file
+    def predict_batch(self, items: List[PlantHealthFeatures]) -> List[float]:
+        """Predicts a list of feature rows with one model call."""
+        columns = {name: [getattr(item, name) for item in items] for name in NUMERIC_FEATURES + ['location']}
+        return self.predict_columns(columns)
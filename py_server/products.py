@@ -0,0 +1,69 @@
+# products.py
+"""
+Cache keys and builders for the rendered raster products.
+
+The API and the warmup job both go through these functions, so an artifact
+built ahead of time lands under exactly the key a request will look up.
+"""
+from cache import artifact_cache
+from change import read_change, render_change_streaming
+from classify import DEFAULT_SCHEME, ClassScheme, classify
+from render import render_change_figure, render_reclassified_fast, render_reclassified_figure
+
+# Bump when rendering output changes so cached artifacts are not reused.
+RENDER_VERSION = 2
+
+def window_params(window):
+    """Returns a window as a [col_off, row_off, width, height] list of ints."""
+    return [int(window.col_off), int(window.row_off), int(window.width), int(window.height)]
+
+# --- Reclassified NDVI ---
+
+def reclassify_key(mosaic, window, decimation: int, scheme: ClassScheme, renderer: str):
+    params = {
+        "location": mosaic.location,
+        "year": mosaic.year,
+        "window": window_params(window),
+        "decimation": decimation,
+        "classes": scheme.params(),
+        "renderer": renderer,
+        "version": RENDER_VERSION,
+    }
+    return artifact_cache.key("reclassify", params, mosaic.sources)
+
+def read_reclassified(mosaic, window, decimation: int, scheme: ClassScheme):
+    return classify(mosaic.read(window, decimation), scheme)
+
+def render_reclassified(reclassified, scheme: ClassScheme, renderer: str, location: str, year: int):
+    """Encodes class indices as a palette PNG (fast) or a titled matplotlib figure."""
+    if renderer == "fast":
+        return render_reclassified_fast(reclassified, scheme.palette_array())
+    # Compared by value: the scheme may arrive pickled in a render worker.
+    colours = None if scheme == DEFAULT_SCHEME else (scheme.palette_array()[1:] / 255).tolist()
+    labels = None if scheme == DEFAULT_SCHEME else list(scheme.labels)
+    return render_reclassified_figure(reclassified, location, year, colours, labels)
+
+def build_reclassified(mosaic, window, decimation: int, scheme: ClassScheme, renderer: str):
+    reclassified = read_reclassified(mosaic, window, decimation, scheme)
+    return render_reclassified(reclassified, scheme, renderer, mosaic.location, mosaic.year)
+
+# --- NDVI change ---
+
+def change_key(mosaic_from, mosaic_to, window, decimation: int, resampling: str, renderer: str):
+    params = {
+        "from": [mosaic_from.location, mosaic_from.year],
+        "to": [mosaic_to.location, mosaic_to.year],
+        "window": window_params(window),
+        "decimation": decimation,
+        "resampling": resampling,
+        "renderer": renderer,
+        "version": RENDER_VERSION,
+    }
+    return artifact_cache.key("change", params, mosaic_from.sources + mosaic_to.sources)
+
+def build_change(mosaic_from, mosaic_to, window, decimation: int, renderer: str):
+    """Change map PNG; the fast renderer streams strips, the figure needs the whole array."""
+    if renderer == "fast":
+        return render_change_streaming(mosaic_from, mosaic_to, window, decimation)
+    ndvi_change = read_change(mosaic_from, mosaic_to, window, decimation)
+    return render_change_figure(ndvi_change, mosaic_from.location, mosaic_from.year, mosaic_to.year)
@@ -0,0 +1,117 @@
+# registry.py
+import os
+import sys
+import threading
+
+import joblib
+from fastapi import HTTPException
+
+from predictor import MODEL_FILENAME, ModelPredictor, load_model_file
+
+# 'r' memory-maps uncompressed joblib exports; set to '' to load fully into memory.
+MODEL_MMAP_MODE = os.getenv("PY_SERVER_MODEL_MMAP", "r") or None
+
+class ModelEntry:
+    """A registered model file and its loading state."""
+    PENDING, LOADING, READY, FAILED = "pending", "loading", "ready", "failed"
+
+    def __init__(self, name: str, version: str, path: str, mmap_mode=None):
+        self.name = name
+        self.version = version
+        self.path = path
+        self.mmap_mode = mmap_mode
+        self.state = self.PENDING
+        self.error = None
+        self.predictor = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Loads the model once; later calls return the cached result."""
+        with self._lock:
+            if self.state in (self.READY, self.FAILED):
+                return self.predictor
+            self.state = self.LOADING
+            try:
+                self.predictor = ModelPredictor(*load_model_file(self.path, self.mmap_mode))
+                self.state = self.READY
+                print(f"✅ Model {self.name}:{self.version} loaded from {self.path}.")
+            except Exception as e:
+                self.error = str(e)
+                self.state = self.FAILED
+                print(f"❌ Failed to load model {self.name}:{self.version}: {e}")
+            return self.predictor
+
+    def status(self):
+        return {"path": self.path, "state": self.state, "error": self.error}
+
+class ModelRegistry:
+    """
+    Named, versioned prediction models.
+
+    Models load lazily on first use, or all at once in a background thread
+    via ``start_background_loading`` so the API starts serving immediately.
+    A model file that fails to load is reported, not raised at startup.
+    """
+    def __init__(self):
+        self._entries = {}
+        self._latest = {}
+        self.default_name = None
+
+    def register(self, name: str, version: str, path: str, mmap_mode=MODEL_MMAP_MODE, default=False):
+        self._entries[(name, version)] = ModelEntry(name, version, path, mmap_mode)
+        self._latest[name] = version
+        if default or self.default_name is None:
+            self.default_name = name
+
+    def entry(self, name: str = None, version: str = None):
+        name = name or self.default_name
+        version = version or self._latest.get(name)
+        entry = self._entries.get((name, version))
+        if entry is None:
+            raise HTTPException(status_code=404, detail=f"Unknown model '{name}' version '{version}'.")
+        return entry
+
+    def get(self, name: str = None, version: str = None) -> ModelPredictor:
+        """Returns a ready predictor, loading it now if nothing has started loading it."""
+        entry = self.entry(name, version)
+        if entry.state == ModelEntry.PENDING:
+            entry.load()
+        if entry.state == ModelEntry.LOADING:
+            raise HTTPException(status_code=503, detail=f"Model '{entry.name}' is still loading. Please retry shortly.", headers={"Retry-After": "1"})
+        if entry.state == ModelEntry.FAILED:
+            raise HTTPException(status_code=503, detail=f"Model '{entry.name}' is unavailable: {entry.error}")
+        return entry.predictor
+
+    def start_background_loading(self):
+        """Loads every registered model in a daemon thread."""
+        def load_all():
+            for entry in list(self._entries.values()):
+                entry.load()
+        thread = threading.Thread(target=load_all, name="model-loader", daemon=True)
+        thread.start()
+        return thread
+
+    @property
+    def ready(self):
+        return bool(self._entries) and all(e.state == ModelEntry.READY for e in self._entries.values())
+
+    def status(self):
+        return {f"{name}:{version}": entry.status() for (name, version), entry in self._entries.items()}
+
+def export_for_mmap(source_path: str, target_path: str):
+    """
+    Re-saves a model as an uncompressed joblib file so ``mmap_mode`` can map
+    its arrays. Estimators that copy arrays into their own buffers on load
+    (e.g. tree ensembles) still get their own memory per process.
+    """
+    model, feature_list = load_model_file(source_path)
+    joblib.dump((model, feature_list), target_path, compress=0)
+
+registry = ModelRegistry()
+registry.register("plant_health", "1000", MODEL_FILENAME, default=True)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "export":
+        sys.exit("usage: python registry.py export <source.pkl> <target.joblib>")
+    export_for_mmap(sys.argv[2], sys.argv[3])
+    print(f"✅ Wrote {sys.argv[3]}")
@@ -0,0 +1,202 @@
+# render.py
+import struct
+import zlib
+from functools import lru_cache
+from io import BytesIO
+
+import numpy as np
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import matplotlib.colors as colors
+from matplotlib.colors import ListedColormap
+
+from metrics import timed
+
+# These functions run inside the render process pool, so they take plain
+# arrays and strings and return the encoded PNG bytes. Stage timers don't
+# reach the parent from there; workers.run_render times them as "render".
+
+def render_reclassified_figure(reclassified, location, year, colours=None, labels=None):
+    """
+    Renders a reclassified NDVI array as a matplotlib figure with a legend.
+    ``colours``/``labels`` describe classes 1..n (default: the three NDVI classes).
+    """
+    output_buffer = BytesIO()
+    colours = colours or ['brown', 'yellow', 'green']
+    labels = labels or ['Non-vegetated (<0.2)', 'Sparse Veg (0.2-0.4)', 'Dense Veg (>0.4)']
+    n_classes = len(colours)
+    cmap = ListedColormap(colours)
+    fig, ax = plt.subplots(1, 1, figsize=(10, 10))
+    # Class 0 (nodata) is left blank.
+    im = ax.imshow(np.ma.masked_equal(reclassified, 0), cmap=cmap, vmin=0.5, vmax=n_classes + 0.5)
+    ax.set_title(f'Reclassified NDVI - {location} {year}', fontsize=16)
+    ax.set_axis_off()
+    cbar = fig.colorbar(im, ax=ax, ticks=list(range(1, n_classes + 1)), shrink=0.6)
+    cbar.ax.set_yticklabels(labels)
+    plt.savefig(output_buffer, format='png', bbox_inches='tight')
+    plt.close(fig)
+    return output_buffer.getvalue()
+
+def render_change_figure(ndvi_change, location, year_from, year_to):
+    """Renders an NDVI difference array as a matplotlib figure with a colorbar."""
+    output_buffer = BytesIO()
+    cmap = plt.get_cmap('RdYlGn')
+    fig, ax = plt.subplots(1, 1, figsize=(12, 12))
+    div_norm = colors.TwoSlopeNorm(vmin=-0.5, vcenter=0, vmax=0.5)
+    im = ax.imshow(ndvi_change, cmap=cmap, norm=div_norm)
+    ax.set_title(f"Vegetation Change ({location}, {year_from} vs {year_to})", fontsize=16)
+    ax.set_axis_off()
+    cbar = fig.colorbar(im, ax=ax, shrink=0.7)
+    cbar.set_label('NDVI Change (Green = Gain, Red = Loss)')
+    plt.savefig(output_buffer, format='png', bbox_inches='tight')
+    plt.close(fig)
+    return output_buffer.getvalue()
+
+# --- Fast rendering (no matplotlib figure) ---
+# Palette index 0 is reserved for nodata and is fully transparent.
+
+RECLASSIFY_PALETTE = np.array([
+    [0, 0, 0],        # nodata
+    [165, 42, 42],    # brown: non-vegetated (<0.2)
+    [255, 255, 0],    # yellow: sparse vegetation (0.2-0.4)
+    [0, 128, 0],      # green: dense vegetation (>0.4)
+], dtype=np.uint8)
+
+CHANGE_RANGE = (-0.5, 0.5)
+CHANGE_PALETTE = np.vstack([
+    [0, 0, 0],
+    (plt.get_cmap('RdYlGn')(np.linspace(0.0, 1.0, 255))[:, :3] * 255).round(),
+]).astype(np.uint8)
+
+NDVI_RANGE = (-0.2, 1.0)
+NDVI_PALETTE = CHANGE_PALETTE
+
+class IndexedPNGWriter:
+    """
+    Incremental encoder for palette (indexed-colour) PNG images.
+
+    Rows are compressed as they are written, so a caller can stream an image
+    in horizontal strips without holding the whole index array in memory.
+    The bit depth is chosen from the palette size (2 colours -> 1 bit,
+    4 -> 2 bits, 16 -> 4 bits, otherwise 8).
+    """
+    def __init__(self, out, width, height, palette, transparent_index=0, level=6):
+        self.out = out
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self.bit_depth = next(d for d in (1, 2, 4, 8) if len(palette) <= (1 << d))
+        self._compressor = zlib.compressobj(level)
+
+        palette = np.asarray(palette, dtype=np.uint8)
+        out.write(b"\x89PNG\r\n\x1a\n")
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, self.bit_depth, 3, 0, 0, 0))
+        self._chunk(b"PLTE", palette.tobytes())
+        if transparent_index is not None:
+            alpha = np.full(transparent_index + 1, 255, dtype=np.uint8)
+            alpha[transparent_index] = 0
+            self._chunk(b"tRNS", alpha.tobytes())
+
+    def _chunk(self, kind, data):
+        self.out.write(struct.pack(">I", len(data)))
+        self.out.write(kind)
+        self.out.write(data)
+        self.out.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(kind)) & 0xFFFFFFFF))
+
+    def _pack(self, indices):
+        if self.bit_depth == 8:
+            return indices
+        per_byte = 8 // self.bit_depth
+        padded_width = -(-self.width // per_byte) * per_byte
+        if padded_width != self.width:
+            indices = np.pad(indices, ((0, 0), (0, padded_width - self.width)))
+        groups = indices.reshape(indices.shape[0], -1, per_byte)
+        shifts = (self.bit_depth * np.arange(per_byte - 1, -1, -1)).astype(np.uint8)
+        return np.bitwise_or.reduce(groups << shifts, axis=2).astype(np.uint8)
+
+    def write_rows(self, indices):
+        """Appends a (rows, width) uint8 block of palette indices."""
+        packed = self._pack(np.asarray(indices, dtype=np.uint8))
+        filtered = np.zeros((packed.shape[0], packed.shape[1] + 1), dtype=np.uint8)  # filter type 0
+        filtered[:, 1:] = packed
+        data = self._compressor.compress(filtered.tobytes())
+        if data:
+            self._chunk(b"IDAT", data)
+        self.rows_written += len(indices)
+
+    def close(self):
+        if self.rows_written != self.height:
+            raise ValueError(f"PNG expects {self.height} rows, got {self.rows_written}.")
+        self._chunk(b"IDAT", self._compressor.flush())
+        self._chunk(b"IEND", b"")
+
+def encode_indexed_png(indices, palette, transparent_index=0):
+    """Encodes a 2D array of palette indices as an indexed PNG."""
+    output_buffer = BytesIO()
+    writer = IndexedPNGWriter(output_buffer, indices.shape[1], indices.shape[0], palette, transparent_index)
+    writer.write_rows(indices)
+    writer.close()
+    return output_buffer.getvalue()
+
+def scale_to_indices(values, value_range):
+    """Maps values in value_range linearly onto palette indices 1-255 (0 for NaN)."""
+    low, high = value_range
+    scaled = (values - low) * (254 / (high - low))
+    nodata = np.isnan(scaled)
+    np.nan_to_num(scaled, copy=False, nan=0.0)
+    np.clip(scaled, 0, 254, out=scaled)
+    indices = np.rint(scaled).astype(np.uint8) + 1
+    indices[nodata] = 0
+    return indices
+
+def change_to_indices(ndvi_change):
+    """Maps NDVI differences onto CHANGE_PALETTE indices (0 for NaN)."""
+    return scale_to_indices(ndvi_change, CHANGE_RANGE)
+
+@timed("render")
+def render_ndvi_fast(ndvi):
+    """Renders raw NDVI values as an indexed PNG using the RdYlGn palette."""
+    return encode_indexed_png(scale_to_indices(ndvi, NDVI_RANGE), NDVI_PALETTE)
+
+@timed("render")
+def render_scaled_fast(values, value_range):
+    """Renders values as an indexed RdYlGn PNG, red at value_range[0] and green at value_range[1]."""
+    return encode_indexed_png(scale_to_indices(values, value_range), CHANGE_PALETTE)
+
+@timed("render")
+def render_reclassified_fast(reclassified, palette=RECLASSIFY_PALETTE):
+    """Renders a reclassified uint8 array (0 = nodata, 1..n = classes) as an indexed PNG."""
+    return encode_indexed_png(reclassified.astype(np.uint8, copy=False), palette)
+
+@timed("render")
+def render_change_fast(ndvi_change):
+    """Renders an NDVI difference array as an indexed PNG using the RdYlGn palette."""
+    return encode_indexed_png(change_to_indices(ndvi_change), CHANGE_PALETTE)
+
+@lru_cache(maxsize=None)
+def render_legend(layer):
+    """Renders the static legend image for a fast-rendered layer."""
+    output_buffer = BytesIO()
+    if layer == 'reclassify':
+        fig, ax = plt.subplots(figsize=(3, 1.2))
+        labels = ['Non-vegetated (<0.2)', 'Sparse Veg (0.2-0.4)', 'Dense Veg (>0.4)']
+        handles = [plt.Rectangle((0, 0), 1, 1, color=RECLASSIFY_PALETTE[i] / 255) for i in range(1, 4)]
+        ax.legend(handles, labels, loc='center', frameon=False)
+        ax.set_axis_off()
+    elif layer == 'change':
+        fig, ax = plt.subplots(figsize=(4, 0.8))
+        norm = colors.Normalize(*CHANGE_RANGE)
+        cbar = fig.colorbar(plt.cm.ScalarMappable(norm=norm, cmap='RdYlGn'), cax=ax, orientation='horizontal')
+        cbar.set_label('NDVI Change (Green = Gain, Red = Loss)')
+    elif layer == 'ndvi':
+        fig, ax = plt.subplots(figsize=(4, 0.8))
+        norm = colors.Normalize(*NDVI_RANGE)
+        cbar = fig.colorbar(plt.cm.ScalarMappable(norm=norm, cmap='RdYlGn'), cax=ax, orientation='horizontal')
+        cbar.set_label('NDVI')
+    else:
+        raise ValueError(f"Unknown legend layer '{layer}'.")
+    plt.savefig(output_buffer, format='png', bbox_inches='tight', transparent=True)
+    plt.close(fig)
+    return output_buffer.getvalue()
@@ -0,0 +1,222 @@
+# stats.py
+"""
+Precomputed NDVI zonal statistics.
+
+Build (or rebuild) the store from the py_server directory:
+
+    python stats.py build [--workers 4]
+
+Every tile in the catalog is read once, block by block, into a histogram,
+the reclassification class counts, moments and nodata counts. The results
+are saved as columnar arrays in ndvi_stats.npz, which the API loads into
+memory and reloads when the file changes.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import rasterio
+
+from catalog import TileCatalog, catalog
+from classify import DEFAULT_SCHEME, classify
+
+STATS_FILENAME = os.getenv("PY_SERVER_STATS_FILE", "ndvi_stats.npz")
+
+# 0.01-wide NDVI bins; values outside [-1, 1] are counted in the edge bins.
+HIST_EDGES = np.linspace(-1.0, 1.0, 201)
+PERCENTILES = (10, 25, 50, 75, 90)
+# The classes of DEFAULT_SCHEME, the /reclassify default: <0.2, 0.2-0.4 (inclusive), >0.4.
+CLASS_NAMES = ("non_vegetated", "sparse_vegetation", "dense_vegetation")
+assert len(CLASS_NAMES) == DEFAULT_SCHEME.n_classes
+
+def class_counts(ndvi):
+    """Counts valid pixels per reclassification class, binned by classify() with DEFAULT_SCHEME."""
+    counts = np.bincount(classify(ndvi, DEFAULT_SCHEME).ravel(), minlength=DEFAULT_SCHEME.n_classes + 1)
+    return counts[1:].astype(np.int64)  # class 0 is NaN
+
+def tile_stats(path: str):
+    """Accumulates the statistics of one GeoTIFF, reading one internal block at a time."""
+    histogram = np.zeros(len(HIST_EDGES) - 1, dtype=np.int64)
+    classes = np.zeros(len(CLASS_NAMES), dtype=np.int64)
+    n_pixels = n_valid = 0
+    total = total_sq = 0.0
+    low, high = np.inf, -np.inf
+    with rasterio.open(path) as src:
+        nodata = src.nodata
+        for _, window in src.block_windows(1):
+            data = src.read(1, window=window, out_dtype=np.float32)
+            n_pixels += data.size
+            valid = ~np.isnan(data)
+            if nodata is not None and not np.isnan(nodata):
+                valid &= data != nodata
+            values = data[valid]
+            if not values.size:
+                continue
+            n_valid += values.size
+            values64 = values.astype(np.float64)
+            total += values64.sum()
+            total_sq += np.dot(values64, values64)
+            low, high = min(low, values.min()), max(high, values.max())
+            classes += class_counts(values)
+            bins = np.clip(np.searchsorted(HIST_EDGES, values, side="right") - 1, 0, len(histogram) - 1)
+            histogram += np.bincount(bins, minlength=len(histogram))
+    return {
+        "n_pixels": n_pixels,
+        "n_valid": n_valid,
+        "sum": total,
+        "sum_sq": total_sq,
+        "min": low if n_valid else np.nan,
+        "max": high if n_valid else np.nan,
+        "class_counts": classes,
+        "histogram": histogram,
+    }
+
+def histogram_percentiles(histogram, percentiles=PERCENTILES, edges=HIST_EDGES):
+    """Estimates percentiles from a histogram by interpolating inside the bins (±0.01 NDVI)."""
+    total = histogram.sum()
+    if not total:
+        return [None] * len(percentiles)
+    cdf = np.concatenate([[0], np.cumsum(histogram)])
+    return [round(float(np.interp(q / 100 * total, cdf, edges)), 4) for q in percentiles]
+
+def build_stats(tile_catalog: TileCatalog, output_file: str = STATS_FILENAME, max_workers: int = None):
+    """Computes statistics for every tile on disk and writes the .npz store atomically."""
+    tile_catalog.refresh()
+    records = [r for r in tile_catalog.records if os.path.exists(r.read_path)]
+    missing = len(tile_catalog.records) - len(records)
+    if missing:
+        print(f"⚠️ Skipping {missing} tiles that are not on disk.")
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(tile_stats, [r.read_path for r in records]))
+
+    columns = {
+        "location": np.array([r.location for r in records], dtype=str),
+        "year": np.array([r.year for r in records], dtype=np.int32),
+        "row": np.array([r.row for r in records], dtype=np.int32),
+        "col": np.array([r.col for r in records], dtype=np.int32),
+        "ndvi_file_name": np.array([r.ndvi_file_name for r in records], dtype=str),
+        "bin_edges": HIST_EDGES,
+    }
+    for name in ("n_pixels", "n_valid"):
+        columns[name] = np.array([s[name] for s in results], dtype=np.int64)
+    for name in ("sum", "sum_sq", "min", "max"):
+        columns[name] = np.array([s[name] for s in results], dtype=np.float64)
+    columns["class_counts"] = np.array([s["class_counts"] for s in results], dtype=np.int64).reshape(-1, len(CLASS_NAMES))
+    columns["histogram"] = np.array([s["histogram"] for s in results], dtype=np.int64).reshape(-1, len(HIST_EDGES) - 1)
+
+    tmp_file = f"{output_file}.tmp.npz"
+    np.savez_compressed(tmp_file, **columns)
+    os.replace(tmp_file, output_file)
+    print(f"✅ Statistics for {len(records)} tiles written to {output_file} in {time.perf_counter() - start:.1f}s.")
+    return len(records)
+
+def summarize(n_pixels, n_valid, total, total_sq, low, high, classes, histogram):
+    """Turns accumulated counts and moments into the JSON summary of a tile or area."""
+    n_pixels, n_valid = int(n_pixels), int(n_valid)
+    mean = total / n_valid if n_valid else None
+    std = float(np.sqrt(max(total_sq / n_valid - mean * mean, 0.0))) if n_valid else None
+    return {
+        "pixels": n_pixels,
+        "valid_pixels": n_valid,
+        "nodata_pixels": n_pixels - n_valid,
+        "mean": round(float(mean), 6) if n_valid else None,
+        "std": round(std, 6) if n_valid else None,
+        "min": float(low) if n_valid else None,
+        "max": float(high) if n_valid else None,
+        "percentiles": dict(zip((f"p{q}" for q in PERCENTILES), histogram_percentiles(histogram))),
+        "class_fractions": {
+            name: round(int(count) / n_valid, 6) if n_valid else None
+            for name, count in zip(CLASS_NAMES, classes)
+        },
+    }
+
+class StatsStore:
+    """
+    In-memory view of the statistics file.
+
+    Per location/year summaries and per-tile summaries are precomputed when
+    the file is loaded, so lookups are dictionary reads. The file is
+    reloaded when its modification time changes.
+    """
+    def __init__(self, stats_file: str = STATS_FILENAME):
+        self.stats_file = stats_file
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._areas = {}
+        self._tiles = {}
+        self._histograms = {}
+
+    def refresh(self):
+        """Loads or reloads the statistics file; returns False when it does not exist."""
+        try:
+            mtime = os.stat(self.stats_file).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self._load(mtime)
+        return True
+
+    def _load(self, mtime):
+        with np.load(self.stats_file) as data:
+            columns = {name: data[name] for name in data.files}
+        areas, tiles, histograms = {}, {}, {}
+        keys = list(zip(columns["location"].tolist(), columns["year"].tolist()))
+        for i, (location, year) in enumerate(keys):
+            tiles.setdefault((location, year), {})[(int(columns["row"][i]), int(columns["col"][i]))] = summarize(
+                columns["n_pixels"][i], columns["n_valid"][i], columns["sum"][i], columns["sum_sq"][i],
+                columns["min"][i], columns["max"][i], columns["class_counts"][i], columns["histogram"][i])
+        for key in set(keys):
+            rows = np.array([k == key for k in keys])
+            histogram = columns["histogram"][rows].sum(axis=0)
+            areas[key] = summarize(
+                columns["n_pixels"][rows].sum(), columns["n_valid"][rows].sum(),
+                columns["sum"][rows].sum(), columns["sum_sq"][rows].sum(),
+                np.nanmin(columns["min"][rows]) if np.isfinite(columns["min"][rows]).any() else np.nan,
+                np.nanmax(columns["max"][rows]) if np.isfinite(columns["max"][rows]).any() else np.nan,
+                columns["class_counts"][rows].sum(axis=0), histogram)
+            areas[key]["tiles"] = int(rows.sum())
+            histograms[key] = histogram.tolist()
+        self._areas, self._tiles, self._histograms = areas, tiles, histograms
+        self.bin_edges = columns["bin_edges"].tolist()
+        self._mtime = mtime
+        print(f"✅ NDVI statistics loaded: {len(keys)} tiles from {self.stats_file}.")
+
+    def area(self, location: str, year: int):
+        """Summary of every tile of a location/year, or None."""
+        return self._areas.get((location, int(year)))
+
+    def tiles(self, location: str, year: int):
+        """Per-tile summaries keyed by (row, col)."""
+        return self._tiles.get((location, int(year)), {})
+
+    def histogram(self, location: str, year: int):
+        return self._histograms.get((location, int(year)))
+
+    def mean_change(self, location: str, year_from: int, year_to: int):
+        """Per-tile change of mean NDVI for tiles present in both years."""
+        tiles_from, tiles_to = self.tiles(location, year_from), self.tiles(location, year_to)
+        changes = []
+        for row, col in sorted(set(tiles_from) & set(tiles_to)):
+            mean_from, mean_to = tiles_from[(row, col)]["mean"], tiles_to[(row, col)]["mean"]
+            if mean_from is not None and mean_to is not None:
+                changes.append({"row": row, "col": col, "mean_change": round(mean_to - mean_from, 6)})
+        return changes
+
+stats_store = StatsStore()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="Compute statistics for every tile in the catalog.")
+    build.add_argument("--workers", type=int, default=None, help="Processes to use (default: one per CPU).")
+    build.add_argument("--output", default=STATS_FILENAME)
+    args = parser.parse_args()
+    sys.exit(0 if build_stats(catalog, args.output, args.workers) else 1)
@@ -0,0 +1,57 @@
+"""
+One-hot location encoding of ModelPredictor.
+
+    python -m pytest test_predictor.py
+"""
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from models import Location, PlantHealthFeatures
+from predictor import NUMERIC_FEATURES, ModelPredictor
+
+class LinearModel:
+    """Stands in for the trained regressor: a fixed weight per feature."""
+    def __init__(self, n_features):
+        self.weights = np.arange(1, n_features + 1, dtype=np.float64)
+
+    def predict(self, matrix):
+        return np.asarray(matrix) @ self.weights
+
+def features(location):
+    return PlantHealthFeatures(
+        year=2024, month=6, min_temp_c=24.0, max_temp_c=33.0, mean_temp_c=28.5,
+        total_precip_mm=310.0, total_solar_rad_j_m2=1.6e7, rainy_days=18, location=location,
+    )
+
+def predictor_for(location_columns):
+    feature_list = NUMERIC_FEATURES + location_columns
+    return ModelPredictor(LinearModel(len(feature_list)), feature_list)
+
+def numeric_part(predictor, item):
+    return sum(getattr(item, name) * predictor.model.weights[i] for i, name in enumerate(NUMERIC_FEATURES))
+
+def test_drop_first_reference_location_is_all_zeros():
+    # Panvel is the dropped reference category: no location_Panvel column
+    predictor = predictor_for([f"location_{loc.value}" for loc in Location if loc is not Location.panvel])
+    item = features(Location.panvel)
+    assert predictor.predict(item) == pytest.approx(numeric_part(predictor, item))
+    assert predictor.predict_batch([item, features(Location.thane)])[0] == pytest.approx(numeric_part(predictor, item))
+
+def test_one_hot_location_sets_its_column():
+    location_columns = [f"location_{loc.value}" for loc in Location if loc is not Location.panvel]
+    predictor = predictor_for(location_columns)
+    item = features(Location.thane)
+    weight = predictor.model.weights[len(NUMERIC_FEATURES) + location_columns.index("location_Thane")]
+    expected = numeric_part(predictor, item) + weight
+    assert predictor.predict(item) == pytest.approx(expected)
+    assert predictor.predict_batch([features(Location.panvel), item])[1] == pytest.approx(expected)
+    # The reusable row buffer is cleared after each call
+    assert predictor.predict(features(Location.panvel)) == pytest.approx(numeric_part(predictor, item))
+
+def test_location_missing_from_loc_model_is_rejected():
+    predictor = predictor_for(["loc_Thane", "loc_Kalyan"])
+    with pytest.raises(HTTPException) as error:
+        predictor.predict(features(Location.panvel))
+    assert error.value.status_code == 400
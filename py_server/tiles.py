@@ -0,0 +1,73 @@
+# tiles.py
+import math
+from functools import lru_cache
+
+import numpy as np
+from rasterio.enums import Resampling
+from rasterio.transform import Affine
+from rasterio.transform import from_bounds as transform_from_bounds
+from rasterio.warp import reproject, transform_bounds
+from rasterio.windows import from_bounds
+from rasterio.windows import transform as window_transform
+
+from metrics import timed
+from render import encode_indexed_png
+
+TILE_SIZE = 256
+MAX_ZOOM = 22
+WEB_MERCATOR = "EPSG:3857"
+# Half the side of the web-mercator square, in metres.
+ORIGIN_SHIFT = math.pi * 6378137.0
+
+def valid_tile(z: int, x: int, y: int):
+    """Checks that z/x/y addresses an existing XYZ tile."""
+    return 0 <= z <= MAX_ZOOM and 0 <= x < (1 << z) and 0 <= y < (1 << z)
+
+def tile_bounds(z: int, x: int, y: int):
+    """Returns the (left, bottom, right, top) web-mercator bounds of an XYZ tile."""
+    size = 2 * ORIGIN_SHIFT / (1 << z)
+    left = -ORIGIN_SHIFT + x * size
+    top = ORIGIN_SHIFT - y * size
+    return left, top - size, left + size, top
+
+@timed("read")
+def read_tile(mosaic, z: int, x: int, y: int, resampling=Resampling.nearest):
+    """
+    Reads one XYZ tile of a mosaic as a (TILE_SIZE, TILE_SIZE) float32 array
+    in web mercator, NaN outside the data. Returns None when the tile does
+    not touch the mosaic.
+
+    Only the mosaic window under the tile is read, decimated (from the COG
+    overviews when present) to roughly tile resolution before reprojection.
+    """
+    bounds = tile_bounds(z, x, y)
+    src_bounds = transform_bounds(WEB_MERCATOR, mosaic.crs, *bounds)
+    window = from_bounds(*src_bounds, transform=mosaic.transform)
+    window = window.round_offsets(op="floor").round_lengths(op="ceil")
+    try:
+        window = mosaic.clip_window(window)
+    except ValueError:
+        return None
+
+    decimation = mosaic.choose_decimation(window, TILE_SIZE)
+    data = mosaic.read(window, decimation)
+    src_transform = window_transform(window, mosaic.transform) * Affine.scale(
+        int(window.width) / data.shape[1], int(window.height) / data.shape[0])
+    tile = np.full((TILE_SIZE, TILE_SIZE), np.nan, dtype=np.float32)
+    reproject(
+        data,
+        tile,
+        src_transform=src_transform,
+        src_crs=mosaic.crs,
+        src_nodata=np.nan,
+        dst_transform=transform_from_bounds(*bounds, TILE_SIZE, TILE_SIZE),
+        dst_crs=WEB_MERCATOR,
+        dst_nodata=np.nan,
+        resampling=resampling,
+    )
+    return tile
+
+@lru_cache(maxsize=None)
+def empty_tile():
+    """A fully transparent tile for areas without data."""
+    return encode_indexed_png(np.zeros((TILE_SIZE, TILE_SIZE), dtype=np.uint8), [[0, 0, 0], [0, 0, 0]])
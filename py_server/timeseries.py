@@ -0,0 +1,273 @@
+# timeseries.py
+"""
+Multi-year NDVI cubes.
+
+Build one float32 cube per location from the py_server directory:
+
+    python timeseries.py build [--location Thane]
+
+Each cube is a .npy file in cubes/ with a JSON sidecar (years, grid,
+source files), chunked into square tiles stored year-major: the array is
+(tile_row, tile_col, year, CUBE_CHUNK, CUBE_CHUNK), NaN-padded at the
+edges, so each year of a tile is one contiguous block. The API
+memory-maps it, so a windowed request over some years only pages in the
+blocks of those years in the tiles it touches, and computes per-pixel
+trend, max-drop and anomaly maps with vectorized numpy over the year axis.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+from alignment import align_to
+from rasterio.windows import Window
+
+from catalog import TileCatalog, catalog
+from metrics import timed
+from mosaic import get_mosaic
+
+CUBE_DIR = os.getenv("PY_SERVER_CUBE_DIR", "cubes")
+# Tile side in pixels; one year of a tile is 256 KiB.
+CUBE_CHUNK = 256
+# Bumped when the file layout changes; older cubes are reported as out of date.
+CUBE_FORMAT = 2
+
+def cube_paths(location: str, cube_dir: str = CUBE_DIR):
+    base = os.path.join(cube_dir, f"ndvi_{location}")
+    return f"{base}.npy", f"{base}.json"
+
+def build_cube(location: str, tile_catalog: TileCatalog = catalog, cube_dir: str = CUBE_DIR, chunk: int = CUBE_CHUNK):
+    """Stacks every year of a location into a memory-mapped tiled cube, one row of tiles at a time."""
+    years = tile_catalog.years(location)
+    mosaics = [get_mosaic(location, year, tile_catalog) for year in years]
+    reference = mosaics[0]
+    # Later years are resampled onto the first year's grid when they do not line up.
+    mosaics = [reference] + [align_to(mosaic, reference) for mosaic in mosaics[1:]]
+
+    cube_path, meta_path = cube_paths(location, cube_dir)
+    os.makedirs(cube_dir, exist_ok=True)
+    tmp_path = f"{cube_path}.tmp.npy"
+    height, width = reference.shape
+    tile_rows, tile_cols = -(-height // chunk), -(-width // chunk)
+    cube = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32,
+                                     shape=(tile_rows, tile_cols, len(years), chunk, chunk))
+    band = np.full((chunk, tile_cols * chunk), np.nan, dtype=np.float32)
+    for tile_row in range(tile_rows):
+        start = tile_row * chunk
+        stop = min(start + chunk, height)
+        for i, mosaic in enumerate(mosaics):
+            band[:stop - start, :width] = mosaic.read(Window(0, start, width, stop - start))
+            band[stop - start:] = np.nan
+            # (chunk, tile_cols * chunk) -> (tile_cols, chunk, chunk)
+            cube[tile_row, :, i] = band.reshape(chunk, tile_cols, chunk).transpose(1, 0, 2)
+    cube.flush()
+    del cube
+    os.replace(tmp_path, cube_path)
+
+    meta = {
+        "format": CUBE_FORMAT,
+        "location": location,
+        "years": years,
+        "shape": list(reference.shape),
+        "chunk": chunk,
+        "transform": list(reference.transform)[:6],
+        "crs": reference.crs.to_string(),
+        "sources": {str(mosaic.year): mosaic.sources for mosaic in mosaics},
+    }
+    with open(meta_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+def tile_spans(start: int, stop: int, step: int, chunk: int):
+    """
+    Splits the pixels range(start, stop, step) by tile: yields (tile, local
+    slice within the tile, output slice) for every tile the range touches.
+    """
+    for tile in range(start // chunk, (stop - 1) // chunk + 1):
+        low, high = max(start, tile * chunk), min(stop, (tile + 1) * chunk)
+        first = start + -(-(low - start) // step) * step
+        if first >= high:
+            continue
+        count = -(-(high - first) // step)
+        out = (first - start) // step
+        yield tile, slice(first - tile * chunk, high - tile * chunk, step), slice(out, out + count)
+
+class NDVICube:
+    """A memory-mapped, tiled NDVI cube and its metadata (see the module docstring for the layout)."""
+    def __init__(self, cube_path: str, meta_path: str):
+        with open(meta_path) as f:
+            self.meta = json.load(f)
+        self.path = cube_path
+        self.years = self.meta["years"]
+        self.chunk = self.meta.get("chunk")
+        self.data = np.load(cube_path, mmap_mode="r")
+
+    @property
+    def shape(self):
+        return tuple(self.meta["shape"])
+
+    @property
+    def current(self):
+        """False for cubes written in an older file layout, which need a rebuild."""
+        return self.meta.get("format") == CUBE_FORMAT
+
+    def year_indices(self, start_year: int = None, end_year: int = None):
+        """Positions of the years within [start_year, end_year] on the year axis."""
+        return [i for i, year in enumerate(self.years)
+                if (start_year is None or year >= start_year) and (end_year is None or year <= end_year)]
+
+    @timed("read")
+    def read(self, window=None, decimation: int = 1, year_indices=None):
+        """
+        Reads a (years, rows, cols) float32 block for a pixel window,
+        subsampled by the decimation factor. Only the selected years of the
+        tiles under the window are paged in.
+        """
+        window = window or Window(0, 0, self.shape[1], self.shape[0])
+        row0, col0 = int(window.row_off), int(window.col_off)
+        row_spans = list(tile_spans(row0, row0 + int(window.height), decimation, self.chunk))
+        col_spans = list(tile_spans(col0, col0 + int(window.width), decimation, self.chunk))
+        indices = year_indices if year_indices is not None else range(len(self.years))
+        out = np.empty((len(indices), row_spans[-1][2].stop, col_spans[-1][2].stop), dtype=np.float32)
+        # Plain ndarray views skip np.memmap's per-slice bookkeeping; filling one year
+        # at a time keeps the writes within one output plane.
+        tiles = self.data.view(np.ndarray)
+        for i, year_index in enumerate(indices):
+            for tile_row, local_rows, out_rows in row_spans:
+                for tile_col, local_cols, out_cols in col_spans:
+                    out[i, out_rows, out_cols] = tiles[tile_row, tile_col, year_index, local_rows, local_cols]
+        return out
+
+    def pixel_series(self, row: int, col: int):
+        values = self.data[row // self.chunk, col // self.chunk, :, row % self.chunk, col % self.chunk]
+        return {year: (None if np.isnan(value) else round(float(value), 6))
+                for year, value in zip(self.years, values)}
+
+_cubes = {}
+_cubes_lock = threading.Lock()
+
+def get_cube(location: str, cube_dir: str = CUBE_DIR):
+    """Returns the (cached) cube of a location, or None if it has not been built."""
+    cube_path, meta_path = cube_paths(location, cube_dir)
+    try:
+        mtime = os.stat(cube_path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    key = (cube_path, mtime)
+    with _cubes_lock:
+        cube = _cubes.get(key)
+        if cube is None:
+            for stale in [k for k in _cubes if k[0] == cube_path]:
+                del _cubes[stale]
+            cube = _cubes[key] = NDVICube(cube_path, meta_path)
+    return cube
+
+# --- Per-pixel analytics (year axis first, NaN = no data) ---
+
+# Colour ramps for the fast renderer: (red end, green end).
+METRIC_RANGES = {
+    "trend": (-0.05, 0.05),
+    "max_drop": (0.5, 0.0),
+    "anomaly": (-0.3, 0.3),
+}
+
+def trend_slope(stack, years):
+    """Least-squares NDVI slope per pixel in NDVI units per year; NaN with fewer than 2 valid years."""
+    # Centring the years keeps the float32 sums well conditioned; the slope is unchanged.
+    x = np.asarray(years, dtype=np.float64)
+    x = (x - x.mean()).astype(np.float32).reshape(-1, 1, 1)
+    valid = ~np.isnan(stack)
+    n = valid.sum(axis=0, dtype=np.float32)
+    values = np.where(valid, stack, 0)
+    x_valid = np.where(valid, x, 0)
+    sx, sy = x_valid.sum(axis=0), values.sum(axis=0)
+    sxx, sxy = (x_valid * x_valid).sum(axis=0), (x_valid * values).sum(axis=0)
+    denominator = n * sxx - sx * sx
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slope = (n * sxy - sx * sy) / denominator
+    slope[(n < 2) | (denominator == 0)] = np.nan
+    return slope.astype(np.float32)
+
+def max_drop(stack):
+    """Largest NDVI decline from an earlier peak to a later year, per pixel (>= 0)."""
+    with np.errstate(invalid="ignore"):
+        running_peak = np.fmax.accumulate(stack, axis=0)
+        drops = running_peak - stack
+    all_nan = np.isnan(drops).all(axis=0)
+    drops[:, all_nan] = 0
+    result = np.nanmax(drops, axis=0)
+    result[all_nan] = np.nan
+    return result.astype(np.float32)
+
+def anomaly(stack, years, year: int):
+    """NDVI of one year minus the mean of the other years, per pixel."""
+    target = years.index(year)
+    others = np.delete(stack, target, axis=0)
+    valid = ~np.isnan(others)
+    counts = valid.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        baseline = np.where(valid, others, 0).sum(axis=0) / counts
+    baseline[counts == 0] = np.nan
+    return (stack[target] - baseline).astype(np.float32)
+
+@timed("compute")
+def compute_metric(cube: NDVICube, metric: str, window=None, decimation: int = 1,
+                   start_year: int = None, end_year: int = None, year: int = None):
+    """Reads the window of a cube and returns the per-pixel metric as a float32 array."""
+    if len(cube.years) < 2:
+        raise ValueError("At least two years are needed for a time-series analysis.")
+    if metric == "anomaly":
+        if year not in cube.years:
+            raise ValueError(f"Year {year} is not in the cube ({cube.years}).")
+        return anomaly(cube.read(window, decimation), cube.years, year)
+
+    indices = cube.year_indices(start_year, end_year)
+    if len(indices) < 2:
+        raise ValueError(f"At least two years are needed between {start_year} and {end_year}.")
+    stack = cube.read(window, decimation, indices)
+    if metric == "trend":
+        return trend_slope(stack, [cube.years[i] for i in indices])
+    if metric == "max_drop":
+        return max_drop(stack)
+    raise ValueError(f"Unknown metric '{metric}'.")
+
+@timed("compute")
+def summarize_metric(values):
+    """Mean, spread and percentiles of a metric array, ignoring NaN."""
+    valid = values[~np.isnan(values)]
+    if not valid.size:
+        return {"valid_pixels": 0, "nodata_pixels": int(values.size)}
+    p10, p25, p50, p75, p90 = np.percentile(valid, [10, 25, 50, 75, 90]).tolist()
+    return {
+        "valid_pixels": int(valid.size),
+        "nodata_pixels": int(values.size - valid.size),
+        "mean": round(float(valid.mean()), 6),
+        "std": round(float(valid.std()), 6),
+        "min": float(valid.min()),
+        "max": float(valid.max()),
+        "percentiles": {"p10": round(p10, 6), "p25": round(p25, 6), "p50": round(p50, 6), "p75": round(p75, 6), "p90": round(p90, 6)},
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="Build the NDVI cube of every (or one) location.")
+    build.add_argument("--location", help="Only build this location.")
+    build.add_argument("--output-dir", default=CUBE_DIR)
+    args = parser.parse_args()
+
+    built = 0
+    for location in [args.location] if args.location else catalog.locations():
+        start = time.perf_counter()
+        try:
+            meta = build_cube(location, catalog, args.output_dir)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"❌ Skipping {location}: {e}")
+            continue
+        built += 1
+        print(f"✅ {location}: {len(meta['years'])} years of {meta['shape'][0]}x{meta['shape'][1]} in {time.perf_counter() - start:.1f}s")
+    sys.exit(0 if built else 1)
@@ -0,0 +1,143 @@
+# warmup.py
+"""
+Pre-renders the reclassified and change-map products of the whole catalog.
+
+Run from the py_server directory:
+
+    python warmup.py [--workers 4] [--renderer fast figure] [--location Thane] [--force]
+
+Every location/year gets a reclassified map and every pair of its years a
+change map, for the full mosaic at native resolution with the default
+classes and nearest resampling — the same key a /reclassify or
+/calculate_change request without a bbox, window or output_size looks up.
+Items are spread over a process pool and written into the artifact cache;
+ones already cached are skipped unless --force is given.
+
+Setting PY_SERVER_WARMUP_WORKERS to a positive number runs the same job
+in the background when the API starts.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import combinations
+
+from alignment import align_to
+from cache import artifact_cache
+from catalog import TileCatalog, catalog
+from classify import DEFAULT_SCHEME
+from mosaic import get_mosaic
+from products import build_change, build_reclassified, change_key, reclassify_key
+
+# Processes for the warmup job at API startup; 0 disables it.
+WARMUP_WORKERS = int(os.getenv("PY_SERVER_WARMUP_WORKERS", "0"))
+RENDERERS = ("fast", "figure")
+
+def warmup_items(tile_catalog: TileCatalog = catalog, locations=None, renderers=RENDERERS):
+    """Lists (kind, location, years, renderer) for every product to pre-render."""
+    items = []
+    for location in locations or tile_catalog.locations():
+        years = tile_catalog.years(location)
+        for renderer in renderers:
+            items += [("reclassify", location, (year,), renderer) for year in years]
+            items += [("change", location, pair, renderer) for pair in combinations(years, 2)]
+    return items
+
+def catalog_files(tile_catalog: TileCatalog):
+    """The files a catalog is read from; a TileCatalog holds a lock, so workers get these instead."""
+    return tile_catalog.metadata_file, tile_catalog.raster_dir, tile_catalog.cog_manifest_file
+
+_worker_catalogs = {}
+
+def open_catalog(files=None):
+    """The catalog for catalog_files() in this process, loaded once; the module catalog by default."""
+    if files is None or tuple(files) == catalog_files(catalog):
+        return catalog
+    files = tuple(files)
+    if files not in _worker_catalogs:
+        _worker_catalogs[files] = TileCatalog(*files)
+    return _worker_catalogs[files]
+
+def warm_item(item, force: bool = False, files=None):
+    """
+    Builds one product into the artifact cache unless it is already there,
+    reading tiles through the catalog of ``files`` (see catalog_files).
+    Returns (item, status, seconds, size_bytes, error) with status one of
+    'built', 'cached' or 'failed'.
+    """
+    kind, location, years, renderer = item
+    start = time.perf_counter()
+    try:
+        tile_catalog = open_catalog(files)
+        mosaics = [get_mosaic(location, year, tile_catalog) for year in years]
+        if not all(mosaics):
+            raise FileNotFoundError(f"No tiles for {location} {years}.")
+        if kind == "reclassify":
+            mosaic = mosaics[0]
+            window = mosaic.full_window
+            key = reclassify_key(mosaic, window, 1, DEFAULT_SCHEME, renderer)
+            build = lambda: build_reclassified(mosaic, window, 1, DEFAULT_SCHEME, renderer)
+        else:
+            mosaic_from = mosaics[0]
+            mosaic_to = align_to(mosaics[1], mosaic_from, "nearest")
+            window = mosaic_from.full_window
+            key = change_key(mosaic_from, mosaic_to, window, 1, "nearest", renderer)
+            build = lambda: build_change(mosaic_from, mosaic_to, window, 1, renderer)
+
+        if not force and artifact_cache.get(key) is not None:
+            return item, "cached", time.perf_counter() - start, 0, None
+        png = build()
+        artifact_cache.put(key, png)
+        return item, "built", time.perf_counter() - start, len(png), None
+    except Exception as e:
+        return item, "failed", time.perf_counter() - start, 0, f"{type(e).__name__}: {e}"
+
+def describe(item):
+    kind, location, years, renderer = item
+    return f"{kind:<11}{location:<14}{'-'.join(map(str, years)):<11}{renderer:<8}"
+
+def run_warmup(tile_catalog: TileCatalog = catalog, max_workers: int = None, renderers=RENDERERS,
+               locations=None, force: bool = False, stop_event=None):
+    """
+    Pre-renders every catalog product on a process pool, printing one
+    timing line per item as it finishes. ``stop_event`` (a threading.Event)
+    cancels the items that have not started yet. Returns the result tuples.
+    """
+    items = warmup_items(tile_catalog, locations, renderers)
+    print(f"Warming {len(items)} products with {max_workers or os.cpu_count()} processes...")
+    start = time.perf_counter()
+    results = []
+    # Spawned workers do not inherit the API's threads or open GDAL handles.
+    pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        files = catalog_files(tile_catalog)
+        futures = [pool.submit(warm_item, item, force, files) for item in items]
+        for future in as_completed(futures):
+            if stop_event is not None and stop_event.is_set():
+                break
+            item, status, seconds, size, error = result = future.result()
+            results.append(result)
+            if status == "failed":
+                print(f"❌ {describe(item)}{seconds:>8.2f}s  {error}")
+            else:
+                print(f"✅ {describe(item)}{seconds:>8.2f}s  {status}" + (f" {size / 1e3:.0f} kB" if size else ""))
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    counts = {status: sum(1 for r in results if r[1] == status) for status in ("built", "cached", "failed")}
+    print(f"Warmup finished in {time.perf_counter() - start:.1f}s: "
+          f"{counts['built']} built, {counts['cached']} already cached, {counts['failed']} failed.")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=None, help="Processes to use (default: one per CPU).")
+    parser.add_argument("--renderer", nargs="+", choices=RENDERERS, default=list(RENDERERS))
+    parser.add_argument("--location", action="append", help="Only warm this location (repeatable).")
+    parser.add_argument("--force", action="store_true", help="Rebuild products that are already cached.")
+    args = parser.parse_args()
+
+    results = run_warmup(catalog, args.workers, args.renderer, args.location, args.force)
+    sys.exit(1 if not results or any(r[1] == "failed" for r in results) else 0)
@@ -0,0 +1,99 @@
+# workers.py
+import asyncio
+import contextvars
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from functools import partial
+
+from fastapi import HTTPException
+
+from metrics import stage
+
+# Pool sizes and limits, overridable through the environment.
+IO_WORKERS = int(os.getenv("PY_SERVER_IO_WORKERS", "4"))
+RENDER_WORKERS = int(os.getenv("PY_SERVER_RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+MAX_CONCURRENCY = int(os.getenv("PY_SERVER_MAX_CONCURRENCY", "4"))
+MAX_QUEUE = int(os.getenv("PY_SERVER_MAX_QUEUE", "16"))
+
+class WorkerPool:
+    """
+    Bounded execution layer for the raster endpoints.
+
+    GDAL reads and numpy work go to a thread pool, matplotlib rendering to a
+    process pool, so the event loop stays free for other requests. At most
+    ``max_concurrency`` jobs run at once and ``max_queue`` more may wait;
+    anything beyond that is rejected with a 429.
+    """
+    def __init__(self, io_workers=IO_WORKERS, render_workers=RENDER_WORKERS,
+                 max_concurrency=MAX_CONCURRENCY, max_queue=MAX_QUEUE):
+        self.io_workers = io_workers
+        self.render_workers = render_workers
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._io = None
+        self._render = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._pending = 0
+
+    @property
+    def pending(self):
+        """Number of jobs currently running or waiting for a slot."""
+        return self._pending
+
+    def _io_executor(self):
+        if self._io is None:
+            self._io = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="raster-io")
+        return self._io
+
+    def _render_executor(self):
+        # With no render workers configured, rendering shares the I/O threads.
+        if self.render_workers <= 0:
+            return self._io_executor()
+        if self._render is None:
+            self._render = ProcessPoolExecutor(
+                max_workers=self.render_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._render
+
+    @asynccontextmanager
+    async def slot(self):
+        """Reserves a job slot, or raises a 429 when the queue is full."""
+        if self._pending >= self.max_concurrency + self.max_queue:
+            raise HTTPException(status_code=429, detail="Server is busy. Please retry shortly.", headers={"Retry-After": "1"})
+        self._pending += 1
+        try:
+            async with self._semaphore:
+                yield
+        finally:
+            self._pending -= 1
+
+    async def run_io(self, fn, *args, **kwargs):
+        """Runs blocking I/O or numpy work on the thread pool, in a copy of the caller's context (for stage timers)."""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._io_executor(), partial(context.run, fn, *args, **kwargs))
+
+    async def run_render(self, fn, *args, **kwargs):
+        """Runs a picklable rendering function on the process pool, timed as the render stage."""
+        loop = asyncio.get_running_loop()
+        try:
+            with stage("render"):
+                return await loop.run_in_executor(self._render_executor(), partial(fn, *args, **kwargs))
+        except BrokenProcessPool:
+            # A crashed worker poisons the pool; start a fresh one on the next call.
+            self._render = None
+            raise
+
+    def shutdown(self):
+        if self._io is not None:
+            self._io.shutdown(wait=False, cancel_futures=True)
+            self._io = None
+        if self._render is not None:
+            self._render.shutdown(wait=False, cancel_futures=True)
+            self._render = None
+
+workers = WorkerPool()